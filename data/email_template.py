@@ -7,7 +7,7 @@ I hope this email finds you well. I am reaching out to you today regarding our A
 
 As you know, Azure resources consume cost, and it is important to regularly review and delete any unused resources to keep our costs under control. To help ensure that our Azure account is being used efficiently, I would like to request that you review the resources that are assigned to your account and delete any that are no longer needed.
 
-Following is a list of resources that have not been used in the last 90 days:
+Following is a list of your resources that need attention:
 {unused_resources}
 
 If you need any assistance with identifying and removing unused resources, or if you have any questions about this process, please do not hesitate to reach out to me.
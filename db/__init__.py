@@ -1,2 +1,5 @@
 from .connection_manager import *
-from .models import *
\ No newline at end of file
+from .models import *
+from .metrics_store import MetricStore
+from .bulk import bulk_upsert, upsert_metrics
+from .activity_store import ActivityStore
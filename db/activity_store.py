@@ -0,0 +1,214 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from .models import ActivityWatermark, ResourceActivity
+
+# Days of history the activity log keeps
+ACTIVITY_LOG_RETENTION_DAYS = 90
+
+
+def _resource_group(resource_id: str) -> Optional[str]:
+    parts = resource_id.strip("/").split("/")
+    if len(parts) >= 4 and parts[2] == "resourcegroups":
+        return parts[3]
+    return None
+
+
+class ActivityStore:
+    """
+    Index of the last write or action on each resource, built from the activity log.
+
+    Each row holds the newest event seen for a resource, so "unused for N days"
+    is a range query on the indexed last_activity_at column. A watermark per
+    subscription records how far the log has been ingested; later runs only
+    read the events after it, going back ``lag_minutes`` because the activity
+    log can take a few minutes to show an event.
+
+    Args:
+        session (Session): SQLAlchemy session, e.g. from db.SessionManager().
+        lag_minutes (int): Minutes before the watermark that are read again.
+
+    Example:
+    >>> store = ActivityStore(SessionManager())
+    >>> ingest_activity_log(subscription_id, credential, store)
+    >>> store.unused_since(datetime.utcnow() - timedelta(days=90), subscription_id)
+    """
+
+    def __init__(self, session: Session, lag_minutes: int = 15):
+        self.session = session
+        self.lag_minutes = lag_minutes
+
+    def watermark(self, subscription_id: str) -> Optional[datetime]:
+        """
+        Returns the end of the last window ingested for a subscription, or None if none was.
+        """
+        return self.session.execute(
+            select(ActivityWatermark.ingested_until).where(
+                ActivityWatermark.subscription_id == subscription_id.lower()
+            )
+        ).scalar()
+
+    def fetch_window(
+        self,
+        subscription_id: str,
+        initial_days: int = ACTIVITY_LOG_RETENTION_DAYS,
+        now: Optional[datetime] = None,
+    ) -> Tuple[datetime, datetime]:
+        """
+        Returns the (start, end) window of the activity log still to ingest for a
+        subscription: from its watermark, or the last ``initial_days`` days.
+        """
+        end_time = now or datetime.utcnow()
+        watermark = self.watermark(subscription_id)
+        if watermark is None:
+            start_time = end_time - timedelta(days=initial_days)
+        else:
+            start_time = watermark - timedelta(minutes=self.lag_minutes)
+        start_time = max(
+            start_time, end_time - timedelta(days=ACTIVITY_LOG_RETENTION_DAYS)
+        )
+        return start_time, end_time
+
+    def record(self, subscription_id: str, events: Iterable[Dict]) -> int:
+        """
+        Stores the newest event of each resource, keeping the stored one if it is newer.
+
+        Args:
+            subscription_id (str): Subscription the events belong to.
+            events (Iterable[Dict]): Events with "resource_id", "timestamp" (naive UTC datetime),
+                "operation" and "caller" keys, in any order.
+
+        Returns:
+            int: Number of resources written.
+        """
+        subscription_id = subscription_id.lower()
+        newest: Dict[str, Dict] = {}
+        for event in events:
+            resource_id = event["resource_id"].lower()
+            if (
+                resource_id not in newest
+                or newest[resource_id]["last_activity_at"] < event["timestamp"]
+            ):
+                newest[resource_id] = {
+                    "resource_id": resource_id,
+                    "subscription_id": subscription_id,
+                    "resource_group": _resource_group(resource_id),
+                    "last_activity_at": event["timestamp"],
+                    "last_operation": event.get("operation"),
+                    "last_caller": event.get("caller"),
+                }
+        if not newest:
+            return 0
+
+        statement = insert(ResourceActivity)
+        self.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=["resource_id"],
+                set_={
+                    column: statement.excluded[column]
+                    for column in (
+                        "last_activity_at",
+                        "last_operation",
+                        "last_caller",
+                    )
+                },
+                where=ResourceActivity.last_activity_at
+                < statement.excluded.last_activity_at,
+            ),
+            list(newest.values()),
+        )
+        self.session.commit()
+        return len(newest)
+
+    def set_watermark(self, subscription_id: str, ingested_until: datetime) -> None:
+        """
+        Records that the activity log of a subscription was ingested up to a time.
+        """
+        self.session.merge(
+            ActivityWatermark(
+                subscription_id=subscription_id.lower(), ingested_until=ingested_until
+            )
+        )
+        self.session.commit()
+
+    def last_activity(self, resource_id: str) -> Optional[datetime]:
+        """
+        Returns the time of the last write or action on a resource, or None if none was seen.
+        """
+        return self.session.execute(
+            select(ResourceActivity.last_activity_at).where(
+                ResourceActivity.resource_id == resource_id.lower()
+            )
+        ).scalar()
+
+    def unused_since(
+        self,
+        cutoff: datetime,
+        subscription_id: Optional[str] = None,
+        resource_ids: Optional[List[str]] = None,
+    ) -> Dict[str, Optional[datetime]]:
+        """
+        Returns the resources without any write or action since ``cutoff``.
+
+        Args:
+            cutoff (datetime): Resources last used before this time (UTC) are returned.
+            subscription_id (str, optional): Only return resources of this subscription.
+            resource_ids (List[str], optional): Resources to check. Those never seen in
+                the activity log are returned too, with None as their last activity.
+
+        Returns:
+            Dict[str, Optional[datetime]]: Last activity time keyed by lower-cased resource ID.
+        """
+        query = select(
+            ResourceActivity.resource_id, ResourceActivity.last_activity_at
+        ).where(ResourceActivity.last_activity_at < cutoff)
+        if subscription_id:
+            query = query.where(
+                ResourceActivity.subscription_id == subscription_id.lower()
+            )
+        if resource_ids is None:
+            return dict(self.session.execute(query).all())
+
+        resource_ids = [resource_id.lower() for resource_id in resource_ids]
+        unused = dict(
+            self.session.execute(
+                query.where(ResourceActivity.resource_id.in_(resource_ids))
+            ).all()
+        )
+        seen = set(
+            self.session.execute(
+                select(ResourceActivity.resource_id).where(
+                    ResourceActivity.resource_id.in_(resource_ids)
+                )
+            ).scalars()
+        )
+        unused.update(
+            {
+                resource_id: None
+                for resource_id in resource_ids
+                if resource_id not in seen
+            }
+        )
+        return unused
+
+    def last_activity_by_resource_group(
+        self, subscription_id: str
+    ) -> Dict[str, datetime]:
+        """
+        Returns the time of the last write or action on anything in each resource group of a subscription.
+        """
+        return dict(
+            self.session.execute(
+                select(
+                    ResourceActivity.resource_group,
+                    func.max(ResourceActivity.last_activity_at),
+                )
+                .where(ResourceActivity.subscription_id == subscription_id.lower())
+                .where(ResourceActivity.resource_group.is_not(None))
+                .group_by(ResourceActivity.resource_group)
+            ).all()
+        )
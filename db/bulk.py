@@ -0,0 +1,72 @@
+from typing import Dict, Iterable, List, Sequence
+
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from .models import Metrics
+
+# Rows written per executemany call and transaction
+DEFAULT_BATCH_SIZE = 5000
+
+
+def bulk_upsert(
+    session: Session,
+    model,
+    rows: Iterable[Dict],
+    index_elements: Sequence[str],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> int:
+    """
+    Writes rows with ``INSERT ... ON CONFLICT DO UPDATE``, one executemany call and
+    one transaction per ``batch_size`` rows.
+
+    Args:
+        session (Session): SQLAlchemy session.
+        model: Declarative model of the table to write to.
+        rows (Iterable[Dict]): Column values of each row. Every row must have the same keys.
+        index_elements (Sequence[str]): Columns of the unique constraint the rows conflict on.
+        batch_size (int): Number of rows per transaction.
+
+    Returns:
+        int: Number of rows written.
+    """
+    written = 0
+    batch: List[Dict] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            written += _upsert_batch(session, model, batch, index_elements)
+            batch = []
+    if batch:
+        written += _upsert_batch(session, model, batch, index_elements)
+    return written
+
+
+def _upsert_batch(
+    session: Session, model, batch: List[Dict], index_elements: Sequence[str]
+) -> int:
+    statement = insert(model)
+    updated_columns = {
+        column: statement.excluded[column]
+        for column in batch[0]
+        if column not in index_elements
+    }
+    session.execute(
+        statement.on_conflict_do_update(
+            index_elements=index_elements, set_=updated_columns
+        ),
+        batch,
+    )
+    session.commit()
+    return len(batch)
+
+
+def upsert_metrics(
+    session: Session, rows: Iterable[Dict], batch_size: int = DEFAULT_BATCH_SIZE
+) -> int:
+    """
+    Writes Metrics rows, replacing the row of the same resource ID and run date if there is one.
+    """
+    return bulk_upsert(
+        session, Metrics, rows, ("resource_id", "run_date"), batch_size=batch_size
+    )
@@ -1,9 +1,46 @@
-from sqlalchemy import create_engine
+import os
+import threading
+from typing import Optional
+from sqlalchemy import UniqueConstraint, create_engine, event, inspect, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+
+def create_db_engine(
+    url: str = "sqlite:///data/aco.db",
+    echo: bool = False,
+    synchronous: str = "NORMAL",
+) -> Engine:
+    """
+    Creates the database engine. SQLite connections use WAL journaling, which lets
+    readers run alongside a writer, and the given ``synchronous`` mode (OFF,
+    NORMAL or FULL); NORMAL is safe with WAL and avoids an fsync per commit.
+    """
+    synchronous = synchronous.upper()
+    if synchronous not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+        raise ValueError(f"Invalid SQLite synchronous mode: {synchronous}")
+
+    engine = create_engine(url, echo=echo)
+    if engine.dialect.name == "sqlite":
+
+        @event.listens_for(engine, "connect")
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            if url not in ("sqlite://", "sqlite:///:memory:"):
+                cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute(f"PRAGMA synchronous={synchronous}")
+            cursor.close()
+
+    return engine
+
+
 # Set up database connection
-engine = create_engine("sqlite:///data/aco.db", echo=True)
+engine = create_db_engine(
+    os.getenv("ACO_DB_URL", "sqlite:///data/aco.db"),
+    echo=os.getenv("ACO_DB_ECHO", "").lower() in ("1", "true"),
+    synchronous=os.getenv("ACO_DB_SYNCHRONOUS", "NORMAL"),
+)
 
 # Create a session factory
 Session = sessionmaker(bind=engine)
@@ -12,8 +49,67 @@ Session = sessionmaker(bind=engine)
 Base = declarative_base()
 
 
+def init_db(bind: Optional[Engine] = None) -> None:
+    """
+    Creates missing tables and brings tables created by older versions up to date.
+
+    Columns added to a model since are added with ``ALTER TABLE``, and unique
+    constraints the upserts rely on (``ON CONFLICT``) are added as unique
+    indexes, since SQLite cannot add constraints to an existing table.
+    """
+    from . import models  # noqa: F401 (registers the tables on Base)
+
+    bind = bind or engine
+    Base.metadata.create_all(bind=bind)
+    inspector = inspect(bind)
+    with bind.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=bind.dialect)
+                connection.execute(
+                    text(
+                        f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'
+                    )
+                )
+
+            unique = [
+                set(constraint["column_names"])
+                for constraint in inspector.get_unique_constraints(table.name)
+            ] + [
+                set(index["column_names"])
+                for index in inspector.get_indexes(table.name)
+                if index["unique"]
+            ]
+            for constraint in table.constraints:
+                if not isinstance(constraint, UniqueConstraint):
+                    continue
+                columns = [column.name for column in constraint.columns]
+                if set(columns) in unique:
+                    continue
+                index_name = f"uq_{table.name}_{'_'.join(columns)}"
+                connection.execute(
+                    text(
+                        f'CREATE UNIQUE INDEX "{index_name}" '
+                        f'ON "{table.name}" ({", ".join(columns)})'
+                    )
+                )
+
+
+_initialized = False
+_init_lock = threading.Lock()
+
+
 # class SessionManager(object):
 #     def __init__(self):
 #         self.session = Session()
 def SessionManager():
+    # The schema is created or updated by the first session of the process
+    global _initialized
+    with _init_lock:
+        if not _initialized:
+            init_db()
+            _initialized = True
     return Session()
@@ -0,0 +1,211 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from .models import MetricSample, MetricWatermark
+
+
+def _to_epoch(value) -> int:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def _to_datetime(epoch: int) -> datetime:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).replace(tzinfo=None)
+
+
+class MetricStore:
+    """
+    Local time-series store for VM metrics, kept in the metric_samples table.
+
+    A watermark per VM and metric records the latest sample stored, so later
+    runs only fetch what came after it. The interval at the watermark is
+    fetched again and overwritten, since it may still have been filling up.
+    Samples older than ``retention_days`` are dropped by :meth:`apply_retention`.
+
+    Args:
+        session (Session): SQLAlchemy session, e.g. from db.SessionManager().
+        retention_days (int): Number of days of samples to keep.
+
+    Example:
+    >>> store = MetricStore(SessionManager(), retention_days=90)
+    >>> timespan = store.fetch_timespan(vm_id)
+    >>> store.append(vm_id, fetch_vm_consumption_data(..., timespan=timespan)["series"])
+    >>> timestamps, values = store.read(vm_id, "Percentage CPU", start, end)
+    """
+
+    def __init__(self, session: Session, retention_days: int = 90):
+        self.session = session
+        self.retention_days = retention_days
+
+    def watermark(
+        self, resource_id: str, metric_name: Optional[str] = None
+    ) -> Optional[datetime]:
+        """
+        Returns the latest sample time stored for a VM metric, or None if none is stored.
+        Without a metric name, returns the oldest watermark of the VM's metrics.
+        """
+        query = select(func.min(MetricWatermark.last_timestamp)).where(
+            MetricWatermark.resource_id == resource_id.lower()
+        )
+        if metric_name:
+            query = query.where(MetricWatermark.metric_name == metric_name)
+        last_timestamp = self.session.execute(query).scalar()
+        return None if last_timestamp is None else _to_datetime(last_timestamp)
+
+    def fetch_timespan(
+        self,
+        resource_id: str,
+        initial_days: int = 7,
+        now: Optional[datetime] = None,
+    ) -> str:
+        """
+        Returns the ISO 8601 "start/end" timespan still to fetch for a VM: from its
+        watermark, or the last ``initial_days`` days for a VM not seen before.
+        """
+        end_time = now or datetime.utcnow()
+        start_time = self.watermark(resource_id) or end_time - timedelta(
+            days=initial_days
+        )
+        start_time = max(start_time, end_time - timedelta(days=self.retention_days))
+        return f"{start_time.strftime('%Y-%m-%dT%H:%M:%SZ')}/{end_time.strftime('%Y-%m-%dT%H:%M:%SZ')}"
+
+    def append(self, resource_id: str, series: Dict[str, List]) -> int:
+        """
+        Stores the per-interval series of a VM and moves its watermarks forward.
+
+        Args:
+            resource_id (str): VM resource ID.
+            series (Dict[str, List]): [timestamp, value] pairs keyed by metric name, like the
+                "series" of fetch_vm_consumption_data.
+
+        Returns:
+            int: Number of samples written.
+        """
+        resource_id = resource_id.lower()
+        rows = [
+            {
+                "resource_id": resource_id,
+                "metric_name": metric_name,
+                "timestamp": _to_epoch(timestamp),
+                "value": value,
+            }
+            for metric_name, points in series.items()
+            for timestamp, value in points
+        ]
+        if not rows:
+            return 0
+
+        statement = insert(MetricSample)
+        self.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=["resource_id", "metric_name", "timestamp"],
+                set_={"value": statement.excluded.value},
+            ),
+            rows,
+        )
+
+        watermarks = {}
+        for row in rows:
+            watermarks[row["metric_name"]] = max(
+                watermarks.get(row["metric_name"], 0), row["timestamp"]
+            )
+        statement = insert(MetricWatermark)
+        self.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=["resource_id", "metric_name"],
+                set_={
+                    "last_timestamp": func.max(
+                        MetricWatermark.last_timestamp,
+                        statement.excluded.last_timestamp,
+                    )
+                },
+            ),
+            [
+                {
+                    "resource_id": resource_id,
+                    "metric_name": metric_name,
+                    "last_timestamp": last_timestamp,
+                }
+                for metric_name, last_timestamp in watermarks.items()
+            ],
+        )
+        self.session.commit()
+        return len(rows)
+
+    def apply_retention(self, now: Optional[datetime] = None) -> int:
+        """
+        Deletes samples older than the retention period and returns how many were deleted.
+        """
+        cutoff = _to_epoch(
+            (now or datetime.utcnow()) - timedelta(days=self.retention_days)
+        )
+        result = self.session.execute(
+            delete(MetricSample).where(MetricSample.timestamp < cutoff)
+        )
+        self.session.commit()
+        return result.rowcount
+
+    def read(
+        self, resource_id: str, metric_name: str, start: datetime, end: datetime
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the samples of a VM metric in [start, end) as (timestamps, values) arrays,
+        ordered by time. Timestamps are numpy datetime64[s] values in UTC.
+        """
+        return self.read_fleet(metric_name, start, end, [resource_id]).get(
+            resource_id.lower(),
+            (np.array([], dtype="datetime64[s]"), np.array([], dtype=np.float64)),
+        )
+
+    def read_fleet(
+        self,
+        metric_name: str,
+        start: datetime,
+        end: datetime,
+        resource_ids: Optional[List[str]] = None,
+    ) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Returns the samples of a metric in [start, end) for many VMs with one query.
+
+        Args:
+            metric_name (str): Metric name, e.g. "Percentage CPU".
+            start (datetime): Start of the window (UTC).
+            end (datetime): End of the window (UTC), excluded.
+            resource_ids (List[str], optional): VMs to read. Defaults to every VM stored.
+
+        Returns:
+            Dict[str, Tuple[np.ndarray, np.ndarray]]: (timestamps, values) arrays keyed by lower-cased resource ID.
+        """
+        query = (
+            select(MetricSample.resource_id, MetricSample.timestamp, MetricSample.value)
+            .where(MetricSample.metric_name == metric_name)
+            .where(MetricSample.timestamp >= _to_epoch(start))
+            .where(MetricSample.timestamp < _to_epoch(end))
+            .order_by(MetricSample.resource_id, MetricSample.timestamp)
+        )
+        if resource_ids is not None:
+            query = query.where(
+                MetricSample.resource_id.in_(
+                    [resource_id.lower() for resource_id in resource_ids]
+                )
+            )
+        rows = self.session.execute(query).all()
+        if not rows:
+            return {}
+
+        ids = np.array([row[0] for row in rows])
+        timestamps = np.array([row[1] for row in rows], dtype="datetime64[s]")
+        values = np.array([row[2] for row in rows], dtype=np.float64)
+        # Rows are sorted by resource ID, so each VM is one contiguous slice
+        boundaries = np.flatnonzero(ids[1:] != ids[:-1]) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(rows)]))
+        return {ids[i]: (timestamps[i:j], values[i:j]) for i, j in zip(starts, ends)}
@@ -1,4 +1,15 @@
-from sqlalchemy import Table, Column, Integer, String
+from sqlalchemy import (
+    Table,
+    Column,
+    Integer,
+    String,
+    Float,
+    Boolean,
+    Date,
+    DateTime,
+    Index,
+    UniqueConstraint,
+)
 from .connection_manager import Base
 
 
@@ -6,6 +17,8 @@ class Metrics(Base):
     __tablename__ = "metrics"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
+    resource_id = Column(String)
+    run_date = Column(Date)
     resource_name = Column(String)
     resource_type = Column(String)
     current_sku = Column(String)
@@ -22,3 +35,123 @@ class Metrics(Base):
     other_weight_peak = Column(Integer)
     current_weightage = Column(Integer)
     suggested_sku = Column(String)
+
+    __table_args__ = (UniqueConstraint("resource_id", "run_date"),)
+
+
+class MetricSample(Base):
+    __tablename__ = "metric_samples"
+
+    resource_id = Column(String, primary_key=True)
+    metric_name = Column(String, primary_key=True)
+    # Start of the interval, in seconds since the epoch (UTC)
+    timestamp = Column(Integer, primary_key=True)
+    value = Column(Float)
+
+    __table_args__ = (Index("ix_metric_samples_timestamp", "timestamp"),)
+
+
+class MetricWatermark(Base):
+    __tablename__ = "metric_watermarks"
+
+    resource_id = Column(String, primary_key=True)
+    metric_name = Column(String, primary_key=True)
+    # Latest sample timestamp stored, in seconds since the epoch (UTC)
+    last_timestamp = Column(Integer)
+
+
+class VmSku(Base):
+    __tablename__ = "vm_skus"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String, nullable=False)
+    location = Column(String, nullable=False, index=True)
+    family = Column(String, index=True)
+    tier = Column(String)
+    size = Column(String)
+    vcpus = Column(Integer)
+    memory_gb = Column(Float)
+    max_data_disk_count = Column(Integer)
+    uncached_disk_iops = Column(Integer)
+    uncached_disk_bytes_per_second = Column(Integer)
+    max_network_interfaces = Column(Integer)
+    network_bandwidth_mbps = Column(Integer)
+    premium_io = Column(Boolean)
+    accelerated_networking = Column(Boolean)
+    restricted = Column(Boolean, default=False)
+
+    __table_args__ = (UniqueConstraint("name", "location"),)
+
+
+class VmSkuCatalogRefresh(Base):
+    __tablename__ = "vm_sku_catalog_refreshes"
+
+    location = Column(String, primary_key=True)
+    refreshed_at = Column(DateTime, nullable=False)
+
+
+class PendingOperation(Base):
+    __tablename__ = "pending_operations"
+
+    resource_id = Column(String, primary_key=True)
+    # Azure-AsyncOperation or Location URL to poll
+    operation_url = Column(String, nullable=False)
+    # "async" for Azure-AsyncOperation, "location" for Location
+    url_kind = Column(String, nullable=False)
+    # InProgress until the operation reaches Succeeded, Failed, Canceled or TimedOut
+    status = Column(String, nullable=False, default="InProgress")
+    error = Column(String)
+    attempts = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime, nullable=False)
+    next_poll_at = Column(DateTime)
+    completed_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_pending_operations_status_next_poll_at", "status", "next_poll_at"),
+    )
+
+
+class ResourceGroupExpiry(Base):
+    __tablename__ = "resource_group_expiries"
+
+    resource_id = Column(String, primary_key=True)
+    subscription_id = Column(String, nullable=False, index=True)
+    name = Column(String, nullable=False)
+    owner_email = Column(String)
+    created_at = Column(DateTime, nullable=False)
+    ttl_days = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    # scheduled -> notified -> deleted
+    state = Column(String, nullable=False, default="scheduled")
+    notified_at = Column(DateTime)
+    deleted_at = Column(DateTime)
+    # When the group is next due for a step of the pipeline; None once deleted
+    next_action_at = Column(DateTime, index=True)
+
+
+class ResourceActivity(Base):
+    __tablename__ = "resource_activity"
+
+    resource_id = Column(String, primary_key=True)
+    subscription_id = Column(String, nullable=False)
+    resource_group = Column(String)
+    last_activity_at = Column(DateTime, nullable=False)
+    last_operation = Column(String)
+    last_caller = Column(String)
+
+    __table_args__ = (
+        Index(
+            "ix_resource_activity_subscription_last_activity",
+            "subscription_id",
+            "last_activity_at",
+        ),
+        Index("ix_resource_activity_last_activity", "last_activity_at"),
+    )
+
+
+class ActivityWatermark(Base):
+    __tablename__ = "activity_watermarks"
+
+    subscription_id = Column(String, primary_key=True)
+    # End of the last activity log window ingested (UTC)
+    ingested_until = Column(DateTime, nullable=False)
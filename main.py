@@ -1,19 +1,34 @@
 # Imports: pypi libraries
 import os
+import asyncio
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dotenv import load_dotenv
 import coloredlogs
 import logging
+from typing import Dict, Iterable, List, Optional
 
 # Imports: modules
-from src.auth import get_access_token_service_principal
+from src.auth import (
+    ServicePrincipalCredential,
+    TokenBroker,
+    get_default_broker,
+    set_default_broker,
+)
 from src.tagging import (
-    check_resource_group_owner_email_tag,
-    add_owner_email_tag,
-    check_resource_group_ttl_tag,
-    add_ttl_tag,
     fetch_resource_group_creator_email,
+    build_resource_group_creator_index,
+    reconcile_resource_group_tags,
+    reconcile_resource_group_tags_async,
+    reconcile_resource_group_tags_batch,
+    summarize_tag_reconciliation,
 )
-from src.resources.resource_group import get_resource_groups
+from src.arm import AsyncArmClient, configure_arm_client, get_arm_client
+from src.throttling import get_rate_limit_governor
+from src.digest import DigestCollector, send_digests
+from src.resources.resource_group import iter_resource_groups
+from src.resources.subscription import get_subscriptions, read_subscriptions_file
 
 # Load environment variables
 load_dotenv()
@@ -26,8 +41,144 @@ coloredlogs.install(
 )
 
 
+def get_desired_tags(
+    subscription_id: str,
+    resource_group: dict,
+    creator_index: Optional[Dict[str, str]],
+    access_token,
+) -> Dict[str, Optional[str]]:
+    """
+    Returns the tags every resource group should carry. The owner is only looked up when the tag is missing.
+    """
+    owner_email_id = None
+    if "OwnerEmail" not in resource_group["tags"]:
+        owner_email_id = fetch_resource_group_creator_email(
+            subscription_id=subscription_id,
+            resource_group_name=resource_group["name"],
+            access_token=access_token,
+            creator_index=creator_index,
+        )
+    return {"OwnerEmail": owner_email_id, "TTL": "7"}
+
+
+def tag_resource_group(
+    subscription_id: str,
+    resource_group: dict,
+    creator_index: Optional[Dict[str, str]],
+    access_token,
+) -> Dict:
+    """
+    Tags a single resource group and returns its reconciliation result.
+    """
+    logger.info(f"Tagging resource group: {resource_group['name']}")
+    try:
+        return reconcile_resource_group_tags(
+            subscription_id=subscription_id,
+            resource_group=resource_group,
+            desired_tags=get_desired_tags(
+                subscription_id, resource_group, creator_index, access_token
+            ),
+            access_token=access_token,
+        )
+    except Exception as err:
+        logger.error(f"Failed to tag resource group {resource_group['name']}: {err}")
+        return _failed_result(resource_group, err)
+
+
+async def tag_resource_groups_async(
+    subscription_id: str,
+    resource_groups: Iterable[dict],
+    creator_index: Optional[Dict[str, str]],
+    access_token,
+    concurrency: int = 16,
+) -> List[Dict]:
+    """
+    Tags resource groups concurrently, with at most ``concurrency`` groups in flight.
+
+    :param subscription_id: Azure subscription id
+    :type subscription_id: str
+    :param resource_groups: Resource groups, e.g. the iter_resource_groups generator
+    :type resource_groups: Iterable[dict]
+    :param creator_index: Resource group creator index, or None to query each group
+    :type creator_index: dict
+    :param access_token: Azure access token or ServicePrincipalCredential
+    :type access_token: str
+    :param concurrency: Maximum number of resource groups processed at once
+    :type concurrency: int
+    :return: Reconciliation result per resource group
+    :rtype: List[dict]
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def tag(resource_group: dict, client: AsyncArmClient) -> Dict:
+        logger.info(f"Tagging resource group: {resource_group['name']}")
+        try:
+            # Owner lookups only block when no creator index is available
+            if creator_index is None:
+                desired_tags = await loop.run_in_executor(
+                    None,
+                    get_desired_tags,
+                    subscription_id,
+                    resource_group,
+                    creator_index,
+                    access_token,
+                )
+            else:
+                desired_tags = get_desired_tags(
+                    subscription_id, resource_group, creator_index, access_token
+                )
+            return await reconcile_resource_group_tags_async(
+                subscription_id=subscription_id,
+                resource_group=resource_group,
+                desired_tags=desired_tags,
+                access_token=access_token,
+                client=client,
+            )
+        except Exception as err:
+            logger.error(
+                f"Failed to tag resource group {resource_group['name']}: {err}"
+            )
+            return _failed_result(resource_group, err)
+        finally:
+            semaphore.release()
+
+    tasks = []
+    resource_groups = iter(resource_groups)
+    async with AsyncArmClient(pool_size=concurrency) as client:
+        while True:
+            # Pull the next group off the thread pool so page loads don't block the loop
+            resource_group = await loop.run_in_executor(
+                None, next, resource_groups, None
+            )
+            if resource_group is None:
+                break
+            await semaphore.acquire()
+            tasks.append(asyncio.create_task(tag(resource_group, client)))
+        return list(await asyncio.gather(*tasks))
+
+
+def _failed_result(resource_group: dict, err: Exception) -> Dict:
+    return {
+        "name": resource_group["name"],
+        "tags": {},
+        "success": False,
+        "requests": 0,
+        "requests_saved": 0,
+        "error": str(err),
+    }
+
+
 def main(
-    tenant_id: str, client_id: str, client_secret: str, subscription_id: str
+    tenant_id: str,
+    client_id: str,
+    client_secret: str,
+    subscription_id: str,
+    use_async: bool = False,
+    concurrency: int = 16,
+    backend: str = "arm",
+    use_batch: bool = False,
+    digest: Optional[DigestCollector] = None,
 ) -> bool:
     """
     This is the main function of project that takes an azure app credentials and perform the actions defined.
@@ -38,6 +189,18 @@ def main(
     :type client_id: str
     :param client_secret: Azure app client secret
     :type client_secret: str
+    :param subscription_id: Azure subscription id
+    :type subscription_id: str
+    :param use_async: Tag resource groups concurrently on an asyncio event loop
+    :type use_async: bool
+    :param concurrency: Maximum number of resource groups tagged at once in async mode
+    :type concurrency: int
+    :param backend: List resource groups from "arm" or Azure Resource Graph ("graph")
+    :type backend: str
+    :param use_batch: Send the tag merges as ARM batch requests of up to 20 PATCHes each
+    :type use_batch: bool
+    :param digest: Collects the tagged groups for the per-owner digest emails
+    :type digest: DigestCollector
     :return: Status of the operation
     :rtype: bool
 
@@ -49,55 +212,275 @@ def main(
             )
     True
     """
-    # Get access token
-    access_token = get_access_token_service_principal(
+    # Get access token; the credential refreshes it through the shared token broker
+    access_token = ServicePrincipalCredential(
         tenant_id=tenant_id, client_id=client_id, client_secret=client_secret
     )
 
-    # Fetch resource groups list
-    resource_groups = get_resource_groups(
+    # Stream groups missing a tag; tagging starts as soon as the first page arrives
+    resource_groups = iter_resource_groups(
+        subscription_id=subscription_id,
+        access_token=access_token,
+        missing_tags=["OwnerEmail", "TTL"],
+        backend=backend,
+    )
+
+    # Remember existing owners, so tagged groups can be reported to them
+    owners = {}
+    resource_groups = (
+        owners.setdefault(resource_group["name"], resource_group)
+        for resource_group in resource_groups
+    )
+
+    # Index resource group creators with one paged activity log scan
+    creator_index = build_resource_group_creator_index(
         subscription_id=subscription_id, access_token=access_token
     )
 
-    # Tag resource groups
-    for resource_group in resource_groups:
-        logger.info(f"Tagging resource group: {resource_group['name']}")
-        owner_email_id = fetch_resource_group_creator_email(
+    # Tag resource groups with at most one merge PATCH each
+    batch_stats = None
+    if use_batch:
+        # A generator keeps the listing lazy: each batch goes out once it is full
+        results, batch_stats = reconcile_resource_group_tags_batch(
             subscription_id=subscription_id,
-            resource_group_name=resource_group["name"],
+            desired_tags_by_group=(
+                (
+                    resource_group,
+                    get_desired_tags(
+                        subscription_id, resource_group, creator_index, access_token
+                    ),
+                )
+                for resource_group in resource_groups
+            ),
             access_token=access_token,
         )
-        # Check if owner email tag is present
-        if not check_resource_group_owner_email_tag(
-            subscription_id=subscription_id,
-            resource_group_name=resource_group["name"],
-            access_token=access_token,
-        ):
-            add_owner_email_tag(
+    elif use_async:
+        results = asyncio.run(
+            tag_resource_groups_async(
                 subscription_id=subscription_id,
-                resource_group_name=resource_group["name"],
-                owner_email=owner_email_id,
+                resource_groups=resource_groups,
+                creator_index=creator_index,
                 access_token=access_token,
+                concurrency=concurrency,
             )
-        # Check if ttl tag is present
-        if not check_resource_group_ttl_tag(
-            subscription_id=subscription_id,
-            resource_group_name=resource_group["name"],
-            access_token=access_token,
-        ):
-            add_ttl_tag(
+        )
+    else:
+        results = [
+            tag_resource_group(
                 subscription_id=subscription_id,
-                resource_group_name=resource_group["name"],
-                ttl_value="7",
+                resource_group=resource_group,
+                creator_index=creator_index,
                 access_token=access_token,
             )
+            for resource_group in resource_groups
+        ]
+
+    if digest is not None:
+        for result in results:
+            if not result["tags"] or not result["success"]:
+                continue
+            owner_email = result["tags"].get("OwnerEmail") or owners[result["name"]][
+                "tags"
+            ].get("OwnerEmail")
+            digest.add(
+                owner_email,
+                "untagged",
+                result["name"],
+                "tagged "
+                + ", ".join(f"{key}={value}" for key, value in result["tags"].items()),
+                subscription_id=subscription_id,
+            )
+
+    summary = summarize_tag_reconciliation(results, batch_stats)
+    logger.info(
+        f"Tagged {summary['patched']} of {summary['resource_groups']} resource groups "
+        f"({summary['failed']} failed) with {summary['requests']} requests, "
+        f"saving {summary['requests_saved']} requests"
+    )
+    for scope, counters in get_rate_limit_governor().stats().items():
+        if scope.startswith(f"{subscription_id.lower()}/"):
+            logger.info(f"ARM rate limits for {scope}: {counters}")
 
     return True
 
 
-if __name__ == "__main__":
-    main(
-        tenant_id=os.getenv("TENANT_ID"),
-        client_id=os.getenv("CLIENT_ID"),
-        client_secret=os.getenv("CLIENT_SECRET"),
+def run_subscription(
+    tenant_id: str,
+    client_id: str,
+    client_secret: str,
+    subscription: Dict[str, str],
+    use_async: bool = False,
+    concurrency: int = 16,
+    digest: Optional[DigestCollector] = None,
+) -> Dict:
+    """
+    Runs main for one subscription and reports its outcome and duration. Errors are
+    captured in the report so one failing subscription never stops the others.
+
+    :param subscription: Subscription with "id" and "name" keys
+    :type subscription: dict
+    :return: Report with the subscription id and name, success flag, duration in seconds and error
+    :rtype: dict
+    """
+    start_time = time.perf_counter()
+    report = {
+        "id": subscription["id"],
+        "name": subscription["name"],
+        "success": False,
+        "seconds": 0.0,
+        "error": None,
+    }
+    try:
+        report["success"] = main(
+            tenant_id=tenant_id,
+            client_id=client_id,
+            client_secret=client_secret,
+            subscription_id=subscription["id"],
+            use_async=use_async,
+            concurrency=concurrency,
+            digest=digest,
+        )
+    except Exception as err:
+        logger.error(f"Subscription {subscription['name']} failed: {err}")
+        report["error"] = str(err)
+    report["seconds"] = time.perf_counter() - start_time
+    return report
+
+
+def _init_subscription_worker(token_cache_path: str) -> None:
+    # Worker processes share tokens through the broker's on-disk cache and must
+    # not reuse pooled connections inherited from the parent process
+    set_default_broker(TokenBroker(cache_path=token_cache_path))
+    configure_arm_client()
+
+
+def run_subscriptions(
+    tenant_id: str,
+    client_id: str,
+    client_secret: str,
+    subscriptions_file: Optional[str] = None,
+    max_workers: int = 8,
+    use_processes: bool = False,
+    use_async: bool = False,
+    concurrency: int = 16,
+    digest: Optional[DigestCollector] = None,
+) -> List[Dict]:
+    """
+    Runs main for many subscriptions in parallel and reports per-subscription timings and outcomes.
+
+    Subscriptions are read from ``subscriptions_file`` (a JSON object mapping
+    display name to subscription id, like data/subscriptions_list.json) or, when
+    no file is given, listed from ARM. Threads share the process-wide token
+    broker; worker processes share it through its on-disk cache.
+
+    :param tenant_id: Azure tenant id
+    :type tenant_id: str
+    :param client_id: Azure app client id
+    :type client_id: str
+    :param client_secret: Azure app client secret
+    :type client_secret: str
+    :param subscriptions_file: JSON file of subscriptions to process, or None to list them from ARM
+    :type subscriptions_file: str
+    :param max_workers: Number of subscriptions processed at once
+    :type max_workers: int
+    :param use_processes: Use a process pool instead of a thread pool
+    :type use_processes: bool
+    :param use_async: Tag resource groups concurrently within each subscription
+    :type use_async: bool
+    :param concurrency: Maximum number of resource groups tagged at once per subscription in async mode
+    :type concurrency: int
+    :param digest: Collects the findings of every subscription for the per-owner digest emails (threads only)
+    :type digest: DigestCollector
+    :return: Report per subscription, in input order
+    :rtype: List[dict]
+    """
+    if use_processes and digest is not None:
+        raise ValueError("Digests can only be collected when running with threads")
+
+    token_cache_path = None
+    broker = get_default_broker()
+    if use_processes:
+        token_cache_path = os.getenv("ACO_TOKEN_CACHE") or os.path.join(
+            tempfile.gettempdir(), f"aco_tokens_{client_id}.json"
+        )
+        broker = TokenBroker(cache_path=token_cache_path)
+    credential = ServicePrincipalCredential(
+        tenant_id=tenant_id,
+        client_id=client_id,
+        client_secret=client_secret,
+        broker=broker,
     )
+
+    # Fetch the token once up front so the workers start from a warm cache
+    credential.get_token()
+
+    if subscriptions_file:
+        subscriptions = read_subscriptions_file(subscriptions_file)
+    else:
+        subscriptions = [
+            subscription
+            for subscription in get_subscriptions(access_token=credential)
+            if subscription["state"] not in ("Disabled", "Deleted")
+        ]
+    logger.info(f"Processing {len(subscriptions)} subscriptions")
+
+    if use_processes:
+        executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_subscription_worker,
+            initargs=(token_cache_path,),
+        )
+    else:
+        # Every thread needs its own pooled connection to avoid reconnecting
+        if get_arm_client().pool_size < max_workers:
+            configure_arm_client(pool_size=max_workers)
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    with executor:
+        futures = [
+            executor.submit(
+                run_subscription,
+                tenant_id,
+                client_id,
+                client_secret,
+                subscription,
+                use_async,
+                concurrency,
+                digest,
+            )
+            for subscription in subscriptions
+        ]
+        reports = [future.result() for future in futures]
+
+    for report in reports:
+        status = "succeeded" if report["success"] else f"failed ({report['error']})"
+        logger.info(
+            f"Subscription {report['name']} ({report['id']}) {status} in {report['seconds']:.1f}s"
+        )
+    return reports
+
+
+if __name__ == "__main__":
+    # Owners get one digest per run when a sender address is configured
+    digest = DigestCollector() if os.getenv("DIGEST_FROM_EMAIL") else None
+    if os.getenv("SUBSCRIPTION_ID"):
+        main(
+            tenant_id=os.getenv("TENANT_ID"),
+            client_id=os.getenv("CLIENT_ID"),
+            client_secret=os.getenv("CLIENT_SECRET"),
+            subscription_id=os.getenv("SUBSCRIPTION_ID"),
+            digest=digest,
+        )
+    else:
+        run_subscriptions(
+            tenant_id=os.getenv("TENANT_ID"),
+            client_id=os.getenv("CLIENT_ID"),
+            client_secret=os.getenv("CLIENT_SECRET"),
+            subscriptions_file=os.getenv(
+                "SUBSCRIPTIONS_FILE", "data/subscriptions_list.json"
+            ),
+            max_workers=int(os.getenv("MAX_WORKERS", 8)),
+            digest=digest,
+        )
+    if digest is not None:
+        send_digests(digest, from_email=os.getenv("DIGEST_FROM_EMAIL"))
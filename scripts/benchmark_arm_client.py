@@ -0,0 +1,106 @@
+"""
+Compares per-call ``requests.get`` with the pooled ``ArmClient`` against a local
+mock ARM server and reports how many connections, and therefore TCP/TLS
+handshakes, each approach opens.
+
+Usage:
+    python scripts/benchmark_arm_client.py --requests 500
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.append(".")
+
+from src.arm import ArmClient
+from src.throttling import RateLimitGovernor
+
+
+class MockArmHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps the connection open between requests, like ARM does
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with MockArmHandler.lock:
+            MockArmHandler.connections += 1
+
+    def do_GET(self):
+        body = json.dumps(
+            {"value": [{"name": "rg", "location": "westeurope", "tags": {}}]}
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(label: str, get, url: str, count: int) -> dict:
+    MockArmHandler.connections = 0
+    start = time.perf_counter()
+    for _ in range(count):
+        get(url).raise_for_status()
+    elapsed = time.perf_counter() - start
+    return {
+        "label": label,
+        "requests": count,
+        "connections": MockArmHandler.connections,
+        "seconds": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockArmHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    path = "/subscriptions/00000000/resourcegroups?api-version=2020-06-01"
+
+    # Measure connection reuse only, without the ARM rate limits pacing the run
+    governor = RateLimitGovernor(read_capacity=args.requests, read_rate=args.requests)
+    client = ArmClient(base_url=base_url, governor=governor)
+    results = [
+        run(
+            "requests.get",
+            lambda url: requests.get(url, headers={"Authorization": "Bearer x"}),
+            base_url + path,
+            args.requests,
+        ),
+        run(
+            "ArmClient",
+            lambda url: client.get(url, access_token="x"),
+            path,
+            args.requests,
+        ),
+    ]
+    client.close()
+    server.shutdown()
+
+    for result in results:
+        print(
+            f"{result['label']:<14} {result['requests']:>6} requests "
+            f"{result['connections']:>6} connections "
+            f"{result['seconds']:>8.3f}s "
+            f"({result['requests'] / result['seconds']:.0f} req/s)"
+        )
+    saved = results[0]["connections"] - results[1]["connections"]
+    print(f"Handshakes saved per run: {saved}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Measures how many Metrics rows per second can be written to SQLite when storing
+a whole fleet analysis, one ORM object per row versus the bulk upsert path, for
+each ``synchronous`` mode.
+
+Usage:
+    python scripts/benchmark_metrics_ingest.py --rows 40000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(".")
+
+from db.bulk import upsert_metrics
+from db.connection_manager import Base, create_db_engine
+from db.models import Metrics
+
+
+def make_rows(count: int, run_date: date):
+    return [
+        {
+            "resource_id": f"/subscriptions/s/resourcegroups/rg/providers/microsoft.compute/virtualmachines/vm-{i}",
+            "run_date": run_date,
+            "resource_name": f"vm-{i}",
+            "resource_type": "Microsoft.Compute/virtualMachines",
+            "current_sku": "Standard_D4s_v3",
+            "cpu_weight_avg": random.randint(0, 100),
+            "cpu_weight_peak": random.randint(0, 100),
+            "memory_weight_avg": random.randint(0, 100),
+            "memory_weight_peak": random.randint(0, 100),
+            "current_weightage": random.randint(0, 100),
+            "suggested_sku": "Standard_D2s_v3",
+        }
+        for i in range(count)
+    ]
+
+
+def run(synchronous: str, rows, per_row: bool) -> float:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_db_engine(
+            f"sqlite:///{os.path.join(directory, 'aco.db')}", synchronous=synchronous
+        )
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        start = time.perf_counter()
+        if per_row:
+            for row in rows:
+                session.add(Metrics(**row))
+                session.commit()
+        else:
+            upsert_metrics(session, rows)
+        elapsed = time.perf_counter() - start
+        session.close()
+        engine.dispose()
+    return len(rows) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=40000)
+    parser.add_argument(
+        "--per-row-rows",
+        type=int,
+        default=2000,
+        help="Rows written by the slow one-object-per-row path",
+    )
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows, date.today())
+    for synchronous in ("FULL", "NORMAL", "OFF"):
+        per_row = run(synchronous, rows[: args.per_row_rows], per_row=True)
+        bulk = run(synchronous, rows, per_row=False)
+        print(
+            f"synchronous={synchronous:<6} per-row ORM: {per_row:>10,.0f} rows/s   "
+            f"bulk upsert: {bulk:>10,.0f} rows/s   ({bulk / per_row:,.0f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@ import sys
 
 sys.path.append(".")
 
-from db.connection_manager import engine, Base
+from db.connection_manager import init_db
 
-# Create the database tables
-Base.metadata.create_all(bind=engine)
+# Create the database tables, or update those of an older version
+init_db()
@@ -0,0 +1,98 @@
+import logging
+from datetime import datetime
+from typing import Dict, Iterator, Optional
+
+from db.activity_store import ACTIVITY_LOG_RETENTION_DAYS, ActivityStore
+from .arm import get_arm_client
+from .streaming import iter_paged_items
+
+# Set logger
+logger = logging.getLogger(__name__)
+
+ACTIVITY_LOG_API_VERSION = "2017-03-01-preview"
+
+
+def _parse_timestamp(value: str) -> datetime:
+    # Activity log timestamps are UTC with up to 7 fractional digits
+    value = value.rstrip("Z").split("+")[0]
+    head, _, fraction = value.partition(".")
+    return datetime.fromisoformat(f"{head}.{fraction[:6].ljust(6, '0')}")
+
+
+def iter_activity_events(
+    subscription_id: str, access_token, start_time: datetime, end_time: datetime
+) -> Iterator[Dict]:
+    """
+    Lazily yields the successful writes and actions of a subscription's activity log, page by page.
+
+    Args:
+        subscription_id (str): The ID of the subscription to read the activity log of.
+        access_token (str): The access token (or ServicePrincipalCredential) to use for authentication.
+        start_time (datetime): Start of the window (UTC).
+        end_time (datetime): End of the window (UTC).
+
+    Raises:
+        requests.exceptions.RequestException: If there is an error retrieving a page.
+
+    Returns:
+        Iterator[Dict]: Events with "resource_id", "timestamp", "operation" and "caller" keys.
+    """
+    url = f"/subscriptions/{subscription_id}/providers/microsoft.insights/eventtypes/management/values"
+    params = {
+        "api-version": ACTIVITY_LOG_API_VERSION,
+        "$filter": (
+            f"eventTimestamp ge '{start_time.strftime('%Y-%m-%dT%H:%M:%SZ')}'"
+            f" and eventTimestamp le '{end_time.strftime('%Y-%m-%dT%H:%M:%SZ')}'"
+        ),
+        "$select": "eventTimestamp,operationName,resourceId,caller,status",
+    }
+    # Events are parsed from the socket one at a time; only the kept ones are passed on
+    for event in iter_paged_items(
+        url, access_token, params=params, client=get_arm_client()
+    ):
+        operation = (event.get("operationName") or {}).get("value") or ""
+        status = (event.get("status") or {}).get("value")
+        if status != "Succeeded" or not event.get("resourceId"):
+            continue
+        if not operation.lower().endswith(("/write", "/action")):
+            continue
+        yield {
+            "resource_id": event["resourceId"],
+            "timestamp": _parse_timestamp(event["eventTimestamp"]),
+            "operation": operation,
+            "caller": event.get("caller"),
+        }
+
+
+def ingest_activity_log(
+    subscription_id: str,
+    access_token,
+    store: ActivityStore,
+    initial_days: int = ACTIVITY_LOG_RETENTION_DAYS,
+    now: Optional[datetime] = None,
+) -> int:
+    """
+    Reads the activity log of a subscription from the store's watermark and updates its last-activity index.
+
+    :param subscription_id: Azure subscription ID.
+    :param access_token: Azure access token or ServicePrincipalCredential.
+    :param store: db.ActivityStore to update.
+    :param initial_days: Days of history read for a subscription not ingested before.
+    :param now: Current UTC time.
+    :return: Number of resources whose last activity was written.
+    """
+    start_time, end_time = store.fetch_window(
+        subscription_id, initial_days=initial_days, now=now
+    )
+    # Only the newest event per resource is kept, however long the window is
+    written = store.record(
+        subscription_id,
+        iter_activity_events(subscription_id, access_token, start_time, end_time),
+    )
+    # The watermark only moves once the whole window is in
+    store.set_watermark(subscription_id, end_time)
+    logger.info(
+        f"Indexed activity of {written} resources of {subscription_id} "
+        f"from {start_time:%Y-%m-%d %H:%M} to {end_time:%Y-%m-%d %H:%M}"
+    )
+    return written
@@ -0,0 +1,283 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from typing import Dict, Optional, Tuple, Union
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from .auth import resolve_access_token, resolve_access_token_async
+from .throttling import RateLimitGovernor, get_rate_limit_governor
+
+# Set logger
+logger = logging.getLogger(__name__)
+
+# Azure Resource Manager endpoint, overridable for sovereign clouds and local mocks
+ARM_ENDPOINT = "https://management.azure.com"
+
+
+def _absolute_url(base_url: str, path: str) -> str:
+    if path.startswith("http://") or path.startswith("https://"):
+        return path
+    return f"{base_url}/{path.lstrip('/')}"
+
+
+class ArmClient:
+    """
+    HTTP client for Azure Resource Manager backed by a single pooled session.
+
+    Connections to the endpoint are kept alive and reused between calls, so a
+    run pays for the TCP and TLS handshakes once per pooled connection instead
+    of once per request. Relative paths are resolved against ``base_url``;
+    absolute URLs (e.g. ``nextLink`` values) are used as they are. Requests are
+    paced and retried by a :class:`RateLimitGovernor`.
+
+    Args:
+        base_url (str): ARM endpoint. Defaults to ``ARM_ENDPOINT`` env var or management.azure.com.
+        pool_size (int): Number of keep-alive connections kept per host.
+        timeout (float or tuple): Default (connect, read) timeout in seconds.
+        governor (RateLimitGovernor): Rate-limit governor. Defaults to the process-wide governor.
+
+    Example:
+    >>> client = ArmClient(pool_size=20)
+    >>> client.get(f"/subscriptions/{subscription_id}/resourcegroups?api-version=2020-06-01", access_token=token)
+    <Response [200]>
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        pool_size: int = 10,
+        timeout: Union[float, Tuple[float, float]] = (10, 60),
+        governor: Optional[RateLimitGovernor] = None,
+    ):
+        self.base_url = (base_url or os.getenv("ARM_ENDPOINT", ARM_ENDPOINT)).rstrip(
+            "/"
+        )
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.governor = governor or get_rate_limit_governor()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def url(self, path: str) -> str:
+        """
+        Returns the absolute URL for a path relative to the ARM endpoint.
+        """
+        return _absolute_url(self.base_url, path)
+
+    @staticmethod
+    def headers(access_token, headers: Optional[Dict[str, str]] = None) -> Dict:
+        """
+        Builds the request headers, including the bearer token for the given
+        access token string or credential.
+        """
+        request_headers = {
+            "Authorization": f"Bearer {resolve_access_token(access_token)}"
+        }
+        if headers:
+            request_headers.update(headers)
+        return request_headers
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        access_token,
+        headers: Optional[Dict[str, str]] = None,
+        **kwargs,
+    ) -> requests.Response:
+        """
+        Sends a request to ARM through the pooled session, waiting for the rate
+        limiter and retrying throttled and transient failures.
+
+        Raises:
+            requests.exceptions.RequestException: If the request could not be sent.
+
+        Returns:
+            requests.Response: The last response, whatever its status code.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        url = self.url(path)
+        attempt = 0
+        while True:
+            time.sleep(self.governor.acquire(method, url))
+            try:
+                response = self.session.request(
+                    method, url, headers=self.headers(access_token, headers), **kwargs
+                )
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ):
+                delay = self.governor.retry_delay(method, url, None, {}, attempt)
+                if delay is None:
+                    raise
+            else:
+                delay = self.governor.retry_delay(
+                    method, url, response.status_code, response.headers, attempt
+                )
+                if delay is None:
+                    return response
+                # Release the connection of a streamed response before retrying
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, path: str, access_token, **kwargs) -> requests.Response:
+        return self.request("GET", path, access_token, **kwargs)
+
+    def post(self, path: str, access_token, **kwargs) -> requests.Response:
+        return self.request("POST", path, access_token, **kwargs)
+
+    def put(self, path: str, access_token, **kwargs) -> requests.Response:
+        return self.request("PUT", path, access_token, **kwargs)
+
+    def patch(self, path: str, access_token, **kwargs) -> requests.Response:
+        return self.request("PATCH", path, access_token, **kwargs)
+
+    def delete(self, path: str, access_token, **kwargs) -> requests.Response:
+        return self.request("DELETE", path, access_token, **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class AsyncArmClient:
+    """
+    asyncio counterpart of :class:`ArmClient` backed by a pooled aiohttp session.
+
+    Use it as an async context manager so the session and its connections are
+    closed once the work is done. Responses are read before they are returned,
+    so ``await response.json()`` can be called after the request completes.
+
+    Args:
+        base_url (str): ARM endpoint. Defaults to ``ARM_ENDPOINT`` env var or management.azure.com.
+        pool_size (int): Maximum number of simultaneous connections.
+        timeout (float): Total timeout for a request in seconds.
+        governor (RateLimitGovernor): Rate-limit governor. Defaults to the process-wide governor.
+
+    Example:
+    >>> async with AsyncArmClient(pool_size=32) as client:
+    ...     response = await client.get(path, access_token=credential)
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        pool_size: int = 10,
+        timeout: float = 60,
+        governor: Optional[RateLimitGovernor] = None,
+    ):
+        self.base_url = (base_url or os.getenv("ARM_ENDPOINT", ARM_ENDPOINT)).rstrip(
+            "/"
+        )
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.governor = governor or get_rate_limit_governor()
+        self.session = None
+
+    async def __aenter__(self) -> "AsyncArmClient":
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.pool_size),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.session.close()
+
+    def url(self, path: str) -> str:
+        return _absolute_url(self.base_url, path)
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        access_token,
+        headers: Optional[Dict[str, str]] = None,
+        **kwargs,
+    ) -> aiohttp.ClientResponse:
+        """
+        Sends a request to ARM through the pooled session and reads the body,
+        waiting for the rate limiter and retrying throttled and transient failures.
+
+        Raises:
+            aiohttp.ClientError: If the request could not be sent.
+
+        Returns:
+            aiohttp.ClientResponse: The last response, whatever its status code.
+        """
+        url = self.url(path)
+        attempt = 0
+        while True:
+            await asyncio.sleep(self.governor.acquire(method, url))
+            request_headers = {
+                "Authorization": f"Bearer {await resolve_access_token_async(access_token)}"
+            }
+            if headers:
+                request_headers.update(headers)
+            try:
+                async with self.session.request(
+                    method, url, headers=request_headers, **kwargs
+                ) as response:
+                    await response.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                delay = self.governor.retry_delay(method, url, None, {}, attempt)
+                if delay is None:
+                    raise
+            else:
+                delay = self.governor.retry_delay(
+                    method, url, response.status, response.headers, attempt
+                )
+                if delay is None:
+                    return response
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def get(self, path: str, access_token, **kwargs) -> aiohttp.ClientResponse:
+        return await self.request("GET", path, access_token, **kwargs)
+
+    async def patch(self, path: str, access_token, **kwargs) -> aiohttp.ClientResponse:
+        return await self.request("PATCH", path, access_token, **kwargs)
+
+    async def delete(self, path: str, access_token, **kwargs) -> aiohttp.ClientResponse:
+        return await self.request("DELETE", path, access_token, **kwargs)
+
+
+_arm_client = None
+_arm_client_lock = threading.Lock()
+
+
+def get_arm_client() -> ArmClient:
+    """
+    Returns the process-wide ARM client, creating it on first use. The pool size
+    and read timeout can be set with the ``ARM_POOL_SIZE`` and ``ARM_TIMEOUT``
+    env vars.
+    """
+    global _arm_client
+    with _arm_client_lock:
+        if _arm_client is None:
+            _arm_client = ArmClient(
+                pool_size=int(os.getenv("ARM_POOL_SIZE", 10)),
+                timeout=(10, float(os.getenv("ARM_TIMEOUT", 60))),
+            )
+        return _arm_client
+
+
+def configure_arm_client(**kwargs) -> ArmClient:
+    """
+    Replaces the process-wide ARM client, e.g. to raise the pool size before
+    fanning out over threads. Accepts the same arguments as :class:`ArmClient`.
+    """
+    global _arm_client
+    with _arm_client_lock:
+        if _arm_client is not None:
+            _arm_client.close()
+        _arm_client = ArmClient(**kwargs)
+        return _arm_client
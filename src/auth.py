@@ -1,3 +1,12 @@
+# Imports: standard libraries
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Optional, Tuple, Union
+
 # Imports: pypi libraries
 import requests
 import logging
@@ -6,34 +15,336 @@ import adal
 # Set logger
 logger = logging.getLogger(__name__)
 
+# Default resource (audience) for Azure Resource Manager tokens
+ARM_RESOURCE = "https://management.azure.com/"
 
-def get_access_token_service_principal(
-    tenant_id: str, client_id: str, client_secret: str
-) -> str:
+
+def request_token_service_principal(
+    tenant_id: str, client_id: str, client_secret: str, resource: str = ARM_RESOURCE
+) -> Dict:
     """
-    This function gets an access token from Azure AD.
+    This function requests a new access token from Azure AD and keeps its expiry.
 
     :param tenant_id: Azure tenant id
     :type tenant_id: str
-    :param client_id: Azure app client id0p;
+    :param client_id: Azure app client id
     :type client_id: str
     :param client_secret: Azure app client secret
     :type client_secret: str
-    :return: Access token
-    :rtype: str
+    :param resource: Resource (audience) the token is issued for
+    :type resource: str
+    :return: Dictionary with the access token and its expiry as a unix timestamp
+    :rtype: dict
+    :raises requests.exceptions.RequestException: If the token request fails
     """
     url = f"https://login.microsoftonline.com/{tenant_id}/oauth2/token"
     data = {
         "grant_type": "client_credentials",
         "client_id": client_id,
         "client_secret": client_secret,
-        "resource": "https://management.azure.com/",
+        "resource": resource,
     }
 
+    response = requests.post(url, data=data)
+    response.raise_for_status()
+    token_data = response.json()
+
+    # Azure AD returns both values as strings; prefer the absolute expiry
+    if token_data.get("expires_on"):
+        expires_on = float(token_data["expires_on"])
+    else:
+        expires_on = time.time() + float(token_data.get("expires_in", 0))
+
+    return {"access_token": token_data["access_token"], "expires_on": expires_on}
+
+
+class TokenBroker:
+    """
+    Cache of access tokens keyed by (tenant_id, client_id, resource).
+
+    Tokens are refreshed ``refresh_margin`` seconds before they expire. Callers
+    asking for the same key at the same time, from threads or from an asyncio
+    event loop, share a single refresh. When ``cache_path`` is set the tokens
+    are also persisted to disk, so a short-lived process can reuse a token that
+    is still valid instead of requesting a new one.
+
+    Example:
+    >>> broker = TokenBroker(cache_path="/tmp/aco_tokens.json")
+    >>> broker.get_token(tenant_id, client_id, client_secret)
+    'eyJ0eXAiOiJKV1QiLCJhbGciOi...'
+    """
+
+    def __init__(self, cache_path: Optional[str] = None, refresh_margin: int = 300):
+        self.cache_path = cache_path
+        self.refresh_margin = refresh_margin
+        self.refresh_count = 0
+        self._tokens: Dict[Tuple[str, str, str], Dict] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Tuple[str, str, str], threading.Lock] = {}
+        self._async_refreshes: Dict[Tuple[str, str, str], asyncio.Future] = {}
+        if self.cache_path:
+            self._load()
+
+    def _is_fresh(self, token: Optional[Dict]) -> bool:
+        return bool(token) and token["expires_on"] - self.refresh_margin > time.time()
+
+    def _cached(self, key: Tuple[str, str, str]) -> Optional[str]:
+        token = self._tokens.get(key)
+        if self._is_fresh(token):
+            return token["access_token"]
+        return None
+
+    def _key_lock(self, key: Tuple[str, str, str]) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get_token(
+        self,
+        tenant_id: str,
+        client_id: str,
+        client_secret: str,
+        resource: str = ARM_RESOURCE,
+    ) -> str:
+        """
+        Returns a valid access token, requesting a new one only when needed.
+
+        :raises requests.exceptions.RequestException: If the token request fails
+        """
+        key = (tenant_id, client_id, resource)
+        access_token = self._cached(key)
+        if access_token:
+            return access_token
+
+        with self._key_lock(key):
+            # Another caller may have refreshed the token while we waited
+            access_token = self._cached(key)
+            if access_token:
+                return access_token
+
+            token = request_token_service_principal(
+                tenant_id=tenant_id,
+                client_id=client_id,
+                client_secret=client_secret,
+                resource=resource,
+            )
+            with self._lock:
+                self._tokens[key] = token
+                self.refresh_count += 1
+                if self.cache_path:
+                    self._save()
+            logger.info("Successfully refreshed access token")
+            return token["access_token"]
+
+    async def get_token_async(
+        self,
+        tenant_id: str,
+        client_id: str,
+        client_secret: str,
+        resource: str = ARM_RESOURCE,
+    ) -> str:
+        """
+        Coroutine version of :meth:`get_token` that does not block the event loop.
+        """
+        key = (tenant_id, client_id, resource)
+        access_token = self._cached(key)
+        if access_token:
+            return access_token
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            future = self._async_refreshes.get(key)
+            if future is None or future.done() or future.get_loop() is not loop:
+                future = loop.run_in_executor(
+                    None, self.get_token, tenant_id, client_id, client_secret, resource
+                )
+                self._async_refreshes[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            with self._lock:
+                if future.done() and self._async_refreshes.get(key) is future:
+                    del self._async_refreshes[key]
+
+    def invalidate(
+        self, tenant_id: str, client_id: str, resource: str = ARM_RESOURCE
+    ) -> None:
+        """
+        Drops a cached token, e.g. after the API rejected it with a 401.
+        """
+        with self._lock:
+            self._tokens.pop((tenant_id, client_id, resource), None)
+            if self.cache_path:
+                self._save()
+
+    def _load(self) -> None:
+        try:
+            with open(self.cache_path, "r") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as err:
+            logger.warning(f"Ignoring unreadable token cache {self.cache_path}: {err}")
+            return
+
+        for key, token in data.items():
+            tenant_id, client_id, resource = key.split("|", 2)
+            if self._is_fresh(token):
+                self._tokens[(tenant_id, client_id, resource)] = token
+
+    def _save(self) -> None:
+        data = {
+            "|".join(key): token
+            for key, token in self._tokens.items()
+            if self._is_fresh(token)
+        }
+        temp_path = None
+        try:
+            # A unique temp file per save lets processes sharing the cache replace it
+            # atomically; mkstemp also keeps the bearer tokens readable by the owner only
+            fd, temp_path = tempfile.mkstemp(
+                dir=os.path.dirname(os.path.abspath(self.cache_path)),
+                prefix=f"{os.path.basename(self.cache_path)}.",
+                suffix=".tmp",
+            )
+            with os.fdopen(fd, "w") as file:
+                json.dump(data, file)
+            os.replace(temp_path, self.cache_path)
+        except OSError as err:
+            logger.warning(f"Failed to persist token cache {self.cache_path}: {err}")
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+_default_broker = None
+_default_broker_lock = threading.Lock()
+
+
+def get_default_broker() -> TokenBroker:
+    """
+    Returns the process-wide token broker. Set ``ACO_TOKEN_CACHE`` to a file path
+    to persist its tokens between runs.
+    """
+    global _default_broker
+    with _default_broker_lock:
+        if _default_broker is None:
+            _default_broker = TokenBroker(cache_path=os.getenv("ACO_TOKEN_CACHE"))
+        return _default_broker
+
+
+def set_default_broker(broker: TokenBroker) -> None:
+    """
+    Replaces the process-wide token broker, e.g. in worker processes that share a token cache file.
+    """
+    global _default_broker
+    with _default_broker_lock:
+        _default_broker = broker
+
+
+class ServicePrincipalCredential:
+    """
+    Service principal credentials bound to a :class:`TokenBroker`.
+
+    Instances can be passed wherever an ``access_token`` string is accepted; the
+    token is looked up from the broker on every use, so long runs never hold on
+    to an expired token.
+    """
+
+    def __init__(
+        self,
+        tenant_id: str,
+        client_id: str,
+        client_secret: str,
+        resource: str = ARM_RESOURCE,
+        broker: Optional[TokenBroker] = None,
+    ):
+        self.tenant_id = tenant_id
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.resource = resource
+        self.broker = broker or get_default_broker()
+
+    def get_token(self) -> str:
+        return self.broker.get_token(
+            self.tenant_id, self.client_id, self.client_secret, self.resource
+        )
+
+    async def get_token_async(self) -> str:
+        return await self.broker.get_token_async(
+            self.tenant_id, self.client_id, self.client_secret, self.resource
+        )
+
+    def invalidate(self) -> None:
+        self.broker.invalidate(self.tenant_id, self.client_id, self.resource)
+
+    def with_resource(self, resource: str) -> "ServicePrincipalCredential":
+        """
+        Returns the same credentials for another audience, sharing the broker.
+        """
+        return ServicePrincipalCredential(
+            self.tenant_id, self.client_id, self.client_secret, resource, self.broker
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"ServicePrincipalCredential(tenant_id={self.tenant_id!r}, "
+            f"client_id={self.client_id!r}, resource={self.resource!r})"
+        )
+
+
+def resolve_access_token(
+    access_token: Union[str, ServicePrincipalCredential]
+) -> Optional[str]:
+    """
+    Returns the bearer token for either a raw access token string or a credential
+    object exposing ``get_token()``.
+
+    :param access_token: Access token string or credential
+    :type access_token: str or ServicePrincipalCredential
+    :return: Access token
+    :rtype: str
+    """
+    if hasattr(access_token, "get_token"):
+        return access_token.get_token()
+    return access_token
+
+
+async def resolve_access_token_async(
+    access_token: Union[str, ServicePrincipalCredential]
+) -> Optional[str]:
+    """
+    Coroutine version of :func:`resolve_access_token`.
+    """
+    if hasattr(access_token, "get_token_async"):
+        return await access_token.get_token_async()
+    return resolve_access_token(access_token)
+
+
+def get_access_token_service_principal(
+    tenant_id: str,
+    client_id: str,
+    client_secret: str,
+    broker: Optional[TokenBroker] = None,
+) -> str:
+    """
+    This function gets an access token from Azure AD.
+
+    :param tenant_id: Azure tenant id
+    :type tenant_id: str
+    :param client_id: Azure app client id
+    :type client_id: str
+    :param client_secret: Azure app client secret
+    :type client_secret: str
+    :param broker: Token broker to reuse cached tokens from (default: process-wide broker)
+    :type broker: TokenBroker
+    :return: Access token
+    :rtype: str
+    """
+    broker = broker or get_default_broker()
+
     try:
-        response = requests.post(url, data=data)
-        response.raise_for_status()
-        access_token = response.json()["access_token"]
+        access_token = broker.get_token(
+            tenant_id=tenant_id, client_id=client_id, client_secret=client_secret
+        )
         logger.info("Successfully retrieved access token")
         return access_token
     except requests.exceptions.HTTPError as err:
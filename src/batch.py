@@ -0,0 +1,179 @@
+import time
+import uuid
+import random
+import logging
+from typing import Dict, List, Optional
+
+import requests
+
+from .arm import ArmClient, get_arm_client
+from .throttling import RETRYABLE_STATUS_CODES, parse_retry_after
+
+# Set logger
+logger = logging.getLogger(__name__)
+
+BATCH_URL = "/batch?api-version=2020-06-01"
+
+# Number of operations sent per batch request
+DEFAULT_BATCH_SIZE = 20
+
+
+class ArmBatch:
+    """
+    Groups ARM GET/PATCH/PUT/DELETE operations into ``batch`` requests.
+
+    Operations are queued with :meth:`add` and sent by :meth:`execute`, up to
+    ``batch_size`` per round trip. Each sub-response is matched back to its
+    operation by name; sub-requests that were throttled or failed transiently
+    are retried on their own, with the rest of the batch left untouched.
+
+    Args:
+        access_token (str): The access token (or ServicePrincipalCredential) to use for authentication.
+        batch_size (int): Number of operations per batch request, at most 500.
+        max_retries (int): Maximum number of times a failed sub-request is retried.
+        poll_interval (float): Seconds between polls when ARM accepts a batch asynchronously.
+        backoff_base (float): Base delay in seconds of the jittered backoff between retries.
+        client (ArmClient): ARM client to send the batches with. Defaults to the process-wide client.
+
+    Example:
+    >>> batch = ArmBatch(access_token=credential)
+    >>> name = batch.add("GET", f"/subscriptions/{subscription_id}/resourcegroups/rg?api-version=2021-04-01")
+    >>> batch.execute()[name]["status"]
+    200
+    """
+
+    def __init__(
+        self,
+        access_token,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_retries: int = 3,
+        poll_interval: float = 2,
+        backoff_base: float = 1,
+        client: Optional[ArmClient] = None,
+    ):
+        if not 1 <= batch_size <= 500:
+            raise ValueError("Batch size must be between 1 and 500")
+        self.access_token = access_token
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.poll_interval = poll_interval
+        self.backoff_base = backoff_base
+        self.client = client or get_arm_client()
+        self.round_trips = 0
+        self.operations_sent = 0
+        self.retries = 0
+        self._operations: Dict[str, Dict] = {}
+
+    def add(
+        self,
+        method: str,
+        url: str,
+        content: Optional[Dict] = None,
+        name: Optional[str] = None,
+    ) -> str:
+        """
+        Queues an operation and returns the name its result is keyed by.
+        """
+        name = name or str(uuid.uuid4())
+        if name in self._operations:
+            raise ValueError(f"Duplicate batch operation name: {name}")
+        operation = {
+            "httpMethod": method.upper(),
+            "url": self.client.url(url),
+            "name": name,
+        }
+        if content is not None:
+            operation["content"] = content
+        self._operations[name] = operation
+        return name
+
+    def execute(self) -> Dict[str, Dict]:
+        """
+        Sends every queued operation and returns the results keyed by operation name.
+
+        Returns:
+            Dict[str, Dict]: For each operation, its "status" (None if no response was received),
+            "content" and "headers".
+        """
+        results = {}
+        pending = list(self._operations)
+        self.operations_sent += len(pending)
+        attempt = 0
+        while pending:
+            retry = []
+            delay = 0.0
+            for start in range(0, len(pending), self.batch_size):
+                names = pending[start : start + self.batch_size]
+                responses = self._send([self._operations[name] for name in names])
+                for name in names:
+                    response = responses.get(name, {})
+                    status = response.get("httpStatusCode")
+                    headers = response.get("headers") or {}
+                    results[name] = {
+                        "status": status,
+                        "content": response.get("content"),
+                        "headers": headers,
+                    }
+                    if status is None or status in RETRYABLE_STATUS_CODES:
+                        retry.append(name)
+                        delay = max(
+                            delay, parse_retry_after(headers.get("Retry-After")) or 0
+                        )
+
+            if not retry or attempt >= self.max_retries:
+                break
+            attempt += 1
+            self.retries += len(retry)
+            if not delay:
+                delay = random.uniform(0, self.backoff_base * 2**attempt)
+            logger.info(
+                f"Retrying {len(retry)} failed batch operations in {delay:.1f}s (attempt {attempt})"
+            )
+            time.sleep(delay)
+            pending = retry
+
+        self._operations.clear()
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the totals of every :meth:`execute` so far: "operations" sent,
+        batch "round_trips" (including async polls) and sub-request "retries".
+        """
+        return {
+            "operations": self.operations_sent,
+            "round_trips": self.round_trips,
+            "retries": self.retries,
+        }
+
+    def _send(self, operations: List[Dict]) -> Dict[str, Dict]:
+        try:
+            response = self.client.post(
+                BATCH_URL, access_token=self.access_token, json={"requests": operations}
+            )
+            self.round_trips += 1
+            response.raise_for_status()
+
+            # Large batches may be processed asynchronously
+            while response.status_code == 202:
+                time.sleep(
+                    parse_retry_after(response.headers.get("Retry-After"))
+                    or self.poll_interval
+                )
+                response = self.client.get(
+                    response.headers["Location"], access_token=self.access_token
+                )
+                self.round_trips += 1
+                response.raise_for_status()
+            data = response.json()
+        except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+            logger.error(f"Batch request failed: {e}")
+            return {}
+
+        responses = data.get("responses", [])
+        if all(item.get("name") for item in responses):
+            return {item["name"]: item for item in responses}
+        # Responses come back in request order when names are not echoed
+        return {
+            operation["name"]: item for operation, item in zip(operations, responses)
+        }
@@ -0,0 +1,193 @@
+import os
+import logging
+import importlib
+import threading
+from collections import defaultdict
+from functools import lru_cache
+from string import Formatter
+from typing import Dict, List, Optional, Tuple
+
+from .send_email import MailDispatcher, build_message, get_mail_dispatcher
+
+# Set logger
+logger = logging.getLogger(__name__)
+
+# Section heading of each kind of finding, in the order they appear in a digest
+FINDING_KINDS = {
+    "untagged": "Resource groups that were missing the OwnerEmail or TTL tag",
+    "expired": "Resource groups whose TTL has expired",
+    "resize": "Virtual machines that can be resized",
+}
+
+# A compiled template is its (literal text, field name) pairs
+CompiledTemplate = Tuple[Tuple[str, Optional[str]], ...]
+
+
+@lru_cache(maxsize=None)
+def load_template(
+    module_name: str = "data.email_template",
+) -> Tuple[str, CompiledTemplate]:
+    """
+    Loads an email template module (with ``subject`` and ``body``) and compiles its body once.
+
+    :param module_name: Module holding the template, e.g. data.email_template.
+    :return: The subject and the compiled body.
+    """
+    module = importlib.import_module(module_name)
+    compiled = tuple(
+        (literal, field_name)
+        for literal, field_name, _, _ in Formatter().parse(module.body)
+    )
+    return module.subject, compiled
+
+
+def render_template(template: CompiledTemplate, values: Dict[str, str]) -> str:
+    """
+    Fills a compiled template. Placeholders without a value are left out.
+    """
+    return "".join(
+        literal + (str(values.get(field_name, "")) if field_name else "")
+        for literal, field_name in template
+    )
+
+
+class DigestCollector:
+    """
+    Collects the findings of a run and groups them by owner, so each owner gets one email.
+
+    Findings can be added from several threads at once.
+
+    Example:
+    >>> digest = DigestCollector()
+    >>> digest.add("owner@example.com", "resize", "vm-1", "Standard_D4s_v3 -> Standard_D2s_v3")
+    >>> send_digests(digest, from_email="aco@example.com")
+    """
+
+    def __init__(self):
+        self._findings: Dict[str, List[Dict[str, str]]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def add(
+        self,
+        owner_email: Optional[str],
+        kind: str,
+        resource_name: str,
+        detail: str = "",
+        subscription_id: str = "",
+    ) -> None:
+        """
+        Records a finding. Findings without an owner email are dropped, since nobody can be told.
+        """
+        if kind not in FINDING_KINDS:
+            raise ValueError(f"Unknown finding kind: {kind}")
+        if not owner_email:
+            logger.debug(f"No owner to notify about {kind} finding on {resource_name}")
+            return
+        with self._lock:
+            self._findings[owner_email.strip().lower()].append(
+                {
+                    "kind": kind,
+                    "resource_name": resource_name,
+                    "detail": detail,
+                    "subscription_id": subscription_id,
+                }
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(findings) for findings in self._findings.values())
+
+    def by_owner(self) -> Dict[str, List[Dict[str, str]]]:
+        """
+        Returns a copy of the findings keyed by lower-cased owner email.
+        """
+        with self._lock:
+            return {owner: list(findings) for owner, findings in self._findings.items()}
+
+
+def _receiver_name(owner_email: str) -> str:
+    local_part = owner_email.split("@")[0]
+    return " ".join(
+        part.capitalize() for part in local_part.replace("_", ".").split(".")
+    )
+
+
+def format_findings(findings: List[Dict[str, str]]) -> str:
+    """
+    Formats an owner's findings as one section per kind.
+    """
+    sections = []
+    for kind, heading in FINDING_KINDS.items():
+        lines = [
+            f"  - {finding['resource_name']}"
+            + (f" ({finding['subscription_id']})" if finding["subscription_id"] else "")
+            + (f": {finding['detail']}" if finding["detail"] else "")
+            for finding in findings
+            if finding["kind"] == kind
+        ]
+        if lines:
+            sections.append(f"{heading}:\n" + "\n".join(lines))
+    return "\n\n".join(sections)
+
+
+def build_digest_messages(
+    digest: DigestCollector,
+    from_email: str,
+    sender_name: Optional[str] = None,
+    template_module: str = "data.email_template",
+) -> List:
+    """
+    Renders one message per owner from the cached template.
+
+    :param digest: Findings of the run.
+    :param from_email: Sender address.
+    :param sender_name: Name signed under the message. Defaults to the SENDER_NAME env var.
+    :param template_module: Module holding the template.
+    :return: One EmailMessage per owner.
+    """
+    subject, template = load_template(template_module)
+    sender_name = sender_name or os.environ.get(
+        "SENDER_NAME", "Resource Optimization Team"
+    )
+    return [
+        build_message(
+            subject,
+            render_template(
+                template,
+                {
+                    "reciever_name": _receiver_name(owner_email),
+                    "unused_resources": format_findings(findings),
+                    "sender_name": sender_name,
+                },
+            ),
+            from_email,
+            [owner_email],
+        )
+        for owner_email, findings in sorted(digest.by_owner().items())
+    ]
+
+
+def send_digests(
+    digest: DigestCollector,
+    from_email: str,
+    dispatcher: Optional[MailDispatcher] = None,
+    **kwargs,
+) -> List[Dict]:
+    """
+    Sends one digest per owner through a pooled mail dispatcher.
+
+    :param digest: Findings of the run.
+    :param from_email: Sender address.
+    :param dispatcher: Dispatcher to send with. Defaults to the one configured by the SMTP_* env vars.
+    :param kwargs: Passed on to build_digest_messages.
+    :return: The outcome of each message.
+    """
+    messages = build_digest_messages(digest, from_email, **kwargs)
+    if not messages:
+        return []
+    outcomes = (dispatcher or get_mail_dispatcher()).send_many(messages)
+    logger.info(
+        f"Sent {sum(outcome['success'] for outcome in outcomes)} of {len(messages)} digests "
+        f"covering {len(digest)} findings"
+    )
+    return outcomes
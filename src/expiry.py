@@ -0,0 +1,268 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from db.models import ResourceGroupExpiry
+from .digest import DigestCollector
+from .lro import OperationTracker
+from .resources.resource_group import (
+    delete_resource_group,
+    get_resource_group,
+    iter_resource_groups,
+)
+
+# Set logger
+logger = logging.getLogger(__name__)
+
+
+def _parse_time(value: str) -> datetime:
+    value = value.replace("Z", "+00:00")
+    # ARM sends up to 7 fractional digits, more than fromisoformat accepts
+    head, dot, tail = value.partition(".")
+    if dot:
+        digits = len(tail) - len(tail.lstrip("0123456789"))
+        value = f"{head}.{tail[:min(digits, 6)]}{tail[digits:]}"
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+class ExpiryScheduler:
+    """
+    Acts on the TTL tag of resource groups: owners are notified when a group
+    expires, and the group is deleted after a grace period.
+
+    The schedule lives in the resource_group_expiries table, ordered by the
+    indexed next_action_at column. A run only reads the groups that are due,
+    so its cost grows with the number of expired groups, not the number of
+    groups tracked. :meth:`sync` refreshes the schedule from one listing of a
+    subscription's TTL-tagged groups, with their creation time from
+    ``$expand=createdTime``; raising a group's TTL puts it back on schedule.
+
+    Args:
+        session (Session): SQLAlchemy session, e.g. from db.SessionManager().
+        grace_days (int): Days between the expiry notice and the deletion.
+
+    Example:
+    >>> scheduler = ExpiryScheduler(SessionManager(), grace_days=3)
+    >>> scheduler.sync(subscription_id, credential)
+    >>> digest = DigestCollector()
+    >>> scheduler.run(credential, digest=digest)
+    >>> send_digests(digest, from_email="aco@example.com")
+    """
+
+    def __init__(self, session: Session, grace_days: int = 3):
+        self.session = session
+        self.grace_days = grace_days
+
+    def schedule(
+        self,
+        subscription_id: str,
+        resource_group: Dict,
+        now: Optional[datetime] = None,
+    ) -> Optional[ResourceGroupExpiry]:
+        """
+        Adds or updates the schedule of one resource group, as yielded by iter_resource_groups.
+        Groups without a valid TTL tag are dropped from the schedule.
+
+        Groups without a creation time are taken as created when first seen, so
+        they never expire earlier than they should.
+        """
+        now = now or datetime.utcnow()
+        resource_id = resource_group["id"].lower()
+        entry = self.session.get(ResourceGroupExpiry, resource_id)
+        try:
+            ttl_days = int(resource_group["tags"]["TTL"])
+        except (KeyError, TypeError, ValueError):
+            ttl_days = 0
+        if ttl_days < 1:
+            logger.debug(f"Resource group {resource_group['name']} has no valid TTL")
+            if entry is not None:
+                self.session.delete(entry)
+            return None
+
+        if resource_group.get("created_time"):
+            created_at = _parse_time(resource_group["created_time"])
+        elif entry is not None:
+            created_at = entry.created_at
+        else:
+            created_at = now
+        if entry is None:
+            entry = ResourceGroupExpiry(resource_id=resource_id, state="scheduled")
+            self.session.add(entry)
+        elif entry.state == "deleted":
+            if created_at <= entry.deleted_at:
+                # Still listed while ARM finishes deleting it
+                return entry
+            # A new group with the same name
+            entry.state = "scheduled"
+            entry.notified_at = entry.deleted_at = None
+
+        entry.subscription_id = subscription_id
+        entry.name = resource_group["name"]
+        entry.owner_email = resource_group["tags"].get("OwnerEmail")
+        entry.created_at = created_at
+        entry.ttl_days = ttl_days
+        entry.expires_at = created_at + timedelta(days=ttl_days)
+        if entry.state == "notified" and entry.expires_at > now:
+            # The owner extended the TTL after the notice
+            entry.state = "scheduled"
+            entry.notified_at = None
+        if entry.state == "scheduled":
+            entry.next_action_at = entry.expires_at
+        return entry
+
+    def sync(
+        self, subscription_id: str, access_token, now: Optional[datetime] = None
+    ) -> int:
+        """
+        Refreshes the schedule of a subscription from its TTL-tagged resource groups.
+        Groups that are gone or lost their TTL tag are dropped.
+
+        Returns:
+            int: The number of resource groups scheduled.
+        """
+        now = now or datetime.utcnow()
+        seen = set()
+        for resource_group in iter_resource_groups(
+            subscription_id,
+            access_token,
+            filter_expression="tagName eq 'TTL'",
+            expand="createdTime",
+        ):
+            if self.schedule(subscription_id, resource_group, now) is not None:
+                seen.add(resource_group["id"].lower())
+        self.session.execute(
+            delete(ResourceGroupExpiry).where(
+                ResourceGroupExpiry.subscription_id == subscription_id,
+                ResourceGroupExpiry.resource_id.not_in(seen),
+            )
+        )
+        self.session.commit()
+        logger.info(f"Scheduled {len(seen)} resource groups of {subscription_id}")
+        return len(seen)
+
+    def due(
+        self, now: Optional[datetime] = None, limit: Optional[int] = None
+    ) -> List[ResourceGroupExpiry]:
+        """
+        Returns the resource groups due for their next step, earliest first.
+        """
+        query = (
+            select(ResourceGroupExpiry)
+            .where(ResourceGroupExpiry.next_action_at <= (now or datetime.utcnow()))
+            .order_by(ResourceGroupExpiry.next_action_at)
+        )
+        if limit:
+            query = query.limit(limit)
+        return list(self.session.execute(query).scalars())
+
+    def run(
+        self,
+        access_token,
+        now: Optional[datetime] = None,
+        digest: Optional[DigestCollector] = None,
+        tracker: Optional[OperationTracker] = None,
+        limit: Optional[int] = None,
+    ) -> Dict[str, List[str]]:
+        """
+        Takes every due resource group one step down the pipeline: expired groups
+        are reported to their owner, and groups past the grace period are deleted.
+
+        Each group's tags are read again before it is deleted, so a TTL extended
+        or removed since the last :meth:`sync` still saves the group.
+
+        Args:
+            access_token (str): The access token (or ServicePrincipalCredential) to use for authentication.
+            now (datetime, optional): Current UTC time.
+            digest (DigestCollector, optional): Collects the expiry notices for the owners' digests.
+                Required for groups to move on to deletion.
+            tracker (OperationTracker, optional): Tracker to register the deletions with.
+            limit (int, optional): Maximum number of groups handled in this run.
+
+        Expired groups are only marked notified once their notice is in the digest.
+        Without a digest or an owner email they stay scheduled and are retried a day
+        later, so no group is deleted without a warning.
+
+        Returns:
+            Dict[str, List[str]]: Resource IDs that were "notified", "unnotified" because nobody
+            could be told, "deleted", "failed", or "skipped" because their TTL changed or they were gone.
+        """
+        now = now or datetime.utcnow()
+        summary = {
+            "notified": [],
+            "unnotified": [],
+            "deleted": [],
+            "failed": [],
+            "skipped": [],
+        }
+        for entry in self.due(now, limit):
+            if entry.state == "scheduled":
+                if digest is None or not entry.owner_email:
+                    # The grace period only starts once somebody has been warned
+                    logger.warning(
+                        f"Resource group {entry.name} expired but nobody can be notified"
+                    )
+                    entry.next_action_at = now + timedelta(days=1)
+                    summary["unnotified"].append(entry.resource_id)
+                    continue
+                delete_at = now + timedelta(days=self.grace_days)
+                digest.add(
+                    entry.owner_email,
+                    "expired",
+                    entry.name,
+                    f"expired on {entry.expires_at:%Y-%m-%d}, "
+                    f"will be deleted after {delete_at:%Y-%m-%d}",
+                    entry.subscription_id,
+                )
+                entry.state = "notified"
+                entry.notified_at = now
+                entry.next_action_at = delete_at
+                summary["notified"].append(entry.resource_id)
+                continue
+
+            try:
+                # The schedule may be stale: re-read the live tags right before deleting
+                live = get_resource_group(
+                    entry.subscription_id,
+                    entry.name,
+                    access_token,
+                    expand="createdTime",
+                )
+                if live is None:
+                    logger.info(f"Resource group {entry.name} is already gone")
+                    self.session.delete(entry)
+                    summary["skipped"].append(entry.resource_id)
+                    continue
+                rescheduled = self.schedule(entry.subscription_id, live, now)
+                if rescheduled is None or rescheduled.state != "notified":
+                    # The TTL tag was removed or extended since the notice
+                    logger.info(f"Resource group {entry.name} is no longer expired")
+                    summary["skipped"].append(entry.resource_id)
+                    continue
+                # False means the group is already gone
+                delete_resource_group(
+                    entry.subscription_id, entry.name, access_token, tracker=tracker
+                )
+            except Exception as err:
+                logger.error(f"Failed to delete resource group {entry.name}: {err}")
+                entry.next_action_at = now + timedelta(hours=1)
+                summary["failed"].append(entry.resource_id)
+                continue
+            entry.state = "deleted"
+            entry.deleted_at = now
+            entry.next_action_at = None
+            summary["deleted"].append(entry.resource_id)
+
+        self.session.commit()
+        logger.info(
+            f"Expiry run: {len(summary['notified'])} notified, "
+            f"{len(summary['unnotified'])} could not be notified, "
+            f"{len(summary['deleted'])} deleted, {len(summary['failed'])} failed, "
+            f"{len(summary['skipped'])} skipped"
+        )
+        return summary
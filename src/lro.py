@@ -0,0 +1,339 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from db.models import PendingOperation
+from .arm import ArmClient, get_arm_client
+from .throttling import parse_retry_after
+
+# Set logger
+logger = logging.getLogger(__name__)
+
+# Terminal states of an Azure-AsyncOperation status resource
+TERMINAL_STATUSES = ("Succeeded", "Failed", "Canceled")
+
+
+def _error_message(response: requests.Response) -> str:
+    try:
+        error = response.json().get("error") or {}
+    except ValueError:
+        return response.text
+    return error.get("message") or response.text
+
+
+def operation_url(status_code: int, headers) -> Optional[Tuple[str, str]]:
+    """
+    Returns the (url, kind) to poll for a response that started a long-running
+    operation, kind being "async" or "location", or None if there is nothing to poll.
+    """
+    if status_code not in (201, 202):
+        return None
+    if headers.get("Azure-AsyncOperation"):
+        return headers["Azure-AsyncOperation"], "async"
+    if status_code == 202 and headers.get("Location"):
+        return headers["Location"], "location"
+    return None
+
+
+def poll_operation(
+    url: str, kind: str, access_token, client: Optional[ArmClient] = None
+) -> Tuple[Optional[str], Optional[str], Optional[float]]:
+    """
+    Polls a long-running operation once.
+
+    Returns:
+        Tuple: The terminal status (None while still running), the error message
+        and the Retry-After delay in seconds, if any.
+    """
+    response = (client or get_arm_client()).get(url, access_token=access_token)
+    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+    if kind == "async":
+        if response.status_code != 200:
+            return "Failed", _error_message(response), None
+        body = response.json()
+        status = body.get("status")
+        if status in TERMINAL_STATUSES:
+            error = (body.get("error") or {}).get("message")
+            return status, error, None
+        return None, None, retry_after
+    if response.status_code in (200, 204):
+        return "Succeeded", None, None
+    if response.status_code != 202:
+        return "Failed", _error_message(response), None
+    return None, None, retry_after
+
+
+def wait_for_operation(
+    response: requests.Response,
+    access_token,
+    client: Optional[ArmClient] = None,
+    poll_interval: float = 5,
+    max_interval: float = 60,
+    timeout: float = 1800,
+) -> Dict[str, Optional[str]]:
+    """
+    Waits for an ARM long-running operation started by ``response`` to finish.
+
+    A 202 (or 201) is polled through its ``Azure-AsyncOperation`` header, or its
+    ``Location`` header when there is none. ``Retry-After`` is honoured;
+    otherwise the interval doubles from ``poll_interval`` up to ``max_interval``.
+
+    Args:
+        response (requests.Response): Response of the request that started the operation.
+        access_token (str): The access token (or ServicePrincipalCredential) to use for authentication.
+        client (ArmClient): ARM client to poll with. Defaults to the process-wide client.
+        poll_interval (float): First delay between polls in seconds.
+        max_interval (float): Longest delay between polls in seconds.
+        timeout (float): Seconds after which to stop waiting.
+
+    Returns:
+        Dict[str, Optional[str]]: "status" (Succeeded, Failed, Canceled or TimedOut) and "error".
+    """
+    if response.status_code not in (200, 201, 202, 204):
+        return {"status": "Failed", "error": _error_message(response)}
+    target = operation_url(response.status_code, response.headers)
+    if target is None:
+        # Finished already, or ARM accepted the request without a way to follow it
+        return {"status": "Succeeded", "error": None}
+
+    deadline = time.monotonic() + timeout
+    interval = poll_interval
+    delay = parse_retry_after(response.headers.get("Retry-After"))
+    while True:
+        delay = interval if delay is None else delay
+        if time.monotonic() + delay > deadline:
+            return {"status": "TimedOut", "error": f"Still running after {timeout}s"}
+        time.sleep(delay)
+        interval = min(interval * 2, max_interval)
+
+        status, error, delay = poll_operation(*target, access_token, client=client)
+        if status:
+            return {"status": status, "error": error}
+
+
+class OperationTracker:
+    """
+    Tracks many long-running ARM operations from one polling loop.
+
+    Operations are kept in the pending_operations table, so a restarted process
+    picks up the ones still in progress. Each operation has its own backoff:
+    ``Retry-After`` when ARM sends one, otherwise an interval doubling from
+    ``poll_interval`` up to ``max_interval``. Every pass polls only the
+    operations that are due, in parallel.
+
+    Args:
+        session (Session): SQLAlchemy session, e.g. from db.SessionManager().
+        access_token (str): The access token (or ServicePrincipalCredential) to poll with.
+        client (ArmClient): ARM client to poll with. Defaults to the process-wide client.
+        poll_interval (float): First delay between polls of an operation in seconds.
+        max_interval (float): Longest delay between polls of an operation in seconds.
+        timeout (float): Seconds after registration at which an operation is given up as TimedOut.
+        max_workers (int): Maximum number of polls in flight.
+
+    Example:
+    >>> tracker = OperationTracker(SessionManager(), credential)
+    >>> for name in names:
+    ...     delete_resource_group(subscription_id, name, credential, tracker=tracker)
+    >>> results = tracker.run()
+    """
+
+    def __init__(
+        self,
+        session: Session,
+        access_token,
+        client: Optional[ArmClient] = None,
+        poll_interval: float = 5,
+        max_interval: float = 60,
+        timeout: float = 3 * 3600,
+        max_workers: int = 8,
+    ):
+        self.session = session
+        self.access_token = access_token
+        self.client = client
+        self.poll_interval = poll_interval
+        self.max_interval = max_interval
+        self.timeout = timeout
+        self.max_workers = max_workers
+
+    def register(
+        self,
+        resource_id: str,
+        response: requests.Response,
+        now: Optional[datetime] = None,
+    ) -> PendingOperation:
+        """
+        Starts tracking the operation a response started. Responses without an
+        operation to poll are recorded as already finished.
+        """
+        error = None if response.ok else _error_message(response)
+        return self.register_operation(
+            resource_id, response.status_code, response.headers, error, now
+        )
+
+    def register_operation(
+        self,
+        resource_id: str,
+        status_code: int,
+        headers: Dict[str, str],
+        error: Optional[str] = None,
+        now: Optional[datetime] = None,
+    ) -> PendingOperation:
+        """
+        Same as :meth:`register`, from the status code and headers of a response,
+        e.g. one answer of an ARM batch request.
+        """
+        now = now or datetime.utcnow()
+        operation = PendingOperation(
+            resource_id=resource_id.lower(), started_at=now, attempts=0
+        )
+        target = operation_url(status_code, headers)
+        if target:
+            delay = parse_retry_after(headers.get("Retry-After"))
+            operation.operation_url, operation.url_kind = target
+            operation.status = "InProgress"
+            operation.next_poll_at = now + timedelta(
+                seconds=self.poll_interval if delay is None else delay
+            )
+        else:
+            operation.operation_url, operation.url_kind = "", "none"
+            operation.status = (
+                "Succeeded" if status_code in (200, 201, 202, 204) else "Failed"
+            )
+            operation.error = None if operation.status == "Succeeded" else error
+            operation.completed_at = now
+        operation = self.session.merge(operation)
+        self.session.commit()
+        return operation
+
+    def pending(self) -> List[PendingOperation]:
+        """
+        Returns the operations still in progress, soonest poll first.
+        """
+        return list(
+            self.session.execute(
+                select(PendingOperation)
+                .where(PendingOperation.status == "InProgress")
+                .order_by(PendingOperation.next_poll_at)
+            ).scalars()
+        )
+
+    def poll_due(self, now: Optional[datetime] = None) -> List[PendingOperation]:
+        """
+        Polls every operation that is due once and returns the ones that finished.
+        """
+        now = now or datetime.utcnow()
+        due = list(
+            self.session.execute(
+                select(PendingOperation).where(
+                    PendingOperation.status == "InProgress",
+                    PendingOperation.next_poll_at <= now,
+                )
+            ).scalars()
+        )
+        if not due:
+            return []
+
+        def poll(target: Tuple[str, str, str]):
+            resource_id, url, kind = target
+            try:
+                return poll_operation(url, kind, self.access_token, client=self.client)
+            except requests.exceptions.RequestException as e:
+                # Network trouble is not a verdict on the operation; try again later
+                logger.warning(f"Failed to poll {resource_id}: {e}")
+                return None, None, None
+
+        # Worker threads get plain values; the session stays on this thread
+        targets = [
+            (operation.resource_id, operation.operation_url, operation.url_kind)
+            for operation in due
+        ]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            outcomes = list(executor.map(poll, targets))
+
+        finished = []
+        for operation, (status, error, delay) in zip(due, outcomes):
+            operation.attempts += 1
+            if not status and now - operation.started_at >= timedelta(
+                seconds=self.timeout
+            ):
+                status, error = "TimedOut", f"Still running after {self.timeout}s"
+            if status:
+                operation.status = status
+                operation.error = error
+                operation.completed_at = now
+                operation.next_poll_at = None
+                finished.append(operation)
+                continue
+            if delay is None:
+                delay = min(
+                    self.poll_interval * 2**operation.attempts, self.max_interval
+                )
+            operation.next_poll_at = now + timedelta(seconds=delay)
+        self.session.commit()
+        return finished
+
+    def next_poll_at(self) -> Optional[datetime]:
+        """
+        Returns when the next operation is due, or None if nothing is in progress.
+        """
+        return self.session.execute(
+            select(func.min(PendingOperation.next_poll_at)).where(
+                PendingOperation.status == "InProgress"
+            )
+        ).scalar()
+
+    def run(self, timeout: Optional[float] = None) -> Dict[str, Dict]:
+        """
+        Polls until no operation is in progress, or for at most ``timeout`` seconds.
+
+        Returns:
+            Dict[str, Dict]: The results of the operations that finished during the run,
+            keyed by resource ID.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        finished = []
+        while True:
+            finished.extend(self.poll_due())
+            next_poll_at = self.next_poll_at()
+            if next_poll_at is None:
+                break
+            delay = max(0.0, (next_poll_at - datetime.utcnow()).total_seconds())
+            if deadline is not None and time.monotonic() + delay > deadline:
+                break
+            time.sleep(delay)
+        logger.info(
+            f"{len(finished)} operations finished, {len(self.pending())} still in progress"
+        )
+        return {operation.resource_id: self.result(operation) for operation in finished}
+
+    @staticmethod
+    def result(operation: PendingOperation) -> Dict:
+        """
+        Returns the status, error, start and completion time and duration in seconds of an operation.
+        """
+        return {
+            "status": operation.status,
+            "error": operation.error,
+            "started_at": operation.started_at,
+            "completed_at": operation.completed_at,
+            "duration": (
+                (operation.completed_at - operation.started_at).total_seconds()
+                if operation.completed_at
+                else None
+            ),
+        }
+
+    def results(self) -> Dict[str, Dict]:
+        """
+        Returns the result of every tracked operation, keyed by resource ID.
+        """
+        return {
+            operation.resource_id: self.result(operation)
+            for operation in self.session.execute(select(PendingOperation)).scalars()
+        }
@@ -0,0 +1,224 @@
+import json
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+
+# Set logger
+logger = logging.getLogger(__name__)
+
+RETAIL_PRICES_URL = "https://prices.azure.com/api/retail/prices"
+RETAIL_PRICES_API_VERSION = "2023-01-01-preview"
+
+# Hours in an average month, as used by the Azure pricing calculator
+HOURS_PER_MONTH = 730
+
+
+def fetch_retail_prices(
+    region: str,
+    service_name: str = "Virtual Machines",
+    price_type: str = "Consumption",
+    session: Optional[requests.Session] = None,
+) -> Iterator[Dict]:
+    """
+    Lazily yields the items of the Azure Retail Prices API for a region, following ``NextPageLink``.
+
+    The API is public, so no access token is needed.
+
+    Args:
+        region (str): ARM region name, e.g. westeurope.
+        service_name (str): Service to list prices for.
+        price_type (str): Consumption, Reservation or DevTestConsumption. PriceIndex only
+            keeps Consumption items.
+        session (requests.Session, optional): Session to send the requests with.
+
+    Raises:
+        Exception: If there is an error retrieving a page.
+
+    Returns:
+        Iterator[Dict]: One dictionary per price item.
+    """
+    session = session or requests.Session()
+    url = RETAIL_PRICES_URL
+    params = {
+        "api-version": RETAIL_PRICES_API_VERSION,
+        "$filter": (
+            f"serviceName eq '{service_name}' and armRegionName eq '{region.lower()}'"
+            f" and priceType eq '{price_type}'"
+        ),
+    }
+    while url:
+        try:
+            response = session.get(url, params=params, timeout=(10, 60))
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Failed to retrieve retail prices. Error: {e}")
+
+        data = response.json()
+        yield from data.get("Items", [])
+        # NextPageLink already carries the filter and the skip token
+        url = data.get("NextPageLink")
+        params = None
+
+
+class PriceIndex:
+    """
+    Hourly retail prices keyed by (armSkuName, region, priceType).
+
+    Only pay-as-you-go hourly prices are kept: Reservation and DevTest items,
+    Spot and Low Priority meters are skipped, and so are Windows meters unless
+    ``windows`` is set, so every key maps to one price and a lookup is a single
+    dictionary access.
+
+    Args:
+        windows (bool): Keep Windows prices (license included) instead of Linux ones.
+
+    Example:
+    >>> index = PriceIndex()
+    >>> index.add_items(fetch_retail_prices("westeurope"))
+    >>> index.get("Standard_D2s_v3", "westeurope")
+    0.11
+    """
+
+    def __init__(self, windows: bool = False):
+        self.windows = windows
+        self._prices: Dict[Tuple[str, str, str], float] = {}
+
+    def __len__(self) -> int:
+        return len(self._prices)
+
+    def add_items(self, items: Iterable[Dict]) -> int:
+        """
+        Adds Retail Prices API items to the index and returns how many were kept.
+        """
+        added = 0
+        for item in items:
+            if item.get("unitOfMeasure") != "1 Hour" or not item.get("armSkuName"):
+                continue
+            # Reservation items say "1 Hour" too, but their price covers the whole term
+            if item.get("priceType", "Consumption") != "Consumption":
+                continue
+            sku_name = item.get("skuName", "")
+            if "Spot" in sku_name or "Low Priority" in sku_name:
+                continue
+            if ("Windows" in item.get("productName", "")) != self.windows:
+                continue
+            key = (
+                item["armSkuName"].lower(),
+                item["armRegionName"].lower(),
+                item.get("priceType", "Consumption"),
+            )
+            self._prices[key] = item["retailPrice"]
+            added += 1
+        return added
+
+    def get(
+        self, sku_name: str, region: str, price_type: str = "Consumption"
+    ) -> Optional[float]:
+        """
+        Returns the hourly price of a SKU in a region, or None if it is unknown.
+        """
+        return self._prices.get((sku_name.lower(), region.lower(), price_type))
+
+    def prices_for(
+        self, region: str, price_type: str = "Consumption"
+    ) -> Dict[str, float]:
+        """
+        Returns the hourly prices of a region keyed by lower-cased SKU name, e.g. for RightsizingIndex.
+        """
+        region = region.lower()
+        return {
+            sku_name: price
+            for (sku_name, price_region, price_type_), price in self._prices.items()
+            if price_region == region and price_type_ == price_type
+        }
+
+    def save(self, file_path: str) -> None:
+        """
+        Saves the index as compact JSON rows of [armSkuName, region, priceType, price].
+        """
+        with open(file_path, "w") as file:
+            json.dump(
+                [[*key, price] for key, price in self._prices.items()],
+                file,
+                separators=(",", ":"),
+            )
+
+    @classmethod
+    def load(cls, file_path: str, windows: bool = False) -> "PriceIndex":
+        """
+        Loads an index saved with :meth:`save`.
+        """
+        index = cls(windows=windows)
+        with open(file_path, "r") as file:
+            for sku_name, region, price_type, price in json.load(file):
+                index._prices[(sku_name, region, price_type)] = price
+        return index
+
+
+def build_price_index(regions: Iterable[str], windows: bool = False) -> PriceIndex:
+    """
+    Downloads the virtual machine prices of some regions into a PriceIndex.
+
+    Args:
+        regions (Iterable[str]): ARM region names.
+        windows (bool): Index Windows prices instead of Linux ones.
+
+    Returns:
+        PriceIndex: The prices of every region.
+    """
+    index = PriceIndex(windows=windows)
+    with requests.Session() as session:
+        for region in set(region.lower() for region in regions):
+            added = index.add_items(fetch_retail_prices(region, session=session))
+            logger.info(f"Indexed {added} prices for {region}")
+    return index
+
+
+def monthly_savings(
+    index: PriceIndex, region: str, current_sku: str, suggested_sku: str
+) -> Optional[float]:
+    """
+    Returns the monthly savings of moving a VM from one SKU to another, or None if a price is unknown.
+    """
+    current_price = index.get(current_sku, region)
+    suggested_price = index.get(suggested_sku, region)
+    if current_price is None or suggested_price is None:
+        return None
+    return round((current_price - suggested_price) * HOURS_PER_MONTH, 2)
+
+
+def score_recommendations(
+    recommendations: Iterable[Dict], index: PriceIndex
+) -> List[Dict]:
+    """
+    Adds "monthly_savings" to each recommendation and orders them by it, largest first.
+
+    Args:
+        recommendations (Iterable[Dict]): Recommendations with "location", "current_size" and "new_size" keys,
+            like the recommendation_data of send_recommendation_email.
+        index (PriceIndex): Prices to score with.
+
+    Returns:
+        List[Dict]: The recommendations, largest savings first; unpriced ones come last.
+    """
+    scored = []
+    for recommendation in recommendations:
+        scored.append(
+            {
+                **recommendation,
+                "monthly_savings": monthly_savings(
+                    index,
+                    recommendation["location"],
+                    recommendation["current_size"],
+                    recommendation["new_size"],
+                ),
+            }
+        )
+    scored.sort(
+        key=lambda recommendation: (
+            recommendation["monthly_savings"] is None,
+            -(recommendation["monthly_savings"] or 0),
+        )
+    )
+    return scored
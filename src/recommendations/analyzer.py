@@ -0,0 +1,301 @@
+import logging
+import warnings
+from datetime import date, datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from db.bulk import upsert_metrics
+
+# Share of each resource in the combined weightage
+WEIGHTAGE_SHARES = {"cpu": 0.4, "memory": 0.4, "storage": 0.1, "other": 0.1}
+
+
+def build_fleet_matrix(
+    series_by_vm: Dict[str, Tuple[np.ndarray, np.ndarray]],
+    resource_ids: Sequence[str],
+    start: datetime,
+    end: datetime,
+    interval_seconds: int = 3600,
+) -> np.ndarray:
+    """
+    Lay out per-VM series on a common time grid as a VMs x intervals matrix.
+
+    :param series_by_vm: (timestamps, values) arrays keyed by resource ID, e.g. from MetricStore.read_fleet.
+    :param resource_ids: Row order of the matrix.
+    :param start: Start of the grid (UTC).
+    :param end: End of the grid (UTC), excluded.
+    :param interval_seconds: Length of each interval in seconds.
+    :return: Float matrix with NaN where a VM has no sample.
+    """
+    origin = np.datetime64(start, "s")
+    columns = int(
+        (np.datetime64(end, "s") - origin) / np.timedelta64(interval_seconds, "s")
+    )
+    matrix = np.full((len(resource_ids), columns), np.nan)
+
+    rows, timestamps, values = [], [], []
+    for row, resource_id in enumerate(resource_ids):
+        series = series_by_vm.get(resource_id)
+        if series is None or not len(series[0]):
+            continue
+        rows.append(np.full(len(series[0]), row))
+        timestamps.append(series[0])
+        values.append(series[1])
+    if not rows:
+        return matrix
+
+    rows = np.concatenate(rows)
+    timestamps = np.concatenate(timestamps).astype("datetime64[s]")
+    values = np.concatenate(values)
+    cols = (timestamps - origin) // np.timedelta64(interval_seconds, "s")
+    inside = (cols >= 0) & (cols < columns)
+    matrix[rows[inside], cols[inside].astype(np.int64)] = values[inside]
+    return matrix
+
+
+def _utilization(usage: np.ndarray, capacity: Optional[np.ndarray]) -> np.ndarray:
+    # Percent of capacity per interval; NaN rows where the capacity is unknown
+    if capacity is None:
+        return np.full(usage.shape, np.nan)
+    capacity = np.asarray(capacity, dtype=np.float64)[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(capacity > 0, 100 * usage / capacity, np.nan)
+
+
+def add_series(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """
+    Add two metric matrices, e.g. disk read and write bytes, into one.
+
+    :param first: First matrix, NaN where there is no sample.
+    :param second: Second matrix of the same shape.
+    :return: Element-wise sum that treats a missing operand as zero but stays NaN where both are missing.
+    """
+    return np.where(
+        np.isnan(first) & np.isnan(second),
+        np.nan,
+        np.nan_to_num(first) + np.nan_to_num(second),
+    )
+
+
+def _row_stat(function, matrix: np.ndarray, *args) -> np.ndarray:
+    # nan* reductions warn on all-NaN rows; those rows simply stay NaN
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return function(matrix, *args, axis=1)
+
+
+def analyze_fleet(
+    cpu_percent: np.ndarray,
+    available_memory_bytes: Optional[np.ndarray] = None,
+    memory_bytes: Optional[np.ndarray] = None,
+    disk_bytes_per_sec: Optional[np.ndarray] = None,
+    disk_capacity_bytes_per_sec: Optional[np.ndarray] = None,
+    network_bytes: Optional[np.ndarray] = None,
+    network_capacity_bytes: Optional[np.ndarray] = None,
+    peak_percentile: float = 95,
+    bottom_percentile: float = 5,
+    peak_threshold: float = 80,
+    interval_minutes: int = 60,
+) -> Dict[str, np.ndarray]:
+    """
+    Compute the Metrics weight columns of a whole fleet in vectorized passes.
+
+    Every usage input is a VMs x intervals matrix (see build_fleet_matrix) with
+    NaN for missing samples; capacities are one value per VM. Weights are
+    percentages of capacity and NaN where the inputs are unknown.
+
+    :param cpu_percent: Percentage CPU.
+    :param available_memory_bytes: Available Memory Bytes.
+    :param memory_bytes: Memory of each VM's SKU in bytes.
+    :param disk_bytes_per_sec: Data disk read plus write bytes per second.
+    :param disk_capacity_bytes_per_sec: Uncached disk throughput of each VM's SKU.
+    :param network_bytes: Network in plus out bytes per interval.
+    :param network_capacity_bytes: Network bytes each VM's SKU can move per interval.
+    :param peak_percentile: Percentile reported as the peak.
+    :param bottom_percentile: Percentile reported as the bottom.
+    :param peak_threshold: Utilization above which an interval counts towards the peak duration.
+    :param interval_minutes: Length of each interval, to express peak durations in minutes.
+    :return: Arrays keyed by Metrics column name, one value per VM.
+    """
+    cpu = np.asarray(cpu_percent, dtype=np.float64)
+    memory = np.full(cpu.shape, np.nan)
+    if available_memory_bytes is not None and memory_bytes is not None:
+        memory_bytes = np.asarray(memory_bytes, dtype=np.float64)
+        memory = 100 - _utilization(available_memory_bytes, memory_bytes)
+    storage = _utilization(
+        np.full(cpu.shape, np.nan)
+        if disk_bytes_per_sec is None
+        else disk_bytes_per_sec,
+        disk_capacity_bytes_per_sec,
+    )
+    other = _utilization(
+        np.full(cpu.shape, np.nan) if network_bytes is None else network_bytes,
+        network_capacity_bytes,
+    )
+
+    results = {}
+    for name, matrix in (("cpu", cpu), ("memory", memory)):
+        samples = np.sum(~np.isnan(matrix), axis=1)
+        results[f"{name}_weight_avg"] = _row_stat(np.nanmean, matrix)
+        results[f"{name}_weight_peak"] = _row_stat(
+            np.nanpercentile, matrix, peak_percentile
+        )
+        results[f"{name}_weight_bottom"] = _row_stat(
+            np.nanpercentile, matrix, bottom_percentile
+        )
+        # Comparisons with NaN are False, so missing samples never count as peak time
+        with np.errstate(invalid="ignore"):
+            peak_intervals = np.sum(matrix > peak_threshold, axis=1)
+        results[f"{name}_weight_peak_duration"] = np.where(
+            samples > 0, peak_intervals * interval_minutes, np.nan
+        )
+    results["storage_weight_avg"] = _row_stat(np.nanmean, storage)
+    results["other_weight_avg"] = _row_stat(np.nanmean, other)
+    results["other_weight_peak"] = _row_stat(np.nanpercentile, other, peak_percentile)
+
+    # Combined weightage over the resources that are known for each VM
+    weights = np.column_stack(
+        [
+            results["cpu_weight_peak"],
+            results["memory_weight_peak"],
+            results["storage_weight_avg"],
+            results["other_weight_peak"],
+        ]
+    )
+    shares = np.array(
+        [WEIGHTAGE_SHARES[name] for name in ("cpu", "memory", "storage", "other")]
+    )
+    known = ~np.isnan(weights)
+    total_share = np.sum(known * shares, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        results["current_weightage"] = np.where(
+            total_share > 0,
+            np.nansum(weights * shares, axis=1) / total_share,
+            np.nan,
+        )
+    return results
+
+
+def write_fleet_metrics(
+    session: Session,
+    resource_names: Sequence[str],
+    current_skus: Sequence[str],
+    results: Dict[str, np.ndarray],
+    resource_type: str = "Microsoft.Compute/virtualMachines",
+    suggested_skus: Optional[Sequence[Optional[str]]] = None,
+    resource_ids: Optional[Sequence[str]] = None,
+    run_date: Optional[date] = None,
+) -> int:
+    """
+    Write the analyzer results to the metrics table in bulk, replacing the rows of a previous run on the same day.
+
+    :param session: SQLAlchemy session.
+    :param resource_names: Name of each VM, in matrix row order.
+    :param current_skus: Current SKU of each VM, in matrix row order.
+    :param results: Output of analyze_fleet.
+    :param resource_type: Resource type stored with every row.
+    :param suggested_skus: Suggested SKU of each VM, e.g. from rightsizing.suggest_skus.
+    :param resource_ids: Resource ID of each VM, which rows are upserted on together with the run date.
+    :param run_date: Date of the analysis. Defaults to today (UTC).
+    :return: Number of rows written.
+    """
+    if not len(resource_names):
+        return 0
+
+    # Round once for the whole fleet; NaN becomes NULL
+    columns = {}
+    for column, values in results.items():
+        rounded = np.rint(values)
+        columns[column] = [
+            None if np.isnan(value) else int(value) for value in rounded.tolist()
+        ]
+
+    run_date = run_date or datetime.utcnow().date()
+    rows: List[Dict] = [
+        {
+            "resource_id": resource_ids[i].lower() if resource_ids else None,
+            "run_date": run_date,
+            "resource_name": resource_name,
+            "resource_type": resource_type,
+            "current_sku": current_sku,
+            "suggested_sku": suggested_skus[i] if suggested_skus else None,
+            **{column: values[i] for column, values in columns.items()},
+        }
+        for i, (resource_name, current_sku) in enumerate(
+            zip(resource_names, current_skus)
+        )
+    ]
+    written = upsert_metrics(session, rows)
+    logging.info(f"Wrote metrics for {written} VMs.")
+    return written
+
+
+def analyze_fleet_from_store(
+    store,
+    session: Session,
+    virtual_machines: Sequence[Dict],
+    start: datetime,
+    end: datetime,
+    interval_seconds: int = 3600,
+    **kwargs,
+) -> Dict[str, np.ndarray]:
+    """
+    Analyze a window of the metrics kept in a MetricStore and write one Metrics row per VM.
+
+    :param store: db.MetricStore holding the fleet's samples.
+    :param session: SQLAlchemy session to write the Metrics rows with.
+    :param virtual_machines: VMs with "id", "name" and "sku" keys, and optionally the capacities
+        "memory_bytes", "disk_bytes_per_sec" and "network_bytes_per_sec" of their SKU.
+    :param start: Start of the window (UTC).
+    :param end: End of the window (UTC), excluded.
+    :param interval_seconds: Length of each interval in seconds.
+    :param kwargs: Passed on to analyze_fleet, e.g. peak_threshold.
+    :return: Output of analyze_fleet, in the order of virtual_machines.
+    """
+    resource_ids = [
+        virtual_machine["id"].lower() for virtual_machine in virtual_machines
+    ]
+
+    def matrix(metric_name: str) -> np.ndarray:
+        return build_fleet_matrix(
+            store.read_fleet(metric_name, start, end, resource_ids),
+            resource_ids,
+            start,
+            end,
+            interval_seconds,
+        )
+
+    def capacity(key: str) -> np.ndarray:
+        return np.array(
+            [
+                virtual_machine.get(key) or np.nan
+                for virtual_machine in virtual_machines
+            ],
+            dtype=np.float64,
+        )
+
+    results = analyze_fleet(
+        cpu_percent=matrix("Percentage CPU"),
+        available_memory_bytes=matrix("Available Memory Bytes"),
+        memory_bytes=capacity("memory_bytes"),
+        disk_bytes_per_sec=add_series(
+            matrix("Data Disk Read Bytes/sec"), matrix("Data Disk Write Bytes/sec")
+        ),
+        disk_capacity_bytes_per_sec=capacity("disk_bytes_per_sec"),
+        network_bytes=add_series(
+            matrix("Network In Total"), matrix("Network Out Total")
+        ),
+        network_capacity_bytes=capacity("network_bytes_per_sec") * interval_seconds,
+        interval_minutes=interval_seconds // 60,
+        **kwargs,
+    )
+    write_fleet_metrics(
+        session,
+        [virtual_machine["name"] for virtual_machine in virtual_machines],
+        [virtual_machine["sku"] for virtual_machine in virtual_machines],
+        results,
+        resource_ids=resource_ids,
+    )
+    return results
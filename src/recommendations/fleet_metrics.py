@@ -0,0 +1,191 @@
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+from ..arm import ArmClient
+from ..throttling import RateLimitGovernor
+from .virtual_machine import VM_METRICS, parse_vm_metrics
+
+# Audience of the tokens accepted by the Azure Monitor metrics data plane
+METRICS_RESOURCE = "https://metrics.monitor.azure.com/"
+
+METRICS_BATCH_API_VERSION = "2023-10-01"
+
+# The batch metrics API accepts at most 50 resource IDs per request
+MAX_RESOURCES_PER_BATCH = 50
+
+
+def group_by_region(
+    virtual_machines: Iterable[Dict],
+) -> Dict[Tuple[str, str], List[str]]:
+    """
+    Group VM resource IDs by (subscription ID, region), the scope of one batch metrics request.
+
+    :param virtual_machines: VMs with "id" and "location" keys, e.g. the values of get_virtual_machines_graph.
+    :return: Lower-cased resource IDs keyed by (subscription ID, region).
+    """
+    groups = defaultdict(list)
+    for virtual_machine in virtual_machines:
+        resource_id = virtual_machine["id"].lower()
+        subscription_id = resource_id.split("/")[2]
+        region = virtual_machine["location"].lower().replace(" ", "")
+        groups[(subscription_id, region)].append(resource_id)
+    return dict(groups)
+
+
+def collect_fleet_metrics(
+    virtual_machines: Iterable[Dict],
+    access_token,
+    interval: str = "PT1H",
+    timespan: Optional[str] = None,
+    max_in_flight: int = 4,
+    batch_size: int = MAX_RESOURCES_PER_BATCH,
+) -> Dict[str, Dict]:
+    """
+    Collect the consumption metrics of many VMs through the regional ``metrics:getBatch`` endpoints.
+
+    VMs are grouped by subscription and region and sent ``batch_size`` at a time,
+    with at most ``max_in_flight`` batch requests running at once. Each VM gets
+    the same structure as fetch_vm_consumption_data returns.
+
+    :param virtual_machines: VMs with "id" and "location" keys, e.g. the values of get_virtual_machines_graph.
+    :param access_token: ServicePrincipalCredential (its metrics audience is used) or a token for METRICS_RESOURCE.
+    :param interval: ISO 8601 duration of each data point, e.g. PT5M, PT1H or P1D.
+    :param timespan: ISO 8601 "start/end" interval to query. Defaults to the last 7 days.
+    :param max_in_flight: Maximum number of batch requests sent at once.
+    :param batch_size: Number of VMs per batch request, at most 50.
+    :return: Consumption data keyed by lower-cased VM resource ID. VMs whose batch failed are left out.
+    """
+    # Validate input parameters
+    if not access_token:
+        raise ValueError("Access token is missing or invalid")
+    if not 1 <= batch_size <= MAX_RESOURCES_PER_BATCH:
+        raise ValueError(f"Batch size must be between 1 and {MAX_RESOURCES_PER_BATCH}")
+
+    if hasattr(access_token, "with_resource"):
+        access_token = access_token.with_resource(METRICS_RESOURCE)
+
+    if not timespan:
+        end_time = datetime.utcnow()
+        start_time = end_time - timedelta(days=7)
+        timespan = f"{start_time.strftime('%Y-%m-%dT%H:%M:%SZ')}/{end_time.strftime('%Y-%m-%dT%H:%M:%SZ')}"
+    start_time_str, end_time_str = timespan.split("/")
+    params = {
+        "api-version": METRICS_BATCH_API_VERSION,
+        "metricnamespace": "microsoft.compute/virtualmachines",
+        "metricnames": ",".join(VM_METRICS),
+        "aggregation": ",".join(sorted(set(VM_METRICS.values()))).lower(),
+        "interval": interval,
+        "starttime": start_time_str,
+        "endtime": end_time_str,
+    }
+
+    # One pooled client per regional endpoint, sharing a governor separate from ARM's
+    governor = RateLimitGovernor()
+    clients = {}
+    batches = []
+    for (subscription_id, region), resource_ids in group_by_region(
+        virtual_machines
+    ).items():
+        if region not in clients:
+            clients[region] = ArmClient(
+                base_url=f"https://{region}.metrics.monitor.azure.com",
+                pool_size=max_in_flight,
+                governor=governor,
+            )
+        for start in range(0, len(resource_ids), batch_size):
+            batches.append(
+                (
+                    clients[region],
+                    subscription_id,
+                    resource_ids[start : start + batch_size],
+                )
+            )
+
+    def fetch(batch: Tuple[ArmClient, str, List[str]]) -> Dict[str, Dict]:
+        client, subscription_id, resource_ids = batch
+        try:
+            response = client.post(
+                f"/subscriptions/{subscription_id}/metrics:getBatch",
+                access_token=access_token,
+                params=params,
+                json={"resourceids": resource_ids},
+            )
+            response.raise_for_status()
+            # Gateways may answer with a non-JSON body, e.g. an HTML 502
+            values = response.json().get("values", [])
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logging.error(
+                f"Error fetching metrics for {len(resource_ids)} VMs in {client.base_url}: {e}"
+            )
+            return {}
+        return {
+            item["resourceid"].lower(): parse_vm_metrics(item.get("value", []))
+            for item in values
+        }
+
+    fleet_metrics = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            for result in executor.map(fetch, batches):
+                fleet_metrics.update(result)
+    finally:
+        for client in clients.values():
+            client.close()
+
+    logging.info(
+        f"Collected metrics for {len(fleet_metrics)} VMs in {len(clients)} regions "
+        f"with {len(batches)} batch requests."
+    )
+    return fleet_metrics
+
+
+def collect_fleet_metrics_incremental(
+    virtual_machines: Iterable[Dict],
+    access_token,
+    store,
+    interval: str = "PT1H",
+    initial_days: int = 7,
+    **kwargs,
+) -> Dict[str, int]:
+    """
+    Fetch only the metrics a MetricStore does not have yet and append them to it.
+
+    VMs are grouped by the timespan they still need, so a fleet that was synced
+    on the previous run costs a single short window. The store's retention is
+    applied afterwards.
+
+    :param virtual_machines: VMs with "id" and "location" keys, e.g. the values of get_virtual_machines_graph.
+    :param access_token: ServicePrincipalCredential or a token for METRICS_RESOURCE.
+    :param store: db.MetricStore to read watermarks from and append samples to.
+    :param interval: ISO 8601 duration of each data point.
+    :param initial_days: Days of history fetched for VMs not in the store yet.
+    :param kwargs: Passed on to collect_fleet_metrics, e.g. max_in_flight.
+    :return: Number of samples stored per lower-cased VM resource ID.
+    """
+    now = datetime.utcnow()
+    by_timespan = defaultdict(list)
+    for virtual_machine in virtual_machines:
+        timespan = store.fetch_timespan(
+            virtual_machine["id"], initial_days=initial_days, now=now
+        )
+        by_timespan[timespan].append(virtual_machine)
+
+    stored = {}
+    for timespan, group in by_timespan.items():
+        fleet_metrics = collect_fleet_metrics(
+            group, access_token, interval=interval, timespan=timespan, **kwargs
+        )
+        for resource_id, consumption_data in fleet_metrics.items():
+            stored[resource_id] = store.append(resource_id, consumption_data["series"])
+
+    deleted = store.apply_retention(now=now)
+    logging.info(
+        f"Stored {sum(stored.values())} samples for {len(stored)} VMs "
+        f"in {len(by_timespan)} windows; dropped {deleted} expired samples."
+    )
+    return stored
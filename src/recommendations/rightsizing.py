@@ -0,0 +1,233 @@
+import logging
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Capacity dimensions of the index, as (requirement key, vm_skus column)
+DIMENSIONS = (
+    ("vcpus", "vcpus"),
+    ("memory_gb", "memory_gb"),
+    ("disk_bytes_per_sec", "uncached_disk_bytes_per_second"),
+    ("bandwidth_mbps", "network_bandwidth_mbps"),
+)
+
+# analyze_fleet weight that measures each dimension, as a percentage of the SKU's capacity
+DIMENSION_WEIGHTS = {
+    "vcpus": "cpu_weight_peak",
+    "memory_gb": "memory_weight_peak",
+    "disk_bytes_per_sec": "storage_weight_avg",
+    "bandwidth_mbps": "other_weight_peak",
+}
+
+# Number of VMs matched against the SKU index per vectorized pass
+BATCH_CHUNK_SIZE = 1024
+
+
+class RightsizingIndex:
+    """
+    Index of the SKUs of one region for nearest-fit rightsizing.
+
+    SKUs are sorted by price once, and their capacities are kept as a SKUs x
+    dimensions matrix. A search compares a capacity vector against every SKU
+    with one vectorized pass and picks the first (cheapest) SKU that fits;
+    :meth:`find_batch` does the same for thousands of VMs at a time.
+
+    Args:
+        skus (List[Dict]): SKUs with the vm_skus columns, e.g. SkuCatalog.list(location).
+        prices (Dict[str, float], optional): Hourly price keyed by lower-cased SKU name.
+            SKUs without a price rank after priced ones. Without prices, SKUs are
+            ranked by vCPUs, then memory.
+
+    Example:
+    >>> index = RightsizingIndex.from_catalog(get_sku_catalog(), "westeurope")
+    >>> index.find({"vcpus": 1.5, "memory_gb": 5}, headroom=0.2)["name"]
+    'Standard_B2s'
+    """
+
+    def __init__(self, skus: List[Dict], prices: Optional[Dict[str, float]] = None):
+        skus = [sku for sku in skus if sku.get("vcpus") and sku.get("memory_gb")]
+        price = np.array(
+            [(prices or {}).get(sku["name"].lower(), np.inf) for sku in skus],
+            dtype=np.float64,
+        )
+        vcpus = np.array([sku["vcpus"] for sku in skus], dtype=np.float64)
+        memory = np.array([sku["memory_gb"] for sku in skus], dtype=np.float64)
+        # np.lexsort sorts by the last key first
+        order = np.lexsort((memory, vcpus, price))
+
+        self.skus = [skus[i] for i in order]
+        self.prices = price[order]
+        self.capacities = np.array(
+            [[sku.get(column) or 0 for _, column in DIMENSIONS] for sku in self.skus],
+            dtype=np.float64,
+        ).reshape(len(self.skus), len(DIMENSIONS))
+        self.families = np.array([sku.get("family") or "" for sku in self.skus])
+        self.premium_io = np.array(
+            [bool(sku.get("premium_io")) for sku in self.skus], dtype=bool
+        )
+        self.accelerated_networking = np.array(
+            [bool(sku.get("accelerated_networking")) for sku in self.skus], dtype=bool
+        )
+
+    @classmethod
+    def from_catalog(
+        cls, catalog, location: str, prices: Optional[Dict[str, float]] = None
+    ) -> "RightsizingIndex":
+        """
+        Builds the index from the SKUs of a location loaded in a SkuCatalog.
+        """
+        return cls(catalog.list(location), prices)
+
+    def find(
+        self,
+        required: Dict[str, float],
+        headroom: float = 0.2,
+        family: Optional[str] = None,
+        premium_io: bool = False,
+        accelerated_networking: bool = False,
+    ) -> Optional[Dict]:
+        """
+        Returns the cheapest SKU that covers a capacity vector plus headroom, or None if none does.
+
+        Args:
+            required (Dict[str, float]): Needed "vcpus", "memory_gb", "disk_bytes_per_sec"
+                (uncached disk throughput) and "bandwidth_mbps".
+                Missing dimensions are not constrained.
+            headroom (float): Extra share of capacity to keep free, e.g. 0.2 for 20 %.
+            family (str, optional): Only consider SKUs of this family.
+            premium_io (bool): Only consider SKUs supporting premium storage.
+            accelerated_networking (bool): Only consider SKUs supporting accelerated networking.
+        """
+        return self.find_batch(
+            [required],
+            headroom=headroom,
+            families=[family],
+            premium_io=[premium_io],
+            accelerated_networking=[accelerated_networking],
+        )[0]
+
+    def find_batch(
+        self,
+        required: Sequence[Dict[str, float]],
+        headroom: float = 0.2,
+        families: Optional[Sequence[Optional[str]]] = None,
+        premium_io: Optional[Sequence[bool]] = None,
+        accelerated_networking: Optional[Sequence[bool]] = None,
+    ) -> List[Optional[Dict]]:
+        """
+        Resolves the cheapest fitting SKU of many VMs at once. Takes the same
+        constraints as :meth:`find`, one entry per VM.
+
+        Returns:
+            List[Optional[Dict]]: The SKU found for each VM, or None where nothing fits.
+        """
+        count = len(required)
+        if not count or not self.skus:
+            return [None] * count
+
+        demand = np.array(
+            [[vm.get(key) or 0 for key, _ in DIMENSIONS] for vm in required],
+            dtype=np.float64,
+        )
+        demand = np.nan_to_num(demand) * (1 + headroom)
+        families = np.array([family or "" for family in (families or [None] * count)])
+        premium_io = np.array(premium_io or [False] * count, dtype=bool)
+        accelerated_networking = np.array(
+            accelerated_networking or [False] * count, dtype=bool
+        )
+
+        matches = np.full(count, -1)
+        for start in range(0, count, BATCH_CHUNK_SIZE):
+            chunk = slice(start, start + BATCH_CHUNK_SIZE)
+            # VMs x SKUs: every dimension covered and every constraint met
+            fits = np.all(self.capacities[None, :, :] >= demand[chunk, None, :], axis=2)
+            fits &= (families[chunk, None] == "") | (
+                families[chunk, None] == self.families[None, :]
+            )
+            fits &= ~premium_io[chunk, None] | self.premium_io[None, :]
+            fits &= (
+                ~accelerated_networking[chunk, None]
+                | self.accelerated_networking[None, :]
+            )
+            # SKUs are sorted by price, so the first fit is the cheapest
+            first = np.argmax(fits, axis=1)
+            matches[chunk] = np.where(fits.any(axis=1), first, -1)
+
+        logging.info(
+            f"Found a fitting SKU for {int(np.sum(matches >= 0))} of {count} VMs."
+        )
+        return [self.skus[i] if i >= 0 else None for i in matches]
+
+
+def required_capacity(sku: Dict, metrics: Dict[str, float]) -> Dict[str, float]:
+    """
+    Turns the utilization weights of a VM into the capacity it actually needs.
+
+    Each weight is scaled against the capacity it was measured on: disk
+    throughput against the uncached disk bytes per second, network traffic
+    against the network bandwidth.
+
+    Args:
+        sku (Dict): Current SKU of the VM, with the vm_skus columns.
+        metrics (Dict[str, float]): Weights of the VM as computed by analyze_fleet
+            (percentages of the current SKU's capacity).
+
+    Returns:
+        Dict[str, float]: Needed "vcpus", "memory_gb", "disk_bytes_per_sec" and "bandwidth_mbps";
+        unknown dimensions are left out.
+    """
+    required = {}
+    for key, column in DIMENSIONS:
+        capacity = sku.get(column)
+        utilization = metrics.get(DIMENSION_WEIGHTS[key])
+        if capacity and utilization is not None and not np.isnan(utilization):
+            required[key] = capacity * utilization / 100
+    return required
+
+
+def suggest_skus(
+    index: RightsizingIndex,
+    current_skus: Sequence[Optional[Dict]],
+    results: Dict[str, np.ndarray],
+    headroom: float = 0.2,
+    same_family: bool = False,
+) -> List[Optional[str]]:
+    """
+    Resolves the suggested SKU of a whole fleet from the output of analyze_fleet.
+
+    Args:
+        index (RightsizingIndex): Index of the fleet's region.
+        current_skus (Sequence[Optional[Dict]]): Current SKU of each VM, in analyze_fleet row order.
+        results (Dict[str, np.ndarray]): Output of analyze_fleet.
+        headroom (float): Extra share of capacity to keep free.
+        same_family (bool): Only suggest SKUs of each VM's current family.
+
+    Returns:
+        List[Optional[str]]: Suggested SKU name per VM, or None when the current SKU is unknown or nothing fits.
+    """
+    required, families, premium_io, accelerated_networking = [], [], [], []
+    for row, sku in enumerate(current_skus):
+        sku = sku or {}
+        required.append(
+            required_capacity(
+                sku, {column: values[row] for column, values in results.items()}
+            )
+            if sku
+            else {}
+        )
+        families.append(sku.get("family") if same_family else None)
+        # Keep the storage and networking features the VM may already rely on
+        premium_io.append(bool(sku.get("premium_io")))
+        accelerated_networking.append(bool(sku.get("accelerated_networking")))
+
+    matches = index.find_batch(
+        required,
+        headroom=headroom,
+        families=families,
+        premium_io=premium_io,
+        accelerated_networking=accelerated_networking,
+    )
+    return [
+        match["name"] if match and sku and required[row] else None
+        for row, (match, sku) in enumerate(zip(matches, current_skus))
+    ]
@@ -1,22 +1,52 @@
 import requests
 import logging
+import numpy as np
 from datetime import datetime, timedelta
-from typing import Optional, Dict, List
+from typing import Optional, Dict, Iterable, List
+from ..arm import get_arm_client
+from ..auth import resolve_access_token
+from ..streaming import iter_paged_items
 from ..send_email import send_email
+from ..digest import DigestCollector
+from .analyzer import add_series, analyze_fleet, build_fleet_matrix
+from .rightsizing import RightsizingIndex, suggest_skus
+
+
+# Metric names and the aggregation each one is summarized with
+VM_METRICS = {
+    "Percentage CPU": "Average",
+    "Available Memory Bytes": "Average",
+    "Data Disk Read Bytes/sec": "Average",
+    "Data Disk Write Bytes/sec": "Average",
+    "Network In Total": "Total",
+    "Network Out Total": "Total",
+}
 
 
 def fetch_vm_consumption_data(
-    subscription_id: str, resource_group_name: str, vm_name: str, access_token: str
+    subscription_id: str,
+    resource_group_name: str,
+    vm_name: str,
+    access_token: str,
+    interval: str = "PT1H",
+    timespan: Optional[str] = None,
 ) -> Optional[Dict]:
     """
     Fetch consumption data for a virtual machine (VM) in Azure, including CPU usage, memory usage, storage IOPS, and network data.
 
+    All metrics are requested in a single call and aggregated by Azure Monitor into ``interval`` buckets.
+
     :param subscription_id: Azure subscription ID.
     :param resource_group_name: Name of the resource group containing the VM.
     :param vm_name: Name of the virtual machine.
-    :param access_token: Azure access token.
-    :return: Dictionary with consumption data, or None if an error occurred.
+    :param access_token: Azure access token or ServicePrincipalCredential.
+    :param interval: ISO 8601 duration of each data point, e.g. PT5M, PT1H or P1D.
+    :param timespan: ISO 8601 "start/end" interval to query. Defaults to the last 7 days.
+    :return: Dictionary with the scalar value of each metric and, under "series", its per-interval data points,
+        or None if an error occurred.
     """
+    access_token = resolve_access_token(access_token)
+
     # Validate input parameters
     if not subscription_id:
         logging.error("Invalid input: subscription_id is required.")
@@ -32,83 +62,152 @@ def fetch_vm_consumption_data(
         return None
 
     # Set time range for metric query (e.g., last 7 days)
-    end_time = datetime.utcnow()
-    start_time = end_time - timedelta(days=7)
-    start_time_str = start_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-    end_time_str = end_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-
-    # Metric names and aggregation types to fetch
-    metrics = [
-        ("Percentage CPU", "Average"),
-        ("Available Memory Bytes", "Average"),
-        ("Data Disk Read Bytes/sec", "Average"),
-        ("Data Disk Write Bytes/sec", "Average"),
-        ("Network In Total", "Total"),
-        ("Network Out Total", "Total"),
-    ]
-
-    consumption_data = {}
-
-    for metric_name, aggregation_type in metrics:
-        url = f"https://management.azure.com/subscriptions/{subscription_id}/resourceGroups/{resource_group_name}/providers/Microsoft.Compute/virtualMachines/{vm_name}/providers/microsoft.insights/metrics?api-version=2018-01-01&metricnames={metric_name}&aggregation={aggregation_type}&startTime={start_time_str}&endTime={end_time_str}"
-        headers = {"Authorization": f"Bearer {access_token}"}
-        try:
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error fetching VM metrics for {metric_name}: {e}")
-            return None
-
-        metrics_data = response.json()
-
-        if metrics_data and metrics_data.get("value"):
-            metric = metrics_data["value"][0]
-            if metric["timeseries"] and metric["timeseries"][0]["data"]:
-                data_points = metric["timeseries"][0]["data"]
-                if aggregation_type == "Average":
-                    total_value = sum(
-                        [
-                            data_point["average"]
-                            for data_point in data_points
-                            if data_point["average"] is not None
-                        ]
-                    )
-                    average_value = total_value / len(data_points)
-                    consumption_data[metric_name] = average_value
-                elif aggregation_type == "Total":
-                    total_value = sum(
-                        [
-                            data_point["total"]
-                            for data_point in data_points
-                            if data_point["total"] is not None
-                        ]
-                    )
-                    consumption_data[metric_name] = total_value
+    if not timespan:
+        end_time = datetime.utcnow()
+        start_time = end_time - timedelta(days=7)
+        timespan = f"{start_time.strftime('%Y-%m-%dT%H:%M:%SZ')}/{end_time.strftime('%Y-%m-%dT%H:%M:%SZ')}"
+
+    url = f"/subscriptions/{subscription_id}/resourceGroups/{resource_group_name}/providers/Microsoft.Compute/virtualMachines/{vm_name}/providers/microsoft.insights/metrics"
+    params = {
+        "api-version": "2018-01-01",
+        "metricnames": ",".join(VM_METRICS),
+        "aggregation": ",".join(sorted(set(VM_METRICS.values()))),
+        "interval": interval,
+        "timespan": timespan,
+    }
+    try:
+        # Metrics are summarized one at a time as they are parsed from the response
+        return parse_vm_metrics(
+            iter_paged_items(url, access_token, params=params, client=get_arm_client())
+        )
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Error fetching VM metrics for {vm_name}: {e}")
+        return None
+    except ValueError as e:
+        logging.error(f"Error decoding VM metrics for {vm_name}: {e}")
+        return None
+
+
+def parse_vm_metrics(metrics: Iterable[Dict]) -> Dict:
+    """
+    Summarize the ``value`` list of an Azure Monitor metrics response.
+
+    :param metrics: Metrics as returned by the metrics API, one entry per metric name.
+    :return: Dictionary with the scalar value of each metric in VM_METRICS (average of the
+        interval averages, or sum of the interval totals) and, under "series", the
+        per-interval [timestamp, value] pairs of each metric.
+    """
+    consumption_data = {"series": {}}
+    aggregations = {
+        name.lower(): (name, aggregation) for name, aggregation in VM_METRICS.items()
+    }
+
+    for metric in metrics:
+        metric_name, aggregation_type = aggregations.get(
+            metric.get("name", {}).get("value", "").lower(), (None, None)
+        )
+        if metric_name is None or not metric.get("timeseries"):
+            continue
+
+        key = aggregation_type.lower()
+        series = [
+            # The batch metrics API spells the key "timestamp"
+            [
+                data_point.get("timeStamp") or data_point.get("timestamp"),
+                data_point[key],
+            ]
+            for data_point in metric["timeseries"][0].get("data", [])
+            if data_point.get(key) is not None
+        ]
+        consumption_data["series"][metric_name] = series
+        if not series:
+            continue
+
+        values = [value for _, value in series]
+        if aggregation_type == "Average":
+            consumption_data[metric_name] = sum(values) / len(values)
+        elif aggregation_type == "Total":
+            consumption_data[metric_name] = sum(values)
 
     return consumption_data
 
 
-def analyze_vm_consumption_data(consumption_data: Dict) -> Optional[str]:
+def _series_matrix(
+    series: List[List], start: np.datetime64, end: np.datetime64, interval_seconds: int
+) -> np.ndarray:
+    # One-row matrix on the VM's time grid, as analyze_fleet expects
+    timestamps = np.array(
+        [timestamp[:19] for timestamp, _ in series], dtype="datetime64[s]"
+    )
+    values = np.array([value for _, value in series], dtype=np.float64)
+    return build_fleet_matrix(
+        {"vm": (timestamps, values)}, ["vm"], start, end, interval_seconds
+    )
+
+
+def analyze_vm_consumption_data(
+    consumption_data: Dict,
+    current_sku: Optional[Dict] = None,
+    index: Optional[RightsizingIndex] = None,
+    headroom: float = 0.2,
+    interval_seconds: int = 3600,
+) -> Optional[str]:
     """
     Analyze consumption data of a resource and suggest a better fit resource SKU.
 
-    :param consumption_data: Dictionary containing resource consumption data.
-    :return: Suggested resource SKU, or None if no suggestion can be made.
+    The VM is run through the same analyze_fleet and suggest_skus passes as a
+    whole fleet, as a fleet of one.
+
+    :param consumption_data: Dictionary containing resource consumption data, as returned by fetch_vm_consumption_data.
+    :param current_sku: Current SKU of the VM, with the vm_skus columns, e.g. SkuCatalog.get(location, name).
+    :param index: RightsizingIndex of the VM's region, e.g. RightsizingIndex.from_catalog(catalog, location).
+    :param headroom: Extra share of capacity to keep free, e.g. 0.2 for 20 %.
+    :param interval_seconds: Length of each data point in seconds, matching the interval the data was fetched with.
+    :return: Suggested resource SKU, or None if no suggestion can be made or the current SKU already fits best.
     """
     # Check input data
-    if not consumption_data:
+    if not consumption_data or not current_sku or index is None:
+        return None
+    series = consumption_data.get("series") or {}
+    if not series.get("Percentage CPU"):
         return None
 
-    # Analyze consumption data
-    # TODO: Implement specific logic for analyzing consumption data and suggesting a better fit resource SKU.
+    # Lay every metric out on one grid spanning all of the VM's samples
+    timestamps = np.array(
+        [timestamp[:19] for points in series.values() for timestamp, _ in points],
+        dtype="datetime64[s]",
+    )
+    start = timestamps.min()
+    end = timestamps.max() + np.timedelta64(interval_seconds, "s")
 
-    # Example:
-    # cpu average consumption is 40 % and memory average consumption is 50 % and network in is 1000 and network out is 2000 and disk read is 3000 and disk write is 4000,
-    # but the current SKU is Standard_D4s_v3, which has 4 vCPUs and 16 GB memory and 5000 IOPS and 1000 Mbps network bandwidth.
-    # The suggested SKU is Standard_D2s_v3, which has 2 vCPUs and 8 GB memory and 2500 IOPS and 500 Mbps network bandwidth.
+    def matrix(metric_name: str) -> np.ndarray:
+        return _series_matrix(
+            series.get(metric_name) or [], start, end, interval_seconds
+        )
 
-    suggested_sku = None
+    def capacity(value: Optional[float]) -> np.ndarray:
+        return np.array([value or np.nan], dtype=np.float64)
 
+    network_bytes_per_sec = (current_sku.get("network_bandwidth_mbps") or 0) * 125_000
+    results = analyze_fleet(
+        cpu_percent=matrix("Percentage CPU"),
+        available_memory_bytes=matrix("Available Memory Bytes"),
+        memory_bytes=capacity((current_sku.get("memory_gb") or 0) * 1024**3),
+        disk_bytes_per_sec=add_series(
+            matrix("Data Disk Read Bytes/sec"), matrix("Data Disk Write Bytes/sec")
+        ),
+        disk_capacity_bytes_per_sec=capacity(
+            current_sku.get("uncached_disk_bytes_per_second")
+        ),
+        network_bytes=add_series(
+            matrix("Network In Total"), matrix("Network Out Total")
+        ),
+        network_capacity_bytes=capacity(network_bytes_per_sec * interval_seconds),
+        interval_minutes=interval_seconds // 60,
+    )
+    suggested_sku = suggest_skus(index, [current_sku], results, headroom=headroom)[0]
+    if suggested_sku and suggested_sku.lower() == current_sku["name"].lower():
+        return None
     return suggested_sku
 
 
@@ -119,17 +218,19 @@ def send_recommendation_email(
     from_email: str,
     to_email: List[str],
     recommendation_data: Dict[str, str],
+    digest: Optional[DigestCollector] = None,
 ) -> None:
     """
-    Sends a recommendation email to the specified user.
+    Sends a recommendation email to the specified user, or adds it to a run's digest.
 
     Args:
         subscription_id (str): The subscription ID.
         resource_group_name (str): The name of the resource group.
-        access_token (str): The access token to use for authentication.
+        access_token (str): The access token (or ServicePrincipalCredential) to use for authentication.
         from_email (str): The email address to use as the sender.
         to_email (List[str]): A list of email addresses to send the email to.
-        recommendation_data (Dict[str, str]): The recommendation data, including the name of the resource, current and recommended sizes, and usage data.
+        recommendation_data (Dict[str, str]): The recommendation data, including the name of the resource, current and recommended sizes, usage data and, optionally, the monthly savings.
+        digest (DigestCollector, optional): Collect the recommendation for one per-owner digest email instead of sending it now.
 
     Raises:
         ValueError: If any of the required parameters are missing or invalid.
@@ -150,6 +251,20 @@ def send_recommendation_email(
     if not recommendation_data or not isinstance(recommendation_data, dict):
         raise ValueError("Recommendation data is missing or invalid")
 
+    if digest is not None:
+        detail = f"{recommendation_data.get('current_size')} -> {recommendation_data.get('new_size')}"
+        if recommendation_data.get("monthly_savings"):
+            detail += f", saving about ${recommendation_data['monthly_savings']:,.2f} per month"
+        for email in to_email:
+            digest.add(
+                email,
+                "resize",
+                recommendation_data.get("name"),
+                detail,
+                subscription_id=subscription_id,
+            )
+        return
+
     # Get the resource name and type from the recommendation data
     virtual_machine_name = recommendation_data.get("name")
     current_size = recommendation_data.get("current_size")
@@ -158,6 +273,12 @@ def send_recommendation_email(
     storage_utilization = recommendation_data.get("storage_utilization")
     network_utilization = recommendation_data.get("network_utilization")
     new_size = recommendation_data.get("new_size")
+    monthly_savings = recommendation_data.get("monthly_savings")
+    savings_line = (
+        f"This change would save about ${monthly_savings:,.2f} per month."
+        if monthly_savings
+        else ""
+    )
 
     # Send the email using the template
     is_html = (True,)
@@ -173,6 +294,7 @@ def send_recommendation_email(
         The average storage IOPS over the past week was: {storage_utilization}.
         The average network throughput over the past week was: {network_utilization}.
         Based on these metrics, we suggest that you change the VM size to {new_size}, which is a more appropriate size for your use case.
+        {savings_line}
 
         Please note that if you don't take any action within the next 3 days, we'll forcefully change the VM size to the suggested size to optimize your resource usage and reduce costs.
 
@@ -0,0 +1,200 @@
+import requests
+from typing import Dict, Iterator, List, Optional
+from ..arm import get_arm_client
+
+# Resource Graph accepts at most 1000 subscriptions per query
+MAX_SUBSCRIPTIONS_PER_QUERY = 1000
+
+RESOURCE_GRAPH_URL = (
+    "/providers/Microsoft.ResourceGraph/resources?api-version=2021-03-01"
+)
+
+
+def _kql_string(value: str) -> str:
+    escaped = value.replace("\\", "\\\\").replace("'", "\\'")
+    return f"'{escaped}'"
+
+
+def query_resource_graph(
+    subscriptions: List[str],
+    query: str,
+    access_token: str,
+    page_size: int = 1000,
+) -> Iterator[Dict]:
+    """
+    Runs a KQL query against Azure Resource Graph and lazily yields the result rows, following ``$skipToken``.
+
+    Args:
+        subscriptions (List[str]): IDs of the subscriptions to query. Batched by 1000 per request.
+        query (str): KQL query. Project only the columns you need to keep pages small.
+        access_token (str): The access token (or ServicePrincipalCredential) to use for authentication.
+        page_size (int): Rows per page, at most 1000.
+
+    Raises:
+        ValueError: If any of the required parameters are missing or invalid.
+        Exception: If there is an error running the query.
+
+    Returns:
+        Iterator[Dict]: One dictionary per result row.
+    """
+    # Validate input parameters
+    if not subscriptions or not isinstance(subscriptions, list):
+        raise ValueError("Subscriptions are missing or invalid")
+    if not query or not isinstance(query, str):
+        raise ValueError("Query is missing or invalid")
+    if not access_token:
+        raise ValueError("Access token is missing or invalid")
+    if not 1 <= page_size <= 1000:
+        raise ValueError("Page size must be between 1 and 1000")
+
+    return _iter_resource_graph_pages(subscriptions, query, access_token, page_size)
+
+
+def _iter_resource_graph_pages(
+    subscriptions: List[str], query: str, access_token: str, page_size: int
+) -> Iterator[Dict]:
+    for start in range(0, len(subscriptions), MAX_SUBSCRIPTIONS_PER_QUERY):
+        payload = {
+            "subscriptions": subscriptions[start : start + MAX_SUBSCRIPTIONS_PER_QUERY],
+            "query": query,
+            "options": {"resultFormat": "objectArray", "$top": page_size},
+        }
+        while True:
+            try:
+                response = get_arm_client().post(
+                    RESOURCE_GRAPH_URL, access_token=access_token, json=payload
+                )
+                response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                raise Exception(f"Failed to query Resource Graph. Error: {e}")
+
+            data = response.json()
+            yield from data.get("data", [])
+
+            skip_token = data.get("$skipToken")
+            if not skip_token:
+                break
+            payload["options"]["$skipToken"] = skip_token
+
+
+def iter_resource_groups_graph(
+    subscriptions: List[str],
+    access_token: str,
+    missing_tags: Optional[List[str]] = None,
+) -> Iterator[Dict[str, str]]:
+    """
+    Yields the resource groups of many subscriptions from Resource Graph, in the same shape as iter_resource_groups.
+
+    Args:
+        subscriptions (List[str]): IDs of the subscriptions to list resource groups for.
+        access_token (str): The access token (or ServicePrincipalCredential) to use for authentication.
+        missing_tags (List[str], optional): Only yield resource groups that lack at least one of these tags.
+            Unlike the ARM listing, this filter runs inside the query.
+
+    Returns:
+        Iterator[Dict[str, str]]: Dictionaries containing the name, location, ID, type, tags and subscription ID of each resource group.
+    """
+    query = (
+        "ResourceContainers"
+        " | where type =~ 'microsoft.resources/subscriptions/resourcegroups'"
+    )
+    if missing_tags:
+        conditions = " or ".join(
+            f"isnull(tags[{_kql_string(tag)}])" for tag in missing_tags
+        )
+        query += f" | where {conditions}"
+    query += " | project id, name, location, type, tags, subscriptionId"
+
+    for row in query_resource_graph(subscriptions, query, access_token):
+        yield {
+            "name": row.get("name", ""),
+            "location": row.get("location", ""),
+            "id": row.get("id", ""),
+            "type": row.get("type", ""),
+            "tags": row.get("tags") or {},
+            "subscription_id": row.get("subscriptionId", ""),
+        }
+
+
+def get_virtual_machines_graph(
+    subscriptions: List[str],
+    access_token: str,
+    resource_group_name: Optional[str] = None,
+    vm_name: Optional[str] = None,
+) -> Dict[str, Dict]:
+    """
+    Retrieves virtual machines of many subscriptions with one Resource Graph query, instead of one GET per VM.
+
+    The rows have the same top-level fields as the ARM virtual machine GET
+    (id, name, type, location, tags, properties), so they can be used wherever
+    get_azure_vm results are.
+
+    Args:
+        subscriptions (List[str]): IDs of the subscriptions to search.
+        access_token (str): The access token (or ServicePrincipalCredential) to use for authentication.
+        resource_group_name (str, optional): Only return VMs in this resource group.
+        vm_name (str, optional): Only return VMs with this name.
+
+    Returns:
+        Dict[str, Dict]: Virtual machines keyed by lower-cased resource ID.
+    """
+    query = "Resources | where type =~ 'microsoft.compute/virtualmachines'"
+    if resource_group_name:
+        query += f" | where resourceGroup =~ {_kql_string(resource_group_name)}"
+    if vm_name:
+        query += f" | where name =~ {_kql_string(vm_name)}"
+    query += " | project id, name, type, location, tags, properties, resourceGroup, subscriptionId"
+
+    return {
+        row["id"].lower(): row
+        for row in query_resource_graph(subscriptions, query, access_token)
+    }
+
+
+# Fields projected for the VM dependency inventory, keyed by resource type
+_INVENTORY_PROJECTIONS = {
+    "microsoft.compute/disks": (
+        "id, name, location, resourceGroup, subscriptionId, tags, managedBy,"
+        " skuName = tostring(sku.name), diskSizeGB = toint(properties.diskSizeGB),"
+        " diskState = tostring(properties.diskState)"
+    ),
+    "microsoft.network/networkinterfaces": (
+        "id, name, location, resourceGroup, subscriptionId, tags,"
+        " virtualMachineId = tostring(properties.virtualMachine.id),"
+        " ipConfigurations = properties.ipConfigurations"
+    ),
+    "microsoft.network/publicipaddresses": (
+        "id, name, location, resourceGroup, subscriptionId, tags,"
+        " ipAddress = tostring(properties.ipAddress),"
+        " ipConfigurationId = tostring(properties.ipConfiguration.id)"
+    ),
+}
+
+
+def list_resources_graph(
+    subscriptions: List[str], resource_type: str, access_token: str
+) -> Iterator[Dict]:
+    """
+    Lists disks, network interfaces or public IP addresses of many subscriptions, projecting only the fields we use.
+
+    Args:
+        subscriptions (List[str]): IDs of the subscriptions to list resources for.
+        resource_type (str): One of microsoft.compute/disks, microsoft.network/networkinterfaces
+            or microsoft.network/publicipaddresses.
+        access_token (str): The access token (or ServicePrincipalCredential) to use for authentication.
+
+    Raises:
+        ValueError: If the resource type is not supported.
+
+    Returns:
+        Iterator[Dict]: One dictionary per resource.
+    """
+    projection = _INVENTORY_PROJECTIONS.get(resource_type.lower())
+    if projection is None:
+        raise ValueError(f"Unsupported resource type: {resource_type}")
+
+    query = (
+        f"Resources | where type =~ {_kql_string(resource_type)}"
+        f" | project {projection}"
+    )
+    return query_resource_graph(subscriptions, query, access_token)
@@ -1,16 +1,145 @@
 import requests
-from typing import List, Dict
+from typing import Dict, Iterator, List, Optional
+from ..arm import get_arm_client
+from ..auth import resolve_access_token
+from ..batch import ArmBatch
+from ..lro import OperationTracker
+from .resource_graph import iter_resource_groups_graph
+
+
+def iter_resource_groups(
+    subscription_id: str,
+    access_token: str,
+    top: Optional[int] = None,
+    filter_expression: Optional[str] = None,
+    missing_tags: Optional[List[str]] = None,
+    backend: str = "arm",
+    expand: Optional[str] = None,
+) -> Iterator[Dict[str, str]]:
+    """
+    Lazily yields the resource groups in the specified subscription, following ``nextLink`` page by page.
+
+    Args:
+        subscription_id (str): The ID of the subscription to retrieve resource group data for.
+        access_token (str): The access token (or ServicePrincipalCredential) to use for authentication.
+        top (int, optional): Maximum number of resource groups, pushed down to ARM as ``$top``.
+            No further page is requested once that many were yielded.
+        filter_expression (str, optional): OData filter pushed down to ARM as ``$filter``, e.g. ``tagName eq 'TTL'``.
+        missing_tags (List[str], optional): Only yield resource groups that lack at least one of these tags.
+            ARM cannot filter on absent tags, so this is applied to each page as it arrives.
+        backend (str): "arm" to page through the ARM listing, or "graph" to query Azure Resource Graph,
+            which filters missing tags server-side but does not support ``top``/``filter_expression``.
+        expand (str, optional): Extra properties pushed down to ARM as ``$expand``, e.g. ``createdTime``.
+            Returned as ``created_time``/``changed_time`` when ARM includes them.
+
+    Raises:
+        ValueError: If the subscription ID or access token is missing or invalid.
+        Exception: If there is an error retrieving a page.
+
+    Returns:
+        Iterator[Dict[str, str]]: Dictionaries containing the name, location, ID, type, and tags for each resource group.
+    """
+    # Validate input parameters
+    if not subscription_id or not isinstance(subscription_id, str):
+        raise ValueError("Subscription ID is missing or invalid")
+    if not access_token:
+        raise ValueError("Access token is missing or invalid")
+    if top is not None and (not isinstance(top, int) or top < 1):
+        raise ValueError("Top must be a positive integer")
+    if backend not in ("arm", "graph"):
+        raise ValueError(f"Unknown backend: {backend}")
+
+    if backend == "graph":
+        if top or filter_expression or expand:
+            raise ValueError(
+                "Top, filter and expand expressions require the ARM backend"
+            )
+        return iter_resource_groups_graph(
+            subscriptions=[subscription_id],
+            access_token=access_token,
+            missing_tags=missing_tags,
+        )
+
+    params = {"api-version": "2020-06-01"}
+    if top:
+        params["$top"] = top
+    if filter_expression:
+        params["$filter"] = filter_expression
+    if expand:
+        params["$expand"] = expand
+
+    # Validation runs eagerly; the pages are only requested once iteration starts
+    return _iter_resource_group_pages(
+        f"/subscriptions/{subscription_id}/resourcegroups",
+        params,
+        access_token,
+        missing_tags,
+        top,
+    )
+
+
+def _resource_group_fields(item: Dict) -> Dict[str, str]:
+    resource_group = {
+        "name": item.get("name", ""),
+        "location": item.get("location", ""),
+        "id": item.get("id", ""),
+        "type": item.get("type", ""),
+        "tags": item.get("tags") or {},
+    }
+    # Only present when requested through $expand
+    if "createdTime" in item:
+        resource_group["created_time"] = item["createdTime"]
+    if "changedTime" in item:
+        resource_group["changed_time"] = item["changedTime"]
+    return resource_group
+
+
+def _iter_resource_group_pages(
+    url: str,
+    params: Dict,
+    access_token: str,
+    missing_tags: Optional[List[str]],
+    top: Optional[int] = None,
+) -> Iterator[Dict[str, str]]:
+    yielded = 0
+    while url:
+        # Send request to Azure Management API to retrieve a page of resource groups
+        try:
+            response = get_arm_client().get(
+                url, access_token=access_token, params=params
+            )
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Failed to retrieve resource groups data. Error: {e}")
+
+        # Keep only the fields we use from each item, so the raw page can be released
+        data = response.json()
+        for item in data.get("value", []):
+            tags = item.get("tags") or {}
+            if missing_tags and all(tag in tags for tag in missing_tags):
+                continue
+            yield _resource_group_fields(item)
+            yielded += 1
+            if top and yielded >= top:
+                return
+
+        # The nextLink already carries the query string of the original request
+        url = data.get("nextLink")
+        params = None
 
 
 def get_resource_groups(
-    subscription_id: str, access_token: str
+    subscription_id: str, access_token: str, backend: str = "arm"
 ) -> List[Dict[str, str]]:
     """
     Retrieves data for all resource groups in the specified subscription and returns it as a list of dictionaries.
 
+    Use :func:`iter_resource_groups` to process resource groups while later pages are still loading.
+
     Args:
         subscription_id (str): The ID of the subscription to retrieve resource group data for.
-        access_token (str): The access token to use for authentication.
+        access_token (str): The access token (or ServicePrincipalCredential) to use for authentication.
+        backend (str): "arm" for the ARM listing or "graph" for Azure Resource Graph.
 
     Raises:
         ValueError: If the subscription ID or access token is missing or invalid.
@@ -19,55 +148,88 @@ def get_resource_groups(
     Returns:
         List[Dict[str, str]]: A list of dictionaries containing the name, location, ID, type, and tags for each resource group.
     """
+    return list(
+        iter_resource_groups(
+            subscription_id=subscription_id, access_token=access_token, backend=backend
+        )
+    )
+
+
+def get_resource_group(
+    subscription_id: str,
+    resource_group_name: str,
+    access_token: str,
+    expand: Optional[str] = None,
+) -> Optional[Dict[str, str]]:
+    """
+    Retrieves the current data of one resource group.
+
+    Args:
+        subscription_id (str): The ID of the subscription that the resource group belongs to.
+        resource_group_name (str): The name of the resource group to retrieve.
+        access_token (str): The access token (or ServicePrincipalCredential) to use for authentication.
+        expand (str, optional): Extra properties pushed down to ARM as ``$expand``, e.g. ``createdTime``.
+
+    Raises:
+        ValueError: If any of the required parameters are missing or invalid.
+        Exception: If there is an error retrieving the resource group.
+
+    Returns:
+        Optional[Dict[str, str]]: The name, location, ID, type, and tags of the resource group, as yielded
+        by :func:`iter_resource_groups`, or None if it does not exist.
+    """
     # Validate input parameters
     if not subscription_id or not isinstance(subscription_id, str):
         raise ValueError("Subscription ID is missing or invalid")
-    if not access_token or not isinstance(access_token, str):
+    if not resource_group_name or not isinstance(resource_group_name, str):
+        raise ValueError("Resource group name is missing or invalid")
+    if not access_token:
         raise ValueError("Access token is missing or invalid")
 
-    # Send request to Azure Management API to retrieve resource group data
-    url = f"https://management.azure.com/subscriptions/{subscription_id}/resourcegroups?api-version=2020-06-01"
-    headers = {"Authorization": f"Bearer {access_token}"}
+    params = {"api-version": "2020-06-01"}
+    if expand:
+        params["$expand"] = expand
     try:
-        response = requests.get(url, headers=headers)
+        response = get_arm_client().get(
+            f"/subscriptions/{subscription_id}/resourcegroups/{resource_group_name}",
+            access_token=access_token,
+            params=params,
+        )
+        if response.status_code == 404:
+            return None
         response.raise_for_status()
     except requests.exceptions.RequestException as e:
-        raise Exception(f"Failed to retrieve resource groups data. Error: {e}")
-
-    # Parse data from API response and create list of resource group dictionaries
-    data = response.json()
-    resource_groups = []
-    for item in data.get("value", []):
-        resource_group = {
-            "name": item.get("name", ""),
-            "location": item.get("location", ""),
-            "id": item.get("id", ""),
-            "type": item.get("type", ""),
-            "tags": item.get("tags", {}),
-        }
-        resource_groups.append(resource_group)
-
-    return resource_groups
+        raise Exception(f"Failed to retrieve resource group. Error: {e}")
+    return _resource_group_fields(response.json())
 
 
 def delete_resource_group(
-    subscription_id: str, resource_group_name: str, access_token: str
+    subscription_id: str,
+    resource_group_name: str,
+    access_token: str,
+    tracker: Optional[OperationTracker] = None,
 ) -> bool:
     """
     Deletes the specified resource group.
 
+    ARM answers with 202 Accepted and deletes the group in the background. Pass
+    an OperationTracker to follow the deletion until it actually finishes.
+
     Args:
         subscription_id (str): The ID of the subscription that the resource group belongs to.
         resource_group_name (str): The name of the resource group to delete.
-        access_token (str): The access token to use for authentication.
+        access_token (str): The access token (or ServicePrincipalCredential) to use for authentication.
+        tracker (OperationTracker, optional): Tracker to register the deletion with.
 
     Raises:
         ValueError: If any of the required parameters are missing or invalid.
         Exception: If there is an error deleting the resource group.
 
     Returns:
-        bool: True if the resource group was successfully deleted, False otherwise.
+        bool: True if the resource group was deleted or its deletion was accepted, False otherwise.
     """
+    access_token = resolve_access_token(access_token)
+
     # Validate input parameters
     if not subscription_id or not isinstance(subscription_id, str):
         raise ValueError("Subscription ID is missing or invalid")
@@ -77,9 +239,8 @@ def delete_resource_group(
         raise ValueError("Access token is missing or invalid")
 
     # Check if the specified resource group exists and belongs to the specified subscription ID
-    url = f"https://management.azure.com/subscriptions/{subscription_id}/resourcegroups/{resource_group_name}?api-version=2020-06-01"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.get(url, headers=headers)
+    url = f"/subscriptions/{subscription_id}/resourcegroups/{resource_group_name}?api-version=2020-06-01"
+    response = get_arm_client().get(url, access_token=access_token)
     if response.status_code == 404:
         print(
             f"Resource group {resource_group_name} not found in subscription {subscription_id}"
@@ -89,16 +250,80 @@ def delete_resource_group(
         raise Exception(f"Failed to check resource group. Error: {response.text}")
 
     # Send request to Azure Management API to delete resource group
-    url = f"https://management.azure.com/subscriptions/{subscription_id}/resourcegroups/{resource_group_name}?api-version=2020-06-01"
-    headers = {"Authorization": f"Bearer {access_token}"}
+    url = f"/subscriptions/{subscription_id}/resourcegroups/{resource_group_name}?api-version=2020-06-01"
     try:
-        response = requests.delete(url, headers=headers)
+        response = get_arm_client().delete(url, access_token=access_token)
         response.raise_for_status()
     except requests.exceptions.RequestException as e:
         raise Exception(f"Failed to delete resource group. Error: {e}")
 
-    # Return True if the request was successful, False otherwise
-    if response.status_code == 200:
-        return True
-    else:
-        return False
+    if tracker is not None:
+        tracker.register(
+            f"/subscriptions/{subscription_id}/resourceGroups/{resource_group_name}",
+            response,
+        )
+
+    # Return True if the deletion finished or was accepted, False otherwise
+    return response.status_code in (200, 202)
+
+
+def delete_resource_groups_batch(
+    subscription_id: str,
+    resource_group_names: List[str],
+    access_token: str,
+    batch_size: int = 20,
+    tracker: Optional[OperationTracker] = None,
+) -> Dict[str, bool]:
+    """
+    Deletes many resource groups, sending up to ``batch_size`` DELETEs per ARM batch request.
+
+    Args:
+        subscription_id (str): The ID of the subscription that the resource groups belong to.
+        resource_group_names (List[str]): The names of the resource groups to delete.
+        access_token (str): The access token (or ServicePrincipalCredential) to use for authentication.
+        batch_size (int): Number of deletions per batch request.
+        tracker (OperationTracker, optional): Tracker to register the accepted deletions with.
+
+    Raises:
+        ValueError: If any of the required parameters are missing or invalid.
+
+    Returns:
+        Dict[str, bool]: For each resource group name, True if its deletion was accepted, False otherwise.
+    """
+    # Validate input parameters
+    if not subscription_id or not isinstance(subscription_id, str):
+        raise ValueError("Subscription ID is missing or invalid")
+    if not isinstance(resource_group_names, list):
+        raise ValueError("Resource group names are missing or invalid")
+    if not access_token:
+        raise ValueError("Access token is missing or invalid")
+
+    batch = ArmBatch(access_token=access_token, batch_size=batch_size)
+    names = {
+        batch.add(
+            "DELETE",
+            f"/subscriptions/{subscription_id}/resourcegroups/{resource_group_name}?api-version=2020-06-01",
+        ): resource_group_name
+        for resource_group_name in resource_group_names
+    }
+
+    results = {}
+    for operation_name, result in batch.execute().items():
+        resource_group_name = names[operation_name]
+        # Deletion is a long-running operation; 202 means ARM accepted it
+        results[resource_group_name] = result["status"] in (200, 202)
+        if tracker is not None and results[resource_group_name]:
+            tracker.register_operation(
+                f"/subscriptions/{subscription_id}/resourceGroups/{resource_group_name}",
+                result["status"],
+                result["headers"],
+            )
+        if result["status"] == 404:
+            print(
+                f"Resource group {resource_group_name} not found in subscription {subscription_id}"
+            )
+        elif not results[resource_group_name]:
+            print(
+                f"Failed to delete resource group {resource_group_name}. Error: {result['content']}"
+            )
+    return results
@@ -0,0 +1,71 @@
+import json
+import requests
+from typing import Dict, List
+from ..arm import get_arm_client
+
+
+def get_subscriptions(access_token: str) -> List[Dict[str, str]]:
+    """
+    Retrieves every subscription the principal can see, following ``nextLink`` across pages.
+
+    Args:
+        access_token (str): The access token (or ServicePrincipalCredential) to use for authentication.
+
+    Raises:
+        ValueError: If the access token is missing or invalid.
+        Exception: If there is an error retrieving the data.
+
+    Returns:
+        List[Dict[str, str]]: A list of dictionaries containing the ID, display name and state of each subscription.
+    """
+    # Validate input parameters
+    if not access_token:
+        raise ValueError("Access token is missing or invalid")
+
+    url = "/subscriptions?api-version=2020-01-01"
+    subscriptions = []
+    while url:
+        try:
+            response = get_arm_client().get(url, access_token=access_token)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Failed to retrieve subscriptions. Error: {e}")
+
+        data = response.json()
+        for item in data.get("value", []):
+            subscriptions.append(
+                {
+                    "id": item.get("subscriptionId", ""),
+                    "name": item.get("displayName", ""),
+                    "state": item.get("state", ""),
+                }
+            )
+        url = data.get("nextLink")
+
+    return subscriptions
+
+
+def read_subscriptions_file(
+    file_path: str = "data/subscriptions_list.json",
+) -> List[Dict[str, str]]:
+    """
+    Reads subscriptions from a JSON file mapping display name to subscription ID.
+
+    Args:
+        file_path (str): Path to the JSON file, e.g. data/subscriptions_list.json.
+
+    Raises:
+        ValueError: If the file does not contain a JSON object.
+
+    Returns:
+        List[Dict[str, str]]: A list of dictionaries containing the ID and display name of each subscription.
+    """
+    with open(file_path, "r") as file:
+        data = json.load(file)
+    if not isinstance(data, dict):
+        raise ValueError(f"{file_path} must map subscription names to IDs")
+
+    return [
+        {"id": subscription_id, "name": name, "state": ""}
+        for name, subscription_id in data.items()
+    ]
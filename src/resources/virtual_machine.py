@@ -1,8 +1,18 @@
 import requests
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+from ..arm import get_arm_client
+from ..lro import wait_for_operation
+from ..auth import resolve_access_token
+from .resource_graph import get_virtual_machines_graph
 
 
 def get_azure_vm(
-    subscription_id: str, resource_group_name: str, vm_name: str, access_token: str
+    subscription_id: str,
+    resource_group_name: str,
+    vm_name: str,
+    access_token: str,
+    backend: str = "arm",
 ) -> dict:
     """
     Gets information about an Azure VM.
@@ -11,7 +21,9 @@ def get_azure_vm(
         subscription_id (str): The ID of the subscription that the resource group belongs to.
         resource_group_name (str): The name of the resource group that the VM belongs to.
         vm_name (str): The name of the VM to get information about.
-        access_token (str): The access token to use for authentication.
+        access_token (str): The access token (or ServicePrincipalCredential) to use for authentication.
+        backend (str): "arm" for a GET on the VM or "graph" for an Azure Resource Graph query.
+            Use get_virtual_machines_graph to fetch many VMs in one query.
 
     Raises:
         ValueError: If any of the required parameters are missing or invalid.
@@ -20,6 +32,8 @@ def get_azure_vm(
     Returns:
         dict: Information about the VM in the form of a dictionary.
     """
+    access_token = resolve_access_token(access_token)
+
     # Validate input parameters
     if not subscription_id or not isinstance(subscription_id, str):
         raise ValueError("Subscription ID is missing or invalid")
@@ -29,11 +43,25 @@ def get_azure_vm(
         raise ValueError("VM name is missing or invalid")
     if not access_token or not isinstance(access_token, str):
         raise ValueError("Access token is missing or invalid")
+    if backend not in ("arm", "graph"):
+        raise ValueError(f"Unknown backend: {backend}")
+
+    if backend == "graph":
+        vms = get_virtual_machines_graph(
+            subscriptions=[subscription_id],
+            access_token=access_token,
+            resource_group_name=resource_group_name,
+            vm_name=vm_name,
+        )
+        if not vms:
+            raise Exception(
+                f"VM {vm_name} not found in resource group {resource_group_name}"
+            )
+        return next(iter(vms.values()))
 
     # Send request to Azure Management API to get information about the VM
-    url = f"https://management.azure.com/subscriptions/{subscription_id}/resourceGroups/{resource_group_name}/providers/Microsoft.Compute/virtualMachines/{vm_name}?api-version=2020-06-01"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.get(url, headers=headers)
+    url = f"/subscriptions/{subscription_id}/resourceGroups/{resource_group_name}/providers/Microsoft.Compute/virtualMachines/{vm_name}?api-version=2020-06-01"
+    response = get_arm_client().get(url, access_token=access_token)
     if response.status_code == 404:
         raise Exception(
             f"VM {vm_name} not found in resource group {resource_group_name}"
@@ -46,24 +74,146 @@ def get_azure_vm(
     return vm_info
 
 
-def delete_azure_vm(
-    subscription_id: str, resource_group_name: str, vm_name: str, access_token: str
-) -> bool:
+# API versions used to delete each resource type
+_DELETE_API_VERSIONS = {
+    "microsoft.compute/virtualmachines": "2020-06-01",
+    "microsoft.compute/disks": "2020-09-30",
+    "microsoft.network/networkinterfaces": "2020-06-01",
+    "microsoft.network/publicipaddresses": "2020-06-01",
+}
+
+
+def _resource_type(resource_id: str) -> str:
+    parts = resource_id.strip("/").split("/")
+    return f"{parts[5]}/{parts[6]}".lower()
+
+
+def _delete_resource(
+    resource_id: str, access_token, poll_interval: float
+) -> Dict[str, Optional[str]]:
+    api_version = _DELETE_API_VERSIONS.get(_resource_type(resource_id))
+    if api_version is None:
+        return {
+            "status": "Failed",
+            "error": f"Unsupported resource type: {_resource_type(resource_id)}",
+        }
+    # A failure must not abort the graph: the resources depending on this one are skipped instead
+    try:
+        response = get_arm_client().delete(
+            f"{resource_id}?api-version={api_version}", access_token=access_token
+        )
+        if response.status_code == 404:
+            return {"status": "NotFound", "error": None}
+        outcome = wait_for_operation(
+            response, access_token, poll_interval=poll_interval
+        )
+    except (requests.exceptions.RequestException, ValueError) as e:
+        return {"status": "Failed", "error": str(e)}
+    return {
+        "status": "Deleted" if outcome["status"] == "Succeeded" else outcome["status"],
+        "error": outcome["error"],
+    }
+
+
+def run_deletion_graph(
+    dependencies: Dict[str, List[str]],
+    access_token,
+    max_workers: int = 4,
+    poll_interval: float = 5,
+) -> Dict[str, Dict[str, Optional[str]]]:
     """
-    Deletes an Azure VM and all dependent resources.
+    Deletes resources in dependency order, running deletions that do not depend on each other in parallel.
+
+    Args:
+        dependencies (Dict[str, List[str]]): For each resource ID, the IDs of the resources that must be gone first.
+        access_token (str): The access token (or ServicePrincipalCredential) to use for authentication.
+        max_workers (int): Maximum number of deletions running at once.
+        poll_interval (float): First delay between long-running operation polls in seconds.
+
+    Returns:
+        Dict[str, Dict[str, Optional[str]]]: For each resource ID, its "status" (Deleted, NotFound,
+        Failed, Canceled, TimedOut, or Skipped when a dependency could not be deleted) and "error".
+        Resources in a dependency cycle are Failed without being deleted.
+    """
+    results = {}
+    # Dependencies outside the graph are taken as already gone
+    pending = {
+        resource_id: [
+            dependency for dependency in requires if dependency in dependencies
+        ]
+        for resource_id, requires in dependencies.items()
+    }
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            skipped = False
+            for resource_id, requires in list(pending.items()):
+                if any(
+                    results.get(dependency, {}).get("status")
+                    not in (None, "Deleted", "NotFound")
+                    for dependency in requires
+                ):
+                    results[resource_id] = {
+                        "status": "Skipped",
+                        "error": "A resource it depends on was not deleted",
+                    }
+                    del pending[resource_id]
+                    skipped = True
+                elif all(dependency in results for dependency in requires):
+                    running[
+                        executor.submit(
+                            _delete_resource, resource_id, access_token, poll_interval
+                        )
+                    ] = resource_id
+                    del pending[resource_id]
+            if skipped and not running:
+                # Skipping may unblock resources that come earlier in the pass
+                continue
+            if not running:
+                # Nothing can start and nothing will finish: what is left waits on itself
+                for resource_id in pending:
+                    results[resource_id] = {
+                        "status": "Failed",
+                        "error": "Dependency cycle between resources to delete",
+                    }
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+    return results
+
+
+def teardown_azure_vm(
+    subscription_id: str,
+    resource_group_name: str,
+    vm_name: str,
+    access_token,
+    max_workers: int = 4,
+    poll_interval: float = 5,
+) -> Dict:
+    """
+    Deletes an Azure VM and all dependent resources, reporting the outcome of each deletion.
+
+    The VM is deleted first and waited for. Its NICs and OS and data disks are
+    then deleted in parallel, and each public IP once the NIC using it is gone.
+    A ServicePrincipalCredential is resolved on every request, so long
+    deletions never outlive their token.
 
     Args:
         subscription_id (str): The ID of the subscription that the resource group belongs to.
         resource_group_name (str): The name of the resource group that the VM belongs to.
         vm_name (str): The name of the VM to delete.
-        access_token (str): The access token to use for authentication.
+        access_token (str): The access token (or ServicePrincipalCredential) to use for authentication.
+        max_workers (int): Maximum number of dependent resources deleted at once.
+        poll_interval (float): First delay between long-running operation polls in seconds.
 
     Raises:
         ValueError: If any of the required parameters are missing or invalid.
-        Exception: If there is an error deleting the VM or any dependent resources.
+        Exception: If there is an error getting information about the VM or its NICs.
 
     Returns:
-        bool: True if the VM and all dependent resources were successfully deleted, False otherwise.
+        Dict: The VM name, "success" (True if the VM and all dependent resources are gone) and
+        "resources", the result of each deletion keyed by resource ID.
     """
     # Validate input parameters
     if not subscription_id or not isinstance(subscription_id, str):
@@ -72,88 +222,133 @@ def delete_azure_vm(
         raise ValueError("Resource group name is missing or invalid")
     if not vm_name or not isinstance(vm_name, str):
         raise ValueError("VM name is missing or invalid")
-    if not access_token or not isinstance(access_token, str):
+    if not access_token:
         raise ValueError("Access token is missing or invalid")
 
     # Send request to Azure Management API to get information about the VM
-    url = f"https://management.azure.com/subscriptions/{subscription_id}/resourceGroups/{resource_group_name}/providers/Microsoft.Compute/virtualMachines/{vm_name}?api-version=2020-06-01"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.get(url, headers=headers)
+    url = f"/subscriptions/{subscription_id}/resourceGroups/{resource_group_name}/providers/Microsoft.Compute/virtualMachines/{vm_name}?api-version=2020-06-01"
+    response = get_arm_client().get(url, access_token=access_token)
     if response.status_code == 404:
         print(f"VM {vm_name} not found in resource group {resource_group_name}")
-        return False
+        return {"name": vm_name, "success": False, "resources": {}}
     elif response.status_code != 200:
         raise Exception(f"Failed to get VM information. Error: {response.text}")
 
-    # Parse the response to get the IDs of any dependent resources (disks, NICs, public IPs)
+    # Build the deletion graph: the VM, then its disks and NICs, then the NICs' public IPs
     vm_info = response.json()
-    nic_id = vm_info["properties"]["networkProfile"]["networkInterfaces"][0]["id"]
-    disk_id = vm_info["properties"]["storageProfile"]["osDisk"]["managedDisk"]["id"]
-    public_ip_id = (
-        vm_info["properties"]["networkProfile"]["networkInterfaces"][0]["properties"][
-            "ipConfigurations"
-        ][0]
-        .get("publicIpAddress", {})
-        .get("id")
+    vm_id = vm_info["id"]
+    storage_profile = vm_info["properties"].get("storageProfile", {})
+    disks = [storage_profile.get("osDisk", {})] + storage_profile.get("dataDisks", [])
+    dependencies = {vm_id: []}
+    for disk in disks:
+        disk_id = disk.get("managedDisk", {}).get("id")
+        if disk_id:
+            dependencies[disk_id] = [vm_id]
+
+    for nic in (
+        vm_info["properties"].get("networkProfile", {}).get("networkInterfaces", [])
+    ):
+        dependencies[nic["id"]] = [vm_id]
+        # Public IPs are only listed on the NIC itself
+        response = get_arm_client().get(
+            f"{nic['id']}?api-version=2020-06-01", access_token=access_token
+        )
+        if response.status_code == 404:
+            continue
+        elif response.status_code != 200:
+            raise Exception(f"Failed to get NIC information. Error: {response.text}")
+        for ip_configuration in response.json()["properties"].get(
+            "ipConfigurations", []
+        ):
+            public_ip_id = (
+                ip_configuration.get("properties", {})
+                .get("publicIPAddress", {})
+                .get("id")
+            )
+            if public_ip_id:
+                dependencies[public_ip_id] = [nic["id"]]
+
+    resources = run_deletion_graph(
+        dependencies,
+        access_token,
+        max_workers=max_workers,
+        poll_interval=poll_interval,
     )
+    success = all(
+        result["status"] in ("Deleted", "NotFound") for result in resources.values()
+    )
+    if success:
+        print(f"VM {vm_name} and dependent resources successfully deleted.")
+    else:
+        print(f"Failed to delete VM {vm_name} or some of its dependent resources.")
+    return {"name": vm_name, "success": success, "resources": resources}
 
-    # Send request to Azure Management API to delete the VM
-    url = f"https://management.azure.com/subscriptions/{subscription_id}/resourceGroups/{resource_group_name}/providers/Microsoft.Compute/virtualMachines/{vm_name}?api-version=2020-06-01"
-    try:
-        response = requests.delete(url, headers=headers)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"Failed to delete VM. Error: {e}")
 
-    # Send request to Azure Management API to delete the dependent resources (disks, NICs, public IPs)
+def delete_azure_vm(
+    subscription_id: str,
+    resource_group_name: str,
+    vm_name: str,
+    access_token: str,
+    **kwargs,
+) -> bool:
+    """
+    Deletes an Azure VM and all dependent resources.
+
+    Args:
+        subscription_id (str): The ID of the subscription that the resource group belongs to.
+        resource_group_name (str): The name of the resource group that the VM belongs to.
+        vm_name (str): The name of the VM to delete.
+        access_token (str): The access token (or ServicePrincipalCredential) to use for authentication.
+        kwargs: Passed on to teardown_azure_vm, e.g. max_workers or poll_interval.
 
-    # Delete the NIC
-    url = f"https://management.azure.com/subscriptions/{subscription_id}/resourceGroups/{resource_group_name}/providers/Microsoft.Network/networkInterfaces/{nic_id}?api-version=2020-06-01"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.get(url, headers=headers)
-    if response.status_code == 404:
-        print(f"NIC for {vm_name} is already deleted.")
-        return False
-    elif response.status_code != 200:
-        raise Exception(f"Failed to get NIC information. Error: {response.text}")
-    url = f"https://management.azure.com/subscriptions/{subscription_id}/resourceGroups/{resource_group_name}/providers/Microsoft.Network/networkInterfaces/{nic_id}?api-version=2020-06-01"
-    try:
-        response = requests.delete(url, headers=headers)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"Failed to delete NIC. Error: {e}")
-
-    # Delete the Disk
-    url = f"https://management.azure.com/subscriptions/{subscription_id}/resourceGroups/{resource_group_name}/providers/Microsoft.Compute/disks/{disk_id}?api-version=2020-06-01"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.get(url, headers=headers)
-    if response.status_code == 404:
-        print(f"Disk for {vm_name} is already deleted.")
-        return False
-    elif response.status_code != 200:
-        raise Exception(f"Failed to get Disk information. Error: {response.text}")
-    url = f"https://management.azure.com/subscriptions/{subscription_id}/resourceGroups/{resource_group_name}/providers/Microsoft.Compute/disks/{disk_id}?api-version=2020-06-01"
-    try:
-        response = requests.delete(url, headers=headers)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"Failed to delete Disk. Error: {e}")
-
-    # Delete the Public IP
-    url = f"https://management.azure.com/subscriptions/{subscription_id}/resourceGroups/{resource_group_name}/providers/Microsoft.Network/publicIPAddresses/{public_ip_id}?api-version=2020-06-01"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.get(url, headers=headers)
-    if response.status_code == 404:
-        print(f"Public IP for {vm_name} is already deleted.")
-        return False
-    elif response.status_code != 200:
-        raise Exception(f"Failed to get Public IP information. Error: {response.text}")
-    url = f"https://management.azure.com/subscriptions/{subscription_id}/resourceGroups/{resource_group_name}/providers/Microsoft.Network/publicIPAddresses/{public_ip_id}?api-version=2020-06-01"
-    try:
-        response = requests.delete(url, headers=headers)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"Failed to delete Public IP. Error: {e}")
+    Raises:
+        ValueError: If any of the required parameters are missing or invalid.
+        Exception: If there is an error getting information about the VM or its NICs.
+
+    Returns:
+        bool: True if the VM and all dependent resources were deleted, False otherwise.
+        Use teardown_azure_vm for the outcome of each deletion.
+    """
+    return teardown_azure_vm(
+        subscription_id, resource_group_name, vm_name, access_token, **kwargs
+    )["success"]
+
+
+def delete_azure_vms(
+    subscription_id: str,
+    virtual_machines: List[Tuple[str, str]],
+    access_token,
+    max_workers: int = 8,
+    **kwargs,
+) -> List[Dict]:
+    """
+    Tears down many VMs concurrently, each with its dependent resources.
+
+    Args:
+        subscription_id (str): The ID of the subscription that the VMs belong to.
+        virtual_machines (List[Tuple[str, str]]): (resource group name, VM name) of each VM to delete.
+        access_token (str): The access token (or ServicePrincipalCredential) to use for authentication.
+        max_workers (int): Maximum number of VMs torn down at once.
+        kwargs: Passed on to teardown_azure_vm, e.g. poll_interval.
+
+    Returns:
+        List[Dict]: The result of teardown_azure_vm for each VM, in input order. VMs that could
+        not be looked up get "success" False and an "error".
+    """
+
+    def delete(virtual_machine: Tuple[str, str]) -> Dict:
+        resource_group_name, vm_name = virtual_machine
+        try:
+            return teardown_azure_vm(
+                subscription_id, resource_group_name, vm_name, access_token, **kwargs
+            )
+        except Exception as err:
+            return {
+                "name": vm_name,
+                "success": False,
+                "resources": {},
+                "error": str(err),
+            }
 
-    print(f"VM {vm_name} and dependent resources successfully deleted.")
-    return True
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(delete, virtual_machines))
@@ -1,9 +1,20 @@
 import os
+import time
+import queue
+import random
+import asyncio
+import logging
 import smtplib
+import threading
 from email.message import EmailMessage
-from typing import List
+from typing import Dict, Iterable, List, Optional, Tuple
 from smtplib import SMTPException
 
+from .throttling import TokenBucket
+
+# Set logger
+logger = logging.getLogger(__name__)
+
 
 def read_template(template_file: str, msg: str) -> str:
     with open(template_file, "r") as file:
@@ -11,20 +22,17 @@ def read_template(template_file: str, msg: str) -> str:
     return template.replace("{message}", msg)
 
 
-def send_email(
+def build_message(
     subject: str,
     msg: str,
     from_email: str,
     to_email: List[str],
     template_file: str = None,
     is_html: bool = False,
-) -> None:
-    # Read SMTP configuration from environment variables
-    smtp_server = os.environ.get("SMTP_SERVER", "smtp.example.com")
-    smtp_port = int(os.environ.get("SMTP_PORT", 587))
-    smtp_username = os.environ.get("SMTP_USERNAME", "your_username")
-    smtp_password = os.environ.get("SMTP_PASSWORD", "your_password")
-
+) -> EmailMessage:
+    """
+    Builds an email message, optionally wrapping the body in a template file.
+    """
     # Read the email template
     if template_file:
         msg = read_template(template_file, msg)
@@ -38,15 +46,230 @@ def send_email(
     email_msg["Subject"] = subject
     email_msg["From"] = from_email
     email_msg["To"] = ", ".join(to_email)
+    return email_msg
+
+
+class MailDispatcher:
+    """
+    Sends email over a small pool of authenticated SMTP connections.
+
+    Connections are opened on first use, kept open between messages and
+    reopened when the server drops them, so a run pays for the TCP, STARTTLS
+    and login handshakes once per pooled connection. Sends are paced to
+    ``messages_per_second`` and transient 4xx replies are retried. Every send
+    returns an outcome instead of raising, so one bad address never stops a run.
+
+    Args:
+        host (str): SMTP server. Defaults to the SMTP_SERVER env var.
+        port (int): SMTP port. Defaults to the SMTP_PORT env var or 587.
+        username (str): SMTP user, or None to skip login. Defaults to the SMTP_USERNAME env var.
+        password (str): SMTP password. Defaults to the SMTP_PASSWORD env var.
+        pool_size (int): Maximum number of open connections, and of messages sent at once.
+        messages_per_second (float): Maximum sending rate across the pool.
+        starttls (bool): Upgrade connections with STARTTLS before logging in. Sending fails
+            if the server does not offer it.
+        max_retries (int): Retries per message after a dropped connection or a 4xx reply.
+        timeout (float): Socket timeout in seconds.
+
+    Example:
+    >>> dispatcher = MailDispatcher(pool_size=2, messages_per_second=5)
+    >>> outcomes = dispatcher.send_many([build_message(...), build_message(...)])
+    >>> dispatcher.close()
+    """
+
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        pool_size: int = 2,
+        messages_per_second: float = 5,
+        starttls: bool = True,
+        max_retries: int = 2,
+        timeout: float = 30,
+    ):
+        self.host = host or os.environ.get("SMTP_SERVER", "smtp.example.com")
+        self.port = port or int(os.environ.get("SMTP_PORT", 587))
+        self.username = (
+            username if username is not None else os.environ.get("SMTP_USERNAME")
+        )
+        self.password = (
+            password if password is not None else os.environ.get("SMTP_PASSWORD")
+        )
+        self.pool_size = pool_size
+        self.starttls = starttls
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.connections_opened = 0
+        self._bucket = TokenBucket(max(1, messages_per_second), messages_per_second)
+        # Idle slots hold an open connection, or None when one may still be opened
+        self._pool: "queue.LifoQueue[Optional[smtplib.SMTP]]" = queue.LifoQueue()
+        for _ in range(pool_size):
+            self._pool.put(None)
+        self._lock = threading.Lock()
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            server.ehlo()
+            if self.starttls:
+                # Raises SMTPNotSupportedError when the server does not offer
+                # STARTTLS, so credentials are never sent in plaintext
+                server.starttls()
+                server.ehlo()
+            if self.username:
+                server.login(self.username, self.password)
+        except (SMTPException, OSError):
+            self._discard(server)
+            raise
+        with self._lock:
+            self.connections_opened += 1
+        return server
+
+    @staticmethod
+    def _discard(server: Optional[smtplib.SMTP]) -> None:
+        if server is None:
+            return
+        try:
+            server.quit()
+        except (SMTPException, OSError):
+            server.close()
+
+    def send(self, message: EmailMessage) -> Dict:
+        """
+        Sends one message and returns its outcome.
+
+        Returns:
+            Dict: The "to" and "subject" of the message, "success", "error" (None on success)
+            and the number of "attempts".
+        """
+        outcome = {
+            "to": message["To"],
+            "subject": message["Subject"],
+            "success": False,
+            "error": None,
+            "attempts": 0,
+        }
+        server = self._pool.get()
+        try:
+            while True:
+                time.sleep(self._bucket.reserve())
+                outcome["attempts"] += 1
+                try:
+                    if server is None:
+                        server = self._connect()
+                    server.send_message(message)
+                    outcome["success"] = True
+                    outcome["error"] = None
+                    return outcome
+                except (SMTPException, OSError) as err:
+                    outcome["error"] = str(err)
+                    code = getattr(err, "smtp_code", None)
+                    # SMTPException is an OSError too; only socket errors and
+                    # disconnects mean the connection is gone
+                    dropped = (
+                        isinstance(err, smtplib.SMTPServerDisconnected)
+                        or not isinstance(err, SMTPException)
+                        or code == 421
+                    )
+                    transient = dropped or (code is not None and 400 <= code < 500)
+                    if dropped:
+                        self._discard(server)
+                        server = None
+                    if not transient or outcome["attempts"] > self.max_retries:
+                        logger.error(f"Failed to send email to {outcome['to']}: {err}")
+                        return outcome
+                    delay = random.uniform(0, 2 ** outcome["attempts"])
+                    logger.info(
+                        f"Retrying email to {outcome['to']} in {delay:.1f}s: {err}"
+                    )
+                    time.sleep(delay)
+        finally:
+            self._pool.put(server)
+
+    async def send_all(self, messages: Iterable[EmailMessage]) -> List[Dict]:
+        """
+        Sends messages from an asyncio queue with ``pool_size`` concurrent senders.
+
+        Returns:
+            List[Dict]: The outcome of each message, in input order.
+        """
+        loop = asyncio.get_running_loop()
+        pending: "asyncio.Queue[Tuple[int, EmailMessage]]" = asyncio.Queue()
+        for item in enumerate(messages):
+            pending.put_nowait(item)
+        outcomes: List[Optional[Dict]] = [None] * pending.qsize()
+
+        async def sender() -> None:
+            while not pending.empty():
+                index, message = pending.get_nowait()
+                # smtplib blocks, so each sender drives its connection from a thread
+                outcomes[index] = await loop.run_in_executor(None, self.send, message)
 
-    # Send the email using the SMTP server
-    try:
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_username, smtp_password)
-            server.send_message(email_msg)
-            print(f"Email sent to {', '.join(to_email)}")
-    except SMTPException as e:
-        print(f"SMTP error: {e}")
-    except Exception as e:
-        print(f"Error sending email: {e}")
+        await asyncio.gather(*(sender() for _ in range(self.pool_size)))
+        return outcomes
+
+    def send_many(self, messages: Iterable[EmailMessage]) -> List[Dict]:
+        """
+        Synchronous wrapper around :meth:`send_all`.
+        """
+        return asyncio.run(self.send_all(messages))
+
+    def close(self) -> None:
+        """
+        Closes every idle pooled connection.
+        """
+        servers = []
+        while True:
+            try:
+                servers.append(self._pool.get_nowait())
+            except queue.Empty:
+                break
+        for server in servers:
+            self._discard(server)
+        for _ in servers:
+            self._pool.put(None)
+
+
+_dispatchers: Dict[Tuple[str, int, Optional[str]], MailDispatcher] = {}
+_dispatchers_lock = threading.Lock()
+
+
+def get_mail_dispatcher(
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    username: Optional[str] = None,
+    password: Optional[str] = None,
+    **kwargs,
+) -> MailDispatcher:
+    """
+    Returns the process-wide dispatcher for an SMTP server and user, creating it on first use.
+    Settings default to the SMTP_* env vars.
+    """
+    dispatcher = MailDispatcher(host, port, username, password, **kwargs)
+    key = (dispatcher.host, dispatcher.port, dispatcher.username)
+    with _dispatchers_lock:
+        return _dispatchers.setdefault(key, dispatcher)
+
+
+def send_email(
+    subject: str,
+    msg: str,
+    from_email: str,
+    to_email: List[str],
+    template_file: str = None,
+    is_html: bool = False,
+) -> bool:
+    # SMTP configuration comes from environment variables
+    email_msg = build_message(
+        subject, msg, from_email, to_email, template_file=template_file, is_html=is_html
+    )
+
+    # Send the email over the shared pooled connection
+    outcome = get_mail_dispatcher().send(email_msg)
+    if outcome["success"]:
+        print(f"Email sent to {', '.join(to_email)}")
+    else:
+        print(f"Error sending email: {outcome['error']}")
+    return outcome["success"]
@@ -1,18 +1,28 @@
-import requests
-from typing import List, Dict
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, List, Dict, Optional
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+from db.connection_manager import SessionManager
+from db.models import VmSku, VmSkuCatalogRefresh
+from .arm import get_arm_client
+from .auth import resolve_access_token
 
 
 def get_vm_skus(subscription_id: str, location: str, access_token: str):
     """
-    Retrieves the available VM skus for the specified location.
+    Retrieves the available VM skus for the specified location, following ``nextLink`` across pages.
 
     Args:
         location (str): The Azure region for which to retrieve VM skus.
-        access_token (str): The access token to use for authentication.
+        access_token (str): The access token (or ServicePrincipalCredential) to use for authentication.
 
     Returns:
-        dict: A dictionary containing information about the available VM skus.
+        dict: A dictionary containing information about the available VM skus, with the skus of
+        every page under "value".
     """
+    access_token = resolve_access_token(access_token)
+
     # Validate input parameters
     if not location or not isinstance(location, str):
         raise ValueError("Location is missing or invalid")
@@ -20,31 +30,218 @@ def get_vm_skus(subscription_id: str, location: str, access_token: str):
         raise ValueError("Access token is missing or invalid")
 
     # Construct the URL for the request
-    url = f"https://management.azure.com/subscriptions/{subscription_id}/providers/Microsoft.Compute/skus?api-version=2021-07-01&$filter=location eq '{location}'"
+    url = f"/subscriptions/{subscription_id}/providers/Microsoft.Compute/skus?api-version=2021-07-01&$filter=location eq '{location}'"
+
+    # Send the requests to the Azure Management API, one per page
+    vm_skus = []
+    while url:
+        response = get_arm_client().get(url, access_token=access_token)
+        if response.status_code != 200:
+            raise Exception(f"Failed to retrieve VM skus. Error: {response.text}")
+        data = response.json()
+        vm_skus.extend(data.get("value", []))
+        url = data.get("nextLink")
 
-    # Set up the request headers
-    headers = {"Authorization": f"Bearer {access_token}"}
+    return {"value": vm_skus}
 
-    # Send the request to the Azure Management API
-    response = requests.get(url, headers=headers)
 
-    # Check the response status code and return the result
-    if response.status_code == 200:
-        return response.json()
-    else:
-        raise Exception(f"Failed to retrieve VM skus. Error: {response.text}")
+# Capabilities parsed into typed columns, keyed by capability name
+SKU_CAPABILITIES = {
+    "vCPUs": ("vcpus", int),
+    "MemoryGB": ("memory_gb", float),
+    "MaxDataDiskCount": ("max_data_disk_count", int),
+    "UncachedDiskIOPS": ("uncached_disk_iops", int),
+    "UncachedDiskBytesPerSecond": ("uncached_disk_bytes_per_second", int),
+    "MaxNetworkInterfaces": ("max_network_interfaces", int),
+    "MaxNetworkBandwidthMbps": ("network_bandwidth_mbps", int),
+    "PremiumIO": ("premium_io", bool),
+    "AcceleratedNetworkingEnabled": ("accelerated_networking", bool),
+}
 
 
-def add_vm_skus_to_db(vm_skus: List[Dict], session: Session) -> bool:
+def parse_vm_sku(vm_sku: Dict, location: str) -> Dict:
+    """
+    Parses a Microsoft.Compute/skus entry into the columns of the vm_skus table.
+
+    Args:
+        vm_sku (Dict): SKU as returned by get_vm_skus.
+        location (str): The Azure region the SKU was listed for.
+
+    Returns:
+        Dict: Name, location, family, tier, size, restriction flag and typed capabilities of the SKU.
+        The SKU is restricted only when it is not available in the location at all.
+    """
+    row = {
+        "name": vm_sku["name"],
+        "location": location.lower(),
+        "family": vm_sku.get("family"),
+        "tier": vm_sku.get("tier"),
+        "size": vm_sku.get("size"),
+        # Zone restrictions only rule out some zones; the SKU can still be deployed
+        "restricted": any(
+            restriction.get("type") == "Location"
+            and restriction.get("reasonCode") == "NotAvailableForSubscription"
+            for restriction in vm_sku.get("restrictions", [])
+        ),
+    }
+    row.update({column: None for column, _ in SKU_CAPABILITIES.values()})
+    for capability in vm_sku.get("capabilities", []):
+        if capability.get("name") not in SKU_CAPABILITIES:
+            continue
+        column, cast = SKU_CAPABILITIES[capability["name"]]
+        try:
+            if cast is bool:
+                row[column] = str(capability["value"]).lower() == "true"
+            else:
+                row[column] = cast(float(capability["value"]))
+        except (TypeError, ValueError):
+            pass
+    return row
+
+
+def add_vm_skus_to_db(vm_skus: List[Dict], session: Session, location: str) -> bool:
     """
     Adds the given list of VM SKU data to the SQLite database table using the provided SQLAlchemy session.
 
+    The SKUs of the location are replaced as a whole and the refresh time of the location is recorded.
+
     Args:
         vm_skus (List[Dict]): List of VM SKU data, each represented as a dictionary.
         session (Session): SQLAlchemy session object to use for database operations.
+        location (str): The Azure region the SKUs were listed for.
 
     Returns:
-        None
+        bool: True once the SKUs are committed.
     """
-    # TODO: Implement logic to add VM SKU data to the database
+    location = location.lower()
+    rows = [
+        parse_vm_sku(vm_sku, location)
+        for vm_sku in vm_skus
+        if vm_sku.get("resourceType") == "virtualMachines"
+    ]
+
+    session.execute(delete(VmSku).where(VmSku.location == location))
+    if rows:
+        session.execute(insert(VmSku), rows)
+    session.merge(
+        VmSkuCatalogRefresh(location=location, refreshed_at=datetime.utcnow())
+    )
+    session.commit()
     return True
+
+
+class SkuCatalog:
+    """
+    VM SKU catalog cached in the vm_skus table and in memory.
+
+    A location is downloaded from ARM only when it has never been cached or its
+    cache is older than ``ttl``; otherwise it is loaded from the database once
+    and then served from memory, so lookups never hit the network. Each
+    location is loaded under its own lock, so a download never blocks lookups
+    or the loading of other locations.
+
+    Args:
+        session_factory (Callable): Returns a SQLAlchemy session. Defaults to db.SessionManager.
+        ttl (timedelta): How long a cached location stays fresh.
+
+    Example:
+    >>> catalog = get_sku_catalog()
+    >>> catalog.load(subscription_id, "westeurope", access_token)
+    >>> catalog.get("westeurope", "Standard_D2s_v3")["memory_gb"]
+    8.0
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        ttl: timedelta = timedelta(days=7),
+    ):
+        self.session_factory = session_factory or SessionManager
+        self.ttl = ttl
+        self._skus: Dict[str, Dict[str, Dict]] = {}
+        self._lock = threading.Lock()
+        self._location_locks: Dict[str, threading.Lock] = {}
+
+    def _location_lock(self, location: str) -> threading.Lock:
+        with self._lock:
+            return self._location_locks.setdefault(location, threading.Lock())
+
+    def load(
+        self,
+        subscription_id: str,
+        location: str,
+        access_token: str,
+        force_refresh: bool = False,
+    ) -> Dict[str, Dict]:
+        """
+        Makes the SKUs of a location available in memory, refreshing the cache when it is stale.
+
+        Returns:
+            Dict[str, Dict]: SKUs of the location keyed by lower-cased name.
+        """
+        location = location.lower()
+        # Concurrent loads of one location wait for a single download
+        with self._location_lock(location):
+            if location in self._skus and not force_refresh:
+                return self._skus[location]
+
+            session = self.session_factory()
+            try:
+                refresh = session.get(VmSkuCatalogRefresh, location)
+                if (
+                    force_refresh
+                    or refresh is None
+                    or datetime.utcnow() - refresh.refreshed_at > self.ttl
+                ):
+                    vm_skus = get_vm_skus(subscription_id, location, access_token)
+                    add_vm_skus_to_db(vm_skus.get("value", []), session, location)
+                rows = session.execute(
+                    select(VmSku).where(VmSku.location == location)
+                ).scalars()
+                skus = {
+                    row.name.lower(): {
+                        column.name: getattr(row, column.name)
+                        for column in VmSku.__table__.columns
+                        if column.name != "id"
+                    }
+                    for row in rows
+                }
+            finally:
+                session.close()
+            with self._lock:
+                self._skus[location] = skus
+            return skus
+
+    def get(self, location: str, name: str) -> Optional[Dict]:
+        """
+        Returns a SKU of a loaded location, or None if it is unknown.
+        """
+        return self._skus.get(location.lower(), {}).get(name.lower())
+
+    def list(
+        self, location: str, family: Optional[str] = None, include_restricted=False
+    ) -> List[Dict]:
+        """
+        Returns the SKUs of a loaded location, optionally of one family only.
+        """
+        return [
+            sku
+            for sku in self._skus.get(location.lower(), {}).values()
+            if (family is None or sku["family"] == family)
+            and (include_restricted or not sku["restricted"])
+        ]
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_sku_catalog() -> SkuCatalog:
+    """
+    Returns the process-wide SKU catalog.
+    """
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = SkuCatalog()
+        return _catalog
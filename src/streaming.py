@@ -0,0 +1,158 @@
+import codecs
+import json
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from .arm import ArmClient, get_arm_client
+
+# Bytes read from the socket at a time
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = " \t\n\r"
+_decoder = json.JSONDecoder()
+
+
+class JsonItemStream:
+    """
+    Parses a JSON object incrementally, yielding the items of one of its array members as they arrive.
+
+    Only one item is held in memory at a time, whatever the size of the
+    document. The other top-level members, such as ``nextLink``, are collected
+    in :attr:`meta` as they are passed; members after the array are only there
+    once iteration is done.
+
+    Args:
+        chunks (Iterable[bytes]): The UTF-8 document in pieces, e.g. ``response.iter_content()``.
+        items_key (str): Name of the array member whose items are yielded.
+
+    Example:
+    >>> stream = JsonItemStream(response.iter_content(CHUNK_SIZE))
+    >>> for item in stream:
+    ...     print(item["id"])
+    >>> stream.meta.get("nextLink")
+    """
+
+    def __init__(self, chunks: Iterable[bytes], items_key: str = "value"):
+        self.items_key = items_key
+        self.meta: Dict[str, Any] = {}
+        self._chunks = iter(chunks)
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        # Drop what was parsed already, so the buffer never holds more than one item
+        self._buffer = self._buffer[self._pos :]
+        self._pos = 0
+        for chunk in self._chunks:
+            text = self._text.decode(chunk)
+            if text:
+                self._buffer += text
+                return True
+        self._buffer += self._text.decode(b"", final=True)
+        self._eof = True
+        return False
+
+    def _peek(self) -> str:
+        while True:
+            while (
+                self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE
+            ):
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, allowed: str) -> str:
+        char = self._peek()
+        if not char or char not in allowed:
+            raise ValueError(
+                f"Expected one of {allowed!r} in JSON stream, got {char!r}"
+            )
+        self._pos += 1
+        return char
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number at the end of the buffer may go on in the next chunk
+            if end == len(self._buffer) and not self._eof and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def __iter__(self) -> Iterator[Any]:
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            if key == self.items_key and self._peek() == "[":
+                self._pos += 1
+                if self._peek() == "]":
+                    self._pos += 1
+                else:
+                    while True:
+                        yield self._value()
+                        if self._expect(",]") == "]":
+                            break
+            else:
+                self.meta[key] = self._value()
+            if self._expect(",}") == "}":
+                return
+
+
+def iter_paged_items(
+    url: str,
+    access_token,
+    params: Optional[Dict] = None,
+    client: Optional[ArmClient] = None,
+    items_key: str = "value",
+    next_link_key: str = "nextLink",
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[Any]:
+    """
+    Lazily yields the items of a paged ARM list, parsing each page from the socket as it arrives.
+
+    The next page is only requested once the caller has consumed the current
+    one. Closing the iterator early (e.g. breaking out of a loop) closes the
+    connection, so the rest of the page is never downloaded.
+
+    Args:
+        url (str): URL of the first page, relative to the ARM endpoint or absolute.
+        access_token (str): The access token (or ServicePrincipalCredential) to use for authentication.
+        params (Dict, optional): Query parameters of the first page; ``nextLink`` already carries them.
+        client (ArmClient): ARM client to send the requests with. Defaults to the process-wide client.
+        items_key (str): Name of the array member holding the items.
+        next_link_key (str): Name of the member holding the URL of the next page.
+        chunk_size (int): Bytes read from the socket at a time.
+
+    Raises:
+        requests.exceptions.RequestException: If a page could not be retrieved.
+        ValueError: If a page is not valid JSON.
+
+    Returns:
+        Iterator[Any]: The items of every page, in order.
+    """
+    client = client or get_arm_client()
+    while url:
+        response = client.get(
+            url, access_token=access_token, params=params, stream=True
+        )
+        try:
+            response.raise_for_status()
+            stream = JsonItemStream(response.iter_content(chunk_size), items_key)
+            yield from stream
+        finally:
+            response.close()
+        url = stream.meta.get(next_link_key)
+        params = None
@@ -2,10 +2,14 @@ from azure.identity import ClientSecretCredential
 from azure.mgmt.monitor import MonitorManagementClient
 from datetime import datetime, timedelta
 import requests
-import json
 import logging
-from typing import Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 from dotenv import load_dotenv
+from .arm import AsyncArmClient, get_arm_client
+from .batch import ArmBatch
+from .auth import resolve_access_token
+from .streaming import iter_paged_items
+from temp.resource_group.tag import update_tag, update_tag_async, update_tags_batch
 
 # Load environment variables
 load_dotenv()
@@ -13,21 +17,104 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 
 
+RESOURCE_GROUP_WRITE_OPERATION = (
+    "microsoft.resources/subscriptions/resourcegroups/write"
+)
+
+
 def is_valid_email(email: str) -> bool:
     if "@" not in email:
         return False
     return True
 
 
+def build_resource_group_creator_index(
+    subscription_id: str, access_token: str, days: int = 7
+) -> Optional[Dict[str, str]]:
+    """
+    Build a map of resource group name to creator email from a single paged scan of the subscription activity log.
+
+    Creation events (status code "Created") take precedence; otherwise the oldest
+    resource group write in the window is used. Keys are lower-cased because
+    resource group names are case-insensitive.
+
+    :param subscription_id: Azure subscription ID.
+    :param access_token: Azure access token or ServicePrincipalCredential.
+    :param days: Number of days of activity log to scan (at most 90).
+    :return: Dictionary of lower-cased resource group name to creator email, or None if the scan failed.
+    """
+    # Validate input parameters
+    if not subscription_id:
+        logging.error("Invalid input: subscription_id is required.")
+        return None
+    if not access_token:
+        logging.error("Invalid input: access_token is required.")
+        return None
+
+    # Set time range for activity log query
+    end_time = datetime.utcnow()
+    start_time = end_time - timedelta(days=days)
+    start_time_str = start_time.strftime("%Y-%m-%dT%H:%M:%SZ")
+    end_time_str = end_time.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    # Resource group writes are the only Microsoft.Resources events we need
+    url = f"/subscriptions/{subscription_id}/providers/microsoft.insights/eventtypes/management/values"
+    params = {
+        "api-version": "2017-03-01-preview",
+        "$filter": (
+            f"eventTimestamp ge '{start_time_str}' and eventTimestamp le '{end_time_str}'"
+            " and resourceProvider eq 'Microsoft.Resources'"
+        ),
+        "$select": "operationName,caller,resourceGroupName,properties",
+    }
+
+    creator_index = {}
+    created = set()
+    events = 0
+    try:
+        # Events are parsed as they arrive and returned newest first, so later entries are older writes
+        for log_entry in iter_paged_items(
+            url, access_token, params=params, client=get_arm_client()
+        ):
+            events += 1
+            operation_name = (log_entry.get("operationName") or {}).get("value", "")
+            if operation_name.lower() != RESOURCE_GROUP_WRITE_OPERATION:
+                continue
+            resource_group_name = (log_entry.get("resourceGroupName") or "").lower()
+            caller = log_entry.get("caller")
+            if not resource_group_name or resource_group_name in created:
+                continue
+            if not caller or not is_valid_email(caller):
+                continue
+            creator_index[resource_group_name] = caller
+            if (log_entry.get("properties") or {}).get("statusCode") == "Created":
+                created.add(resource_group_name)
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Error fetching activity logs: {e}")
+        return None
+    except ValueError as e:
+        logging.error(f"Error decoding response JSON: {e}")
+        return None
+
+    logging.info(
+        f"Indexed creators of {len(creator_index)} resource groups from {events} activity log events."
+    )
+    return creator_index
+
+
 def fetch_resource_group_creator_email(
-    subscription_id: str, resource_group_name: str, access_token: str
+    subscription_id: str,
+    resource_group_name: str,
+    access_token: str,
+    creator_index: Optional[Dict[str, str]] = None,
 ) -> Optional[str]:
     """
     Fetch the email ID of the user who created a resource group in Azure.
 
     :param subscription_id: Azure subscription ID.
     :param resource_group_name: Name of the resource group.
-    :param access_token: Azure access token.
+    :param access_token: Azure access token or ServicePrincipalCredential.
+    :param creator_index: Index from build_resource_group_creator_index; when given, no activity log query is made.
     :return: Email ID of the user who created the resource group, or None if not found.
     """
 
@@ -38,6 +125,14 @@ def fetch_resource_group_creator_email(
     if not resource_group_name:
         logging.error("Invalid input: resource_group_name is required.")
         return None
+
+    if creator_index is not None:
+        creator_email = creator_index.get(resource_group_name.lower())
+        if creator_email is None:
+            logging.warning("Resource group creator email not found.")
+        return creator_email
+
+    access_token = resolve_access_token(access_token)
     if not access_token:
         logging.error("Invalid input: access_token is required.")
         return None
@@ -50,38 +145,25 @@ def fetch_resource_group_creator_email(
 
     # Construct the activity logs URL
     url = (
-        f"https://management.azure.com/subscriptions/{subscription_id}/providers/microsoft.insights/eventtypes/management/values"
+        f"/subscriptions/{subscription_id}/providers/microsoft.insights/eventtypes/management/values"
         f"?api-version=2017-03-01-preview&$filter=eventTimestamp ge '{start_time_str}' and eventTimestamp le '{end_time_str}'"
         f" and resourceGroupName eq '{resource_group_name}' and operationName eq 'Microsoft.Resources/subscriptions/resourcegroups/write'"
     )
-    headers = {"Authorization": f"Bearer {access_token}"}
 
+    # Stop reading the log at the first event with a caller
+    creator_email = None
     try:
-        # Fetch the activity logs
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
+        for log_entry in iter_paged_items(url, access_token, client=get_arm_client()):
+            if "caller" in log_entry:
+                creator_email = log_entry["caller"]
+                break
     except requests.exceptions.RequestException as e:
         logging.error(f"Error fetching activity logs: {e}")
         return None
-
-    try:
-        # Parse the JSON response
-        response_data = response.json()
-    except json.JSONDecodeError as e:
+    except ValueError as e:
         logging.error(f"Error decoding response JSON: {e}")
         return None
 
-    if not response_data or not response_data.get("value"):
-        logging.warning("No matching activity logs found.")
-        return None
-
-    # Extract the email ID of the user who created the resource
-    creator_email = None
-    for log_entry in response_data["value"]:
-        if "caller" in log_entry:
-            creator_email = log_entry["caller"]
-            break
-
     if creator_email is None:
         logging.warning("Resource group creator email not found.")
     elif not is_valid_email(creator_email):
@@ -100,7 +182,7 @@ def check_resource_group_owner_email_tag(
     Args:
         subscription_id (str): The ID of the subscription that the resource group belongs to.
         resource_group_name (str): The name of the resource group to check.
-        access_token (str): The access token to use for authentication.
+        access_token (str): The access token (or ServicePrincipalCredential) to use for authentication.
 
     Raises:
         ValueError: If any of the required parameters are missing or invalid.
@@ -109,6 +191,8 @@ def check_resource_group_owner_email_tag(
     Returns:
         bool: True if the resource group has an OwnerEmail tag, False otherwise.
     """
+    access_token = resolve_access_token(access_token)
+
     # Validate input parameters
     if not subscription_id or not isinstance(subscription_id, str):
         raise ValueError("Subscription ID is missing or invalid")
@@ -118,9 +202,8 @@ def check_resource_group_owner_email_tag(
         raise ValueError("Access token is missing or invalid")
 
     # Send request to Azure Management API to get information about the resource group
-    url = f"https://management.azure.com/subscriptions/{subscription_id}/resourceGroups/{resource_group_name}?api-version=2020-06-01"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.get(url, headers=headers)
+    url = f"/subscriptions/{subscription_id}/resourceGroups/{resource_group_name}?api-version=2020-06-01"
+    response = get_arm_client().get(url, access_token=access_token)
     if response.status_code == 404:
         raise Exception(
             f"Resource group {resource_group_name} not found in subscription {subscription_id}"
@@ -148,10 +231,12 @@ def add_owner_email_tag(
     :param subscription_id: Azure subscription ID.
     :param resource_group_name: Name of the resource group.
     :param owner_email: Email ID of the owner.
-    :param access_token: Azure access token.
+    :param access_token: Azure access token or ServicePrincipalCredential.
     :return: True if the tag was added successfully, False otherwise.
     """
 
+    access_token = resolve_access_token(access_token)
+
     # Validate input parameters
     if not subscription_id:
         logging.error("Invalid input: subscription_id is required.")
@@ -167,10 +252,9 @@ def add_owner_email_tag(
         return False
 
     # Fetch the existing tags for the resource group
-    url = f"https://management.azure.com/subscriptions/{subscription_id}/resourcegroups/{resource_group_name}?api-version=2021-04-01"
-    headers = {"Authorization": f"Bearer {access_token}"}
+    url = f"/subscriptions/{subscription_id}/resourcegroups/{resource_group_name}?api-version=2021-04-01"
     try:
-        response = requests.get(url, headers=headers)
+        response = get_arm_client().get(url, access_token=access_token)
         response.raise_for_status()
     except requests.exceptions.RequestException as e:
         logging.error(f"Error fetching resource group: {e}")
@@ -185,7 +269,7 @@ def add_owner_email_tag(
     # Update the resource group with the new tags
     payload = {"tags": tags}
     try:
-        response = requests.patch(url, headers=headers, json=payload)
+        response = get_arm_client().patch(url, access_token=access_token, json=payload)
         response.raise_for_status()
     except requests.exceptions.RequestException as e:
         logging.error(f"Error updating resource group tags: {e}")
@@ -206,7 +290,7 @@ def check_resource_group_ttl_tag(
     Args:
         subscription_id (str): The ID of the subscription that the resource group belongs to.
         resource_group_name (str): The name of the resource group to check.
-        access_token (str): The access token to use for authentication.
+        access_token (str): The access token (or ServicePrincipalCredential) to use for authentication.
 
     Raises:
         ValueError: If any of the required parameters are missing or invalid.
@@ -215,6 +299,8 @@ def check_resource_group_ttl_tag(
     Returns:
         bool: True if the resource group has a TTL tag, False otherwise.
     """
+    access_token = resolve_access_token(access_token)
+
     # Validate input parameters
     if not subscription_id or not isinstance(subscription_id, str):
         raise ValueError("Subscription ID is missing or invalid")
@@ -224,9 +310,8 @@ def check_resource_group_ttl_tag(
         raise ValueError("Access token is missing or invalid")
 
     # Send request to Azure Management API to get information about the resource group
-    url = f"https://management.azure.com/subscriptions/{subscription_id}/resourceGroups/{resource_group_name}?api-version=2020-06-01"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.get(url, headers=headers)
+    url = f"/subscriptions/{subscription_id}/resourceGroups/{resource_group_name}?api-version=2020-06-01"
+    response = get_arm_client().get(url, access_token=access_token)
     if response.status_code == 404:
         raise Exception(
             f"Resource group {resource_group_name} not found in subscription {subscription_id}"
@@ -254,9 +339,11 @@ def add_ttl_tag(
     :param subscription_id: Azure subscription ID.
     :param resource_group_name: Name of the resource group.
     :param ttl_value: Time to live value (in days).
-    :param access_token: Azure access token.
+    :param access_token: Azure access token or ServicePrincipalCredential.
     :return: True if the tag was added successfully, False otherwise.
     """
+    access_token = resolve_access_token(access_token)
+
     # Validate input parameters
     if not subscription_id:
         logging.error("Invalid input: subscription_id is required.")
@@ -272,10 +359,9 @@ def add_ttl_tag(
         return False
 
     # Fetch the existing tags for the resource group
-    url = f"https://management.azure.com/subscriptions/{subscription_id}/resourcegroups/{resource_group_name}?api-version=2021-04-01"
-    headers = {"Authorization": f"Bearer {access_token}"}
+    url = f"/subscriptions/{subscription_id}/resourcegroups/{resource_group_name}?api-version=2021-04-01"
     try:
-        response = requests.get(url, headers=headers)
+        response = get_arm_client().get(url, access_token=access_token)
         response.raise_for_status()
     except requests.exceptions.RequestException as e:
         logging.error(f"Error fetching resource group: {e}")
@@ -290,7 +376,7 @@ def add_ttl_tag(
     # Update the resource group with the new tags
     payload = {"tags": tags}
     try:
-        response = requests.patch(url, headers=headers, json=payload)
+        response = get_arm_client().patch(url, access_token=access_token, json=payload)
         response.raise_for_status()
     except requests.exceptions.RequestException as e:
         logging.error(f"Error updating resource group tags: {e}")
@@ -298,3 +384,204 @@ def add_ttl_tag(
 
     logging.info(f"Successfully added TTL tag to resource group {resource_group_name}.")
     return True
+
+
+def get_tag_changes(
+    current_tags: Optional[Dict[str, str]],
+    desired_tags: Dict[str, Optional[str]],
+    overwrite: bool = False,
+) -> Dict[str, str]:
+    """
+    Compare desired tags against the tags a resource group already has.
+
+    :param current_tags: Tags currently set on the resource group.
+    :param desired_tags: Tags that should be present. Tags with a None value are skipped.
+    :param overwrite: Also replace tags that are present with a different value.
+    :return: Dictionary of the tags that need to be written.
+    """
+    current_tags = current_tags or {}
+    changes = {}
+    for tag_name, tag_value in desired_tags.items():
+        if tag_value is None:
+            continue
+        if tag_name not in current_tags or (
+            overwrite and current_tags[tag_name] != str(tag_value)
+        ):
+            changes[tag_name] = str(tag_value)
+    return changes
+
+
+def reconcile_resource_group_tags(
+    subscription_id: str,
+    resource_group: Dict,
+    desired_tags: Dict[str, Optional[str]],
+    access_token: str,
+    overwrite: bool = False,
+) -> Dict:
+    """
+    Reconcile the tags of a resource group with a single Tags API merge PATCH.
+
+    The current tags are taken from the resource group listing, so no GET is
+    made, and nothing is sent when the resource group is already up to date.
+
+    :param subscription_id: Azure subscription ID.
+    :param resource_group: Resource group as returned by iter_resource_groups.
+    :param desired_tags: Tags that should be present. Tags with a None value (e.g. unknown owner) are skipped.
+    :param access_token: Azure access token or ServicePrincipalCredential.
+    :param overwrite: Also replace tags that are present with a different value.
+    :return: Dictionary with the resource group name, the tags written, whether it succeeded,
+        and the number of requests made and saved compared to the check/add functions.
+    """
+    changes = get_tag_changes(resource_group.get("tags"), desired_tags, overwrite)
+    result = _reconciliation_result(resource_group["name"], desired_tags, changes)
+    if not changes:
+        return result
+
+    result["success"] = update_tag(
+        subscription_id=subscription_id,
+        resource_group_name=resource_group["name"],
+        update_data=changes,
+        access_token=access_token,
+    )
+    if result["success"]:
+        logging.info(
+            f"Successfully added {', '.join(changes)} tags to resource group {resource_group['name']}."
+        )
+    return result
+
+
+async def reconcile_resource_group_tags_async(
+    subscription_id: str,
+    resource_group: Dict,
+    desired_tags: Dict[str, Optional[str]],
+    access_token: str,
+    client: AsyncArmClient,
+    overwrite: bool = False,
+) -> Dict:
+    """
+    Asyncio version of reconcile_resource_group_tags that sends the merge PATCH through an AsyncArmClient.
+
+    :param subscription_id: Azure subscription ID.
+    :param resource_group: Resource group as returned by iter_resource_groups.
+    :param desired_tags: Tags that should be present. Tags with a None value (e.g. unknown owner) are skipped.
+    :param access_token: Azure access token or ServicePrincipalCredential.
+    :param client: Open async ARM client.
+    :param overwrite: Also replace tags that are present with a different value.
+    :return: Same dictionary as reconcile_resource_group_tags.
+    """
+    changes = get_tag_changes(resource_group.get("tags"), desired_tags, overwrite)
+    result = _reconciliation_result(resource_group["name"], desired_tags, changes)
+    if not changes:
+        return result
+
+    result["success"] = await update_tag_async(
+        subscription_id=subscription_id,
+        resource_group_name=resource_group["name"],
+        update_data=changes,
+        access_token=access_token,
+        client=client,
+    )
+    if result["success"]:
+        logging.info(
+            f"Successfully added {', '.join(changes)} tags to resource group {resource_group['name']}."
+        )
+    return result
+
+
+def reconcile_resource_group_tags_batch(
+    subscription_id: str,
+    desired_tags_by_group: Iterable[Tuple[Dict, Dict[str, Optional[str]]]],
+    access_token: str,
+    overwrite: bool = False,
+    batch_size: int = 20,
+) -> Tuple[List[Dict], Dict[str, int]]:
+    """
+    Reconcile the tags of many resource groups, sending the merge PATCHes through ARM batch requests.
+
+    Groups are read lazily: a batch request is sent as soon as ``batch_size`` groups
+    need changes, so tagging starts while later pages are still being listed.
+
+    :param subscription_id: Azure subscription ID.
+    :param desired_tags_by_group: Pairs of resource group (as returned by iter_resource_groups) and its desired tags,
+        e.g. a generator over iter_resource_groups.
+    :param access_token: Azure access token or ServicePrincipalCredential.
+    :param overwrite: Also replace tags that are present with a different value.
+    :param batch_size: Number of PATCHes per batch request.
+    :return: One result per resource group, like reconcile_resource_group_tags but without per-group
+        requests, and the ArmBatch.stats of the run. Pass both to summarize_tag_reconciliation.
+    """
+    results = []
+    batch = ArmBatch(access_token=access_token, batch_size=batch_size)
+    chunk: Dict[str, Dict] = {}
+
+    def flush() -> None:
+        outcomes = update_tags_batch(
+            subscription_id=subscription_id,
+            update_data_by_group={
+                resource_group_name: result["tags"]
+                for resource_group_name, result in chunk.items()
+            },
+            access_token=access_token,
+            batch=batch,
+        )
+        for resource_group_name, result in chunk.items():
+            result["success"] = outcomes.get(resource_group_name, False)
+        chunk.clear()
+
+    for resource_group, desired_tags in desired_tags_by_group:
+        changes = get_tag_changes(resource_group.get("tags"), desired_tags, overwrite)
+        result = _reconciliation_result(resource_group["name"], desired_tags, changes)
+        # The batch round trips are counted once for the run, not per group
+        result["requests_saved"] += result["requests"]
+        result["requests"] = 0
+        results.append(result)
+        if changes:
+            chunk[resource_group["name"]] = result
+            if len(chunk) >= batch_size:
+                flush()
+    if chunk:
+        flush()
+
+    batch_stats = batch.stats()
+    logging.info(
+        f"Merged tags into {sum(1 for result in results if result['tags'] and result['success'])} "
+        f"of {batch_stats['operations']} resource groups with {batch_stats['round_trips']} batch requests."
+    )
+    return results, batch_stats
+
+
+def _reconciliation_result(
+    resource_group_name: str,
+    desired_tags: Dict[str, Optional[str]],
+    changes: Dict[str, str],
+) -> Dict:
+    # The check_*/add_* functions cost one GET per tag checked plus a GET and a PATCH per tag added
+    legacy_requests = len(desired_tags) + 2 * len(changes)
+    return {
+        "name": resource_group_name,
+        "tags": changes,
+        "success": True,
+        "requests": 1 if changes else 0,
+        "requests_saved": legacy_requests - (1 if changes else 0),
+    }
+
+
+def summarize_tag_reconciliation(
+    results: List[Dict], batch_stats: Optional[Dict[str, int]] = None
+) -> Dict[str, int]:
+    """
+    Summarize the results of reconcile_resource_group_tags.
+
+    :param results: Results returned by reconcile_resource_group_tags.
+    :param batch_stats: Stats returned by reconcile_resource_group_tags_batch, whose round trips are added to the requests.
+    :return: Counts of resource groups processed, patched and failed, and of requests made and saved.
+    """
+    batch_requests = (batch_stats or {}).get("round_trips", 0)
+    return {
+        "resource_groups": len(results),
+        "patched": sum(1 for result in results if result["tags"]),
+        "failed": sum(1 for result in results if not result["success"]),
+        "requests": sum(result["requests"] for result in results) + batch_requests,
+        "requests_saved": sum(result["requests_saved"] for result in results)
+        - batch_requests,
+    }
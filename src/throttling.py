@@ -0,0 +1,259 @@
+import re
+import time
+import random
+import logging
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Mapping, Optional, Tuple
+
+# Set logger
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying: throttling and transient server errors
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_SUBSCRIPTION_PATTERN = re.compile(r"/subscriptions/([^/?#]+)", re.IGNORECASE)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. ``reserve`` always takes a token and returns how long
+    the caller has to wait before using it, so the same bucket can pace threads
+    (``time.sleep``) and coroutines (``asyncio.sleep``).
+
+    Args:
+        capacity (float): Maximum number of tokens (burst size).
+        refill_rate (float): Tokens added per second.
+    """
+
+    def __init__(self, capacity: float, refill_rate: float):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.refill_rate
+        )
+        self.updated = now
+
+    def reserve(self) -> float:
+        """
+        Takes a token and returns the number of seconds to wait before using it.
+        """
+        with self._lock:
+            self._refill()
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.refill_rate
+
+    def limit(self, remaining: int) -> None:
+        """
+        Caps the local tokens to the quota ARM reports as remaining, so the bucket
+        slows down as the server-side budget runs out.
+        """
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, remaining)
+
+
+class RateLimitGovernor:
+    """
+    Shared ARM rate-limit governor with one token bucket per subscription and per
+    request kind (read or write).
+
+    Buckets start from the documented ARM limits and adapt to the
+    ``x-ms-ratelimit-remaining-*`` headers of every response. ``retry_delay``
+    decides whether a response should be retried and for how long to wait:
+    ``Retry-After`` is honoured for 429s and 503s, and other 5xx errors back off
+    exponentially with full jitter. ``stats`` exposes per-bucket counters.
+
+    Args:
+        read_capacity (float): Burst size of the read buckets.
+        read_rate (float): Read tokens refilled per second.
+        write_capacity (float): Burst size of the write buckets.
+        write_rate (float): Write tokens refilled per second.
+        max_retries (int): Maximum number of retries per request.
+        backoff_base (float): Base delay of the exponential backoff in seconds.
+        backoff_max (float): Maximum delay of the exponential backoff in seconds.
+    """
+
+    def __init__(
+        self,
+        read_capacity: float = 250,
+        read_rate: float = 25,
+        write_capacity: float = 200,
+        write_rate: float = 10,
+        max_retries: int = 5,
+        backoff_base: float = 1,
+        backoff_max: float = 60,
+    ):
+        self.limits = {
+            "read": (read_capacity, read_rate),
+            "write": (write_capacity, write_rate),
+        }
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._counters: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def scope(method: str, url: str) -> Tuple[str, str]:
+        """
+        Returns the (subscription id, request kind) a request is counted against.
+        Requests outside a subscription are counted against "tenant".
+        """
+        match = _SUBSCRIPTION_PATTERN.search(url)
+        subscription_id = match.group(1).lower() if match else "tenant"
+        kind = "read" if method.upper() in ("GET", "HEAD") else "write"
+        return subscription_id, kind
+
+    def _bucket(self, scope: Tuple[str, str]) -> TokenBucket:
+        with self._lock:
+            if scope not in self._buckets:
+                self._buckets[scope] = TokenBucket(*self.limits[scope[1]])
+                self._counters[scope] = {
+                    "requests": 0,
+                    "throttled": 0,
+                    "server_errors": 0,
+                    "retries": 0,
+                    "wait_seconds": 0,
+                    "min_remaining": None,
+                }
+            return self._buckets[scope]
+
+    def _count(self, scope: Tuple[str, str], counter: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[scope][counter] += value
+
+    def acquire(self, method: str, url: str) -> float:
+        """
+        Takes a token for a request and returns the number of seconds to wait before sending it.
+        """
+        scope = self.scope(method, url)
+        delay = self._bucket(scope).reserve()
+        self._count(scope, "requests")
+        if delay:
+            self._count(scope, "wait_seconds", delay)
+        return delay
+
+    def retry_delay(
+        self,
+        method: str,
+        url: str,
+        status_code: Optional[int],
+        headers: Mapping[str, str],
+        attempt: int,
+    ) -> Optional[float]:
+        """
+        Records a response and returns how long to wait before retrying it, or None
+        when it should not be retried. A ``status_code`` of None stands for a
+        connection error.
+        """
+        scope = self.scope(method, url)
+        # Creates the counters of a scope no request was acquired for yet
+        self._bucket(scope)
+        self._observe_remaining(scope, headers)
+
+        if status_code == 429:
+            self._count(scope, "throttled")
+        elif status_code is None or status_code >= 500:
+            self._count(scope, "server_errors")
+        if status_code is not None and status_code not in RETRYABLE_STATUS_CODES:
+            return None
+        # Only throttled requests are known not to have been processed
+        if status_code != 429 and method.upper() == "POST":
+            return None
+        if attempt >= self.max_retries:
+            logger.warning(
+                f"Giving up on {method} {url} after {attempt} retries (status {status_code})"
+            )
+            return None
+
+        delay = parse_retry_after(headers.get("Retry-After"))
+        if delay is None:
+            delay = random.uniform(
+                0, min(self.backoff_max, self.backoff_base * 2**attempt)
+            )
+        self._count(scope, "retries")
+        self._count(scope, "wait_seconds", delay)
+        logger.info(
+            f"Retrying {method} {url} in {delay:.1f}s (status {status_code}, attempt {attempt + 1})"
+        )
+        return delay
+
+    def _observe_remaining(
+        self, scope: Tuple[str, str], headers: Mapping[str, str]
+    ) -> None:
+        subscription_id, kind = scope
+        level = "tenant" if subscription_id == "tenant" else "subscription"
+        names = ["reads"] if kind == "read" else ["writes", "deletes"]
+        for name in names:
+            remaining = headers.get(f"x-ms-ratelimit-remaining-{level}-{name}")
+            if remaining is None:
+                continue
+            try:
+                remaining = int(remaining)
+            except ValueError:
+                continue
+            self._bucket(scope).limit(remaining)
+            with self._lock:
+                counters = self._counters[scope]
+                if (
+                    counters["min_remaining"] is None
+                    or remaining < counters["min_remaining"]
+                ):
+                    counters["min_remaining"] = remaining
+            break
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Returns the counters of every bucket, keyed by "<subscription id>/<kind>".
+        ``min_remaining`` is the lowest remaining quota ARM reported during the run.
+        """
+        with self._lock:
+            return {
+                f"{subscription_id}/{kind}": dict(counters)
+                for (subscription_id, kind), counters in self._counters.items()
+            }
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Returns the number of seconds a Retry-After header (seconds or HTTP date) asks to wait, or None.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_rate_limit_governor() -> RateLimitGovernor:
+    """
+    Returns the process-wide rate-limit governor shared by all ARM clients.
+    """
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = RateLimitGovernor()
+        return _governor
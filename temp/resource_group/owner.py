@@ -2,6 +2,8 @@ import requests
 import datetime
 import logging
 
+from src.streaming import CHUNK_SIZE, JsonItemStream
+
 # Set logger
 logger = logging.getLogger(__name__)
 
@@ -45,15 +47,20 @@ def get_resource_group_owner(
     }
     try: # Try to get the owner of the resource group
         response = requests.request(
-            "GET", get_event_api, headers=headers, data=event_payload
+            "GET", get_event_api, headers=headers, data=event_payload, stream=True
         )
-        for data in response.json().get("value"):
-            if (
-                data.get("operationName").get("value") == rg_creation_operation_name
-                and data.get("properties").get("statusCode") == rg_creation_status_code
-                and data.get("resourceGroupName") == resource_group_name
-            ):
-                return data.get("caller")
+        # Close the streamed response on every path, including a failed status
+        with response:
+            response.raise_for_status()
+            # Parse events as they arrive and stop at the creation event
+            for data in JsonItemStream(response.iter_content(CHUNK_SIZE)):
+                if (
+                    data.get("operationName").get("value") == rg_creation_operation_name
+                    and data.get("properties").get("statusCode")
+                    == rg_creation_status_code
+                    and data.get("resourceGroupName") == resource_group_name
+                ):
+                    return data.get("caller")
     except requests.exceptions.HTTPError as err:
         logger.error(err)
         return None
@@ -1,5 +1,6 @@
-import smtplib
 import logging
+from email.message import EmailMessage
+from src.send_email import get_mail_dispatcher
 
 # Set logger
 logger = logging.getLogger(__name__)
@@ -26,31 +27,23 @@ def send_email(
     Returns:
         bool: True if email was sent successfully, False otherwise.
     """
-    try:
-        # Create SMTP session
-        session = smtplib.SMTP(host, port)
-
-        # Start TLS for security
-        session.starttls()
-
-        # Authentication
-        session.login(email, password)
-
-        # Compose message
-        message = f"Subject: {subject}\n\n{body}"
-
-        # Send email
-        session.sendmail(email, recipient, message)
-
-        # Terminate session
-        session.quit()
-
+    # Reuse one pooled, authenticated connection per server and account
+    dispatcher = get_mail_dispatcher(host, port, email, password)
+
+    # Compose message
+    message = EmailMessage()
+    message.set_content(body)
+    message["Subject"] = subject
+    message["From"] = email
+    message["To"] = recipient
+
+    # Send email
+    outcome = dispatcher.send(message)
+    if outcome["success"]:
         # Log success
         logger.info(f"Email sent successfully to {recipient}")
-
-        return True
-    except Exception as err:
+    else:
         # Log error
-        logger.error(f"Email failed to send: {err}")
+        logger.error(f"Email failed to send: {outcome['error']}")
 
-        return False
+    return outcome["success"]
@@ -2,6 +2,8 @@ import requests
 import datetime
 import json
 import logging
+from src.arm import AsyncArmClient, get_arm_client
+from src.batch import ArmBatch
 
 # Set logger
 logger = logging.getLogger(__name__)
@@ -100,9 +102,8 @@ def update_tag(
             )
     true
     """
-    update_tag_api = f"https://management.azure.com/subscriptions/{subscription_id}/resourcegroups/{resource_group_name}/providers/Microsoft.Resources/tags/default?api-version=2021-04-01"
+    update_tag_api = f"/subscriptions/{subscription_id}/resourcegroups/{resource_group_name}/providers/Microsoft.Resources/tags/default?api-version=2021-04-01"
     headers = {
-        "Authorization": f"Bearer {access_token}",
         "Content-Type": "application/json",
     }
     updated_tag_payload = json.dumps(
@@ -112,8 +113,11 @@ def update_tag(
         }
     )
     try:
-        response = requests.request(
-            "PATCH", update_tag_api, headers=headers, data=updated_tag_payload
+        response = get_arm_client().patch(
+            update_tag_api,
+            access_token=access_token,
+            headers=headers,
+            data=updated_tag_payload,
         )
         response.raise_for_status()
         logging.info("tag updated successfully")
@@ -124,3 +128,85 @@ def update_tag(
     except Exception as err:
         logger.error(f"failed to update tag: {err}")
         return False
+
+
+async def update_tag_async(
+    subscription_id: str,
+    resource_group_name: str,
+    update_data: dict,
+    access_token: str,
+    client: AsyncArmClient,
+) -> bool:
+    """
+    This is the asyncio version of update_tag, sending the merge PATCH through an AsyncArmClient.
+
+    :param susbcription_id: Azure subscription id
+    :type susbcription_id: str
+    :param resource_group_name: Azure resource group name
+    :type resource_group_name: str
+    :param update_data: Updated tags to be added
+    :type update_data: dict
+    :param access_token: Azure access token
+    :type access_token: str
+    :param client: Open async ARM client
+    :type client: AsyncArmClient
+    :return: True if the tags were merged successfully, False otherwise
+    :rtype: bool
+    """
+    update_tag_api = f"/subscriptions/{subscription_id}/resourcegroups/{resource_group_name}/providers/Microsoft.Resources/tags/default?api-version=2021-04-01"
+    updated_tag_payload = {
+        "operation": "merge",
+        "properties": {"tags": update_data},
+    }
+    try:
+        response = await client.patch(
+            update_tag_api, access_token=access_token, json=updated_tag_payload
+        )
+        response.raise_for_status()
+        logging.info("tag updated successfully")
+        return True
+    except Exception as err:
+        logger.error(f"failed to update tag: {err}")
+        return False
+
+
+def update_tags_batch(
+    subscription_id: str,
+    update_data_by_group: dict,
+    access_token: str,
+    batch: ArmBatch = None,
+) -> dict:
+    """
+    This is a function to merge tags into many resource groups through ARM batch requests.
+
+    :param susbcription_id: Azure subscription id
+    :type susbcription_id: str
+    :param update_data_by_group: Tags to be added, keyed by resource group name
+    :type update_data_by_group: dict
+    :param access_token: Azure access token
+    :type access_token: str
+    :param batch: Batch to send the updates with, e.g. to read its stats() afterwards
+    :type batch: ArmBatch
+    :return: True or False per resource group name, depending on whether its tags were merged
+    :rtype: dict
+    """
+    batch = batch or ArmBatch(access_token=access_token)
+    names = {}
+    for resource_group_name, update_data in update_data_by_group.items():
+        update_tag_api = f"/subscriptions/{subscription_id}/resourcegroups/{resource_group_name}/providers/Microsoft.Resources/tags/default?api-version=2021-04-01"
+        operation_name = batch.add(
+            "PATCH",
+            update_tag_api,
+            content={"operation": "merge", "properties": {"tags": update_data}},
+        )
+        names[operation_name] = resource_group_name
+
+    results = {}
+    for operation_name, result in batch.execute().items():
+        resource_group_name = names[operation_name]
+        results[resource_group_name] = result["status"] == 200
+        if not results[resource_group_name]:
+            logger.error(
+                f"failed to update tag of {resource_group_name}: {result['status']} {result['content']}"
+            )
+    return results
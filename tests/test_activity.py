@@ -0,0 +1,184 @@
+import json
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+import requests
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from db.activity_store import ActivityStore
+from db.connection_manager import Base
+from src.activity import ingest_activity_log
+
+NOW = datetime(2023, 3, 10, 2)
+RG = "/subscriptions/sub/resourceGroups/RG-A/providers"
+VM_ID = f"{RG}/Microsoft.Compute/virtualMachines/vm-1"
+DISK_ID = f"{RG}/Microsoft.Compute/disks/disk-1"
+
+
+def event(resource_id, timestamp, operation, status="Succeeded"):
+    return {
+        "resourceId": resource_id,
+        "eventTimestamp": timestamp,
+        "operationName": {"value": operation},
+        "status": {"value": status},
+        "caller": "owner@example.com",
+    }
+
+
+def page(events, next_link=None):
+    response = requests.Response()
+    response.status_code = 200
+    body = {"value": events}
+    if next_link:
+        body["nextLink"] = next_link
+    response._content = json.dumps(body).encode()
+    response._content_consumed = True
+    return response
+
+
+class TestActivityIndex(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        self.session = sessionmaker(bind=engine)()
+        self.addCleanup(self.session.close)
+        self.store = ActivityStore(self.session, lag_minutes=15)
+        self.client = mock.Mock()
+        patcher = mock.patch("src.activity.get_arm_client", return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_indexes_newest_write_or_action_per_resource(self):
+        self.client.get.side_effect = [
+            page(
+                [
+                    event(
+                        VM_ID,
+                        "2023-03-05T10:00:00.1234567Z",
+                        "Microsoft.Compute/virtualMachines/start/action",
+                    ),
+                    event(
+                        VM_ID,
+                        "2023-03-06T10:00:00Z",
+                        "Microsoft.Compute/virtualMachines/write",
+                        status="Failed",
+                    ),
+                    event(
+                        DISK_ID, "2023-03-08T10:00:00Z", "Microsoft.Compute/disks/read"
+                    ),
+                ],
+                next_link="https://arm/next",
+            ),
+            page(
+                [
+                    event(
+                        VM_ID,
+                        "2023-01-02T10:00:00Z",
+                        "Microsoft.Compute/virtualMachines/write",
+                    ),
+                    event(
+                        DISK_ID, "2023-01-01T10:00:00Z", "Microsoft.Compute/disks/write"
+                    ),
+                ]
+            ),
+        ]
+
+        self.assertEqual(ingest_activity_log("SUB", "token", self.store, now=NOW), 2)
+
+        first_call, second_call = self.client.get.call_args_list
+        self.assertIn(
+            "eventTimestamp ge '2022-12-10T02:00:00Z'",
+            first_call.kwargs["params"]["$filter"],
+        )
+        self.assertEqual(second_call.args[0], "https://arm/next")
+        self.assertEqual(
+            self.store.last_activity(VM_ID), datetime(2023, 3, 5, 10, 0, 0, 123456)
+        )
+        self.assertEqual(
+            self.store.unused_since(NOW - timedelta(days=30), "sub"),
+            {DISK_ID.lower(): datetime(2023, 1, 1, 10)},
+        )
+        self.assertEqual(
+            self.store.last_activity_by_resource_group("sub"),
+            {"rg-a": datetime(2023, 3, 5, 10, 0, 0, 123456)},
+        )
+
+    def test_next_run_reads_from_watermark(self):
+        self.client.get.side_effect = [
+            page(
+                [
+                    event(
+                        DISK_ID, "2023-01-01T10:00:00Z", "Microsoft.Compute/disks/write"
+                    )
+                ]
+            )
+        ]
+        ingest_activity_log("sub", "token", self.store, now=NOW)
+
+        later = NOW + timedelta(days=1)
+        self.client.get.side_effect = [
+            page(
+                [
+                    event(
+                        DISK_ID, "2023-03-10T12:00:00Z", "Microsoft.Compute/disks/write"
+                    )
+                ]
+            )
+        ]
+        ingest_activity_log("sub", "token", self.store, now=later)
+
+        self.assertIn(
+            "eventTimestamp ge '2023-03-10T01:45:00Z'",
+            self.client.get.call_args.kwargs["params"]["$filter"],
+        )
+        self.assertEqual(self.store.watermark("sub"), later)
+        self.assertEqual(self.store.unused_since(NOW - timedelta(days=30)), {})
+
+    def test_older_events_do_not_overwrite_newer_ones(self):
+        self.store.record(
+            "sub",
+            [
+                {
+                    "resource_id": VM_ID,
+                    "timestamp": datetime(2023, 3, 9),
+                    "operation": "write",
+                }
+            ],
+        )
+        self.store.record(
+            "sub",
+            [
+                {
+                    "resource_id": VM_ID,
+                    "timestamp": datetime(2023, 3, 1),
+                    "operation": "write",
+                }
+            ],
+        )
+
+        self.assertEqual(self.store.last_activity(VM_ID), datetime(2023, 3, 9))
+
+    def test_unused_since_includes_resources_never_seen(self):
+        self.store.record(
+            "sub",
+            [
+                {
+                    "resource_id": VM_ID,
+                    "timestamp": datetime(2023, 3, 9),
+                    "operation": "write",
+                }
+            ],
+        )
+
+        self.assertEqual(
+            self.store.unused_since(
+                NOW - timedelta(days=30), resource_ids=[VM_ID, DISK_ID]
+            ),
+            {DISK_ID.lower(): None},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from src.arm import ArmClient, get_arm_client
+from src.auth import ServicePrincipalCredential
+from src.throttling import RateLimitGovernor
+
+
+class FakeArmHandler(BaseHTTPRequestHandler):
+    """
+    Echoes the path and headers of each request, recording the client port it came from.
+    """
+
+    protocol_version = "HTTP/1.1"
+    requests = []
+
+    def _reply(self):
+        FakeArmHandler.requests.append(
+            {
+                "method": self.command,
+                "path": self.path,
+                "port": self.client_address[1],
+                "authorization": self.headers.get("Authorization"),
+                "client_request_id": self.headers.get("x-ms-client-request-id"),
+            }
+        )
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        body = json.dumps({"path": self.path}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_PATCH = do_DELETE = _reply
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestArmClient(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeArmHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def setUp(self):
+        FakeArmHandler.requests = []
+        self.client = ArmClient(
+            base_url=f"{self.base_url}/", governor=RateLimitGovernor()
+        )
+        self.addCleanup(self.client.close)
+
+    def test_reuses_one_connection_across_calls(self):
+        for method in ("get", "patch", "delete", "get"):
+            response = getattr(self.client, method)(
+                "/subscriptions/sub/resourcegroups/rg?api-version=2020-06-01",
+                access_token="token",
+                json={} if method == "patch" else None,
+            )
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(
+            [request["method"] for request in FakeArmHandler.requests],
+            ["GET", "PATCH", "DELETE", "GET"],
+        )
+        # Keep-alive: every request went over the same TCP connection
+        self.assertEqual(
+            len({request["port"] for request in FakeArmHandler.requests}), 1
+        )
+
+    def test_resolves_relative_paths_with_api_version(self):
+        self.client.get(
+            "subscriptions/sub/resourcegroups",
+            access_token="token",
+            params={"api-version": "2020-06-01", "$top": 5},
+        )
+        self.client.get(
+            f"{self.base_url}/next?api-version=2020-06-01&$skiptoken=abc",
+            access_token="token",
+        )
+
+        self.assertEqual(
+            [request["path"] for request in FakeArmHandler.requests],
+            [
+                "/subscriptions/sub/resourcegroups?api-version=2020-06-01&%24top=5",
+                "/next?api-version=2020-06-01&$skiptoken=abc",
+            ],
+        )
+        self.assertEqual(self.client.url("/a"), f"{self.base_url}/a")
+        self.assertEqual(self.client.url("https://other/b"), "https://other/b")
+
+    def test_applies_auth_and_extra_headers(self):
+        broker = mock.Mock(**{"get_token.side_effect": ["token-1", "token-2"]})
+        credential = ServicePrincipalCredential(
+            "tenant", "client", "secret", broker=broker
+        )
+
+        self.client.get("/a", access_token="plain-token")
+        self.client.get(
+            "/b", access_token="plain-token", headers={"x-ms-client-request-id": "42"}
+        )
+        # Credentials are resolved on every call, so a refreshed token is picked up
+        self.client.get("/c", access_token=credential)
+        self.client.get("/d", access_token=credential)
+
+        self.assertEqual(
+            [request["authorization"] for request in FakeArmHandler.requests],
+            [
+                "Bearer plain-token",
+                "Bearer plain-token",
+                "Bearer token-1",
+                "Bearer token-2",
+            ],
+        )
+        self.assertEqual(
+            [request["client_request_id"] for request in FakeArmHandler.requests],
+            [None, "42", None, None],
+        )
+
+    def test_process_wide_client_is_shared(self):
+        self.assertIs(get_arm_client(), get_arm_client())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from src.auth import (
+    ServicePrincipalCredential,
+    TokenBroker,
+    resolve_access_token,
+)
+
+
+def _token_response(access_token="token-1", expires_in=3600):
+    response = mock.Mock()
+    response.raise_for_status.return_value = None
+    response.json.return_value = {
+        "access_token": access_token,
+        "expires_in": str(expires_in),
+        "expires_on": str(int(time.time()) + expires_in),
+    }
+    return response
+
+
+class TestTokenBroker(unittest.TestCase):
+    def test_reuses_token_until_refresh_margin(self):
+        broker = TokenBroker(refresh_margin=300)
+        with mock.patch("src.auth.requests.post") as post:
+            post.return_value = _token_response()
+            first = broker.get_token("tenant", "client", "secret")
+            second = broker.get_token("tenant", "client", "secret")
+
+        self.assertEqual(first, "token-1")
+        self.assertEqual(second, "token-1")
+        self.assertEqual(post.call_count, 1)
+
+    def test_refreshes_ahead_of_expiry(self):
+        broker = TokenBroker(refresh_margin=300)
+        with mock.patch("src.auth.requests.post") as post:
+            post.side_effect = [
+                _token_response("token-1", expires_in=120),
+                _token_response("token-2"),
+            ]
+            broker.get_token("tenant", "client", "secret")
+            access_token = broker.get_token("tenant", "client", "secret")
+
+        self.assertEqual(access_token, "token-2")
+        self.assertEqual(post.call_count, 2)
+
+    def test_keys_by_tenant_client_and_resource(self):
+        broker = TokenBroker()
+        with mock.patch("src.auth.requests.post") as post:
+            post.return_value = _token_response()
+            broker.get_token("tenant", "client", "secret")
+            broker.get_token("tenant", "client", "secret", "https://other/")
+            broker.get_token("other-tenant", "client", "secret")
+
+        self.assertEqual(post.call_count, 3)
+
+    def test_concurrent_threads_share_one_refresh(self):
+        broker = TokenBroker()
+
+        def slow_post(*args, **kwargs):
+            time.sleep(0.05)
+            return _token_response()
+
+        with mock.patch("src.auth.requests.post", side_effect=slow_post) as post:
+            threads = [
+                threading.Thread(
+                    target=broker.get_token, args=("tenant", "client", "secret")
+                )
+                for _ in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(post.call_count, 1)
+
+    def test_concurrent_coroutines_share_one_refresh(self):
+        broker = TokenBroker()
+
+        def slow_post(*args, **kwargs):
+            time.sleep(0.05)
+            return _token_response()
+
+        async def fetch_many():
+            return await asyncio.gather(
+                *[
+                    broker.get_token_async("tenant", "client", "secret")
+                    for _ in range(8)
+                ]
+            )
+
+        with mock.patch("src.auth.requests.post", side_effect=slow_post) as post:
+            tokens = asyncio.run(fetch_many())
+
+        self.assertEqual(set(tokens), {"token-1"})
+        self.assertEqual(post.call_count, 1)
+
+    def test_persists_tokens_to_disk(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache_path = os.path.join(directory, "tokens.json")
+            with mock.patch("src.auth.requests.post") as post:
+                post.return_value = _token_response()
+                TokenBroker(cache_path=cache_path).get_token(
+                    "tenant", "client", "secret"
+                )
+                access_token = TokenBroker(cache_path=cache_path).get_token(
+                    "tenant", "client", "secret"
+                )
+
+            self.assertEqual(access_token, "token-1")
+            self.assertEqual(post.call_count, 1)
+            self.assertNotIn("secret", open(cache_path).read())
+
+    def test_brokers_sharing_a_cache_save_concurrently(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache_path = os.path.join(directory, "tokens.json")
+            brokers = [TokenBroker(cache_path=cache_path) for _ in range(2)]
+            with mock.patch("src.auth.requests.post") as post:
+                post.return_value = _token_response()
+                for i, broker in enumerate(brokers):
+                    broker.get_token("tenant", f"client-{i}", "secret")
+
+            def save(broker):
+                for _ in range(500):
+                    broker._save()
+
+            threads = [
+                threading.Thread(target=save, args=(broker,)) for broker in brokers
+            ]
+            with self.assertNoLogs("src.auth", level="WARNING"):
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+
+            self.assertEqual(os.listdir(directory), ["tokens.json"])
+            # Whichever save came last, the cache is one complete document
+            with open(cache_path) as file:
+                self.assertEqual(len(json.load(file)), 1)
+
+
+class TestResolveAccessToken(unittest.TestCase):
+    def test_passes_strings_through(self):
+        self.assertEqual(resolve_access_token("raw-token"), "raw-token")
+
+    def test_resolves_credentials_through_broker(self):
+        credential = ServicePrincipalCredential(
+            "tenant", "client", "secret", broker=TokenBroker()
+        )
+        with mock.patch("src.auth.requests.post") as post:
+            post.return_value = _token_response()
+            self.assertEqual(resolve_access_token(credential), "token-1")
+            self.assertEqual(resolve_access_token(credential), "token-1")
+
+        self.assertEqual(post.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.arm import ArmClient
+from src.batch import ArmBatch
+from src.throttling import RateLimitGovernor
+
+
+class FakeBatchHandler(BaseHTTPRequestHandler):
+    """
+    Answers batch requests, throttling each operation listed in ``throttle`` once.
+    """
+
+    protocol_version = "HTTP/1.1"
+    throttle = set()
+    batches = []
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        FakeBatchHandler.batches.append([item["name"] for item in payload["requests"]])
+        responses = []
+        for item in payload["requests"]:
+            if item["name"] in self.throttle:
+                self.throttle.discard(item["name"])
+                responses.append(
+                    {
+                        "name": item["name"],
+                        "httpStatusCode": 429,
+                        "headers": {"Retry-After": "0"},
+                    }
+                )
+            else:
+                responses.append(
+                    {
+                        "name": item["name"],
+                        "httpStatusCode": 200,
+                        "content": item.get("content"),
+                    }
+                )
+
+        body = json.dumps({"responses": responses}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestArmBatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeBatchHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.client = ArmClient(
+            base_url=f"http://127.0.0.1:{cls.server.server_port}",
+            governor=RateLimitGovernor(),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client.close()
+        cls.server.shutdown()
+
+    def setUp(self):
+        FakeBatchHandler.batches = []
+        FakeBatchHandler.throttle = set()
+
+    def test_splits_operations_into_batches(self):
+        batch = ArmBatch("token", batch_size=20, client=self.client)
+        for i in range(45):
+            batch.add(
+                "PATCH", f"/subscriptions/s/rg-{i}", content={"i": i}, name=str(i)
+            )
+
+        results = batch.execute()
+
+        self.assertEqual(
+            [len(names) for names in FakeBatchHandler.batches], [20, 20, 5]
+        )
+        self.assertEqual(batch.round_trips, 3)
+        self.assertEqual(
+            results["44"], {"status": 200, "content": {"i": 44}, "headers": {}}
+        )
+
+    def test_retries_only_throttled_operations(self):
+        FakeBatchHandler.throttle = {"b"}
+        batch = ArmBatch("token", client=self.client)
+        for name in ("a", "b", "c"):
+            batch.add("DELETE", f"/subscriptions/s/{name}", name=name)
+
+        results = batch.execute()
+
+        self.assertEqual(FakeBatchHandler.batches, [["a", "b", "c"], ["b"]])
+        self.assertEqual(
+            {name: result["status"] for name, result in results.items()},
+            {"a": 200, "b": 200, "c": 200},
+        )
+        self.assertEqual(
+            batch.stats(), {"operations": 3, "round_trips": 2, "retries": 1}
+        )
+
+    def test_stats_add_up_across_executes(self):
+        batch = ArmBatch("token", batch_size=2, client=self.client)
+        for chunk in (("a", "b", "c"), ("d",)):
+            for name in chunk:
+                batch.add("DELETE", f"/subscriptions/s/{name}", name=name)
+            batch.execute()
+
+        self.assertEqual(
+            batch.stats(), {"operations": 4, "round_trips": 3, "retries": 0}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from datetime import date
+
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from db.bulk import upsert_metrics
+from db.connection_manager import Base, create_db_engine
+from db.models import Metrics
+
+
+class TestUpsertMetrics(unittest.TestCase):
+    def setUp(self):
+        engine = create_db_engine("sqlite://", synchronous="off")
+        Base.metadata.create_all(bind=engine)
+        self.session = sessionmaker(bind=engine)()
+        self.addCleanup(self.session.close)
+
+    def test_replaces_rows_of_the_same_run_date(self):
+        def rows(cpu, run_date):
+            return [
+                {
+                    "resource_id": f"vm-{i}",
+                    "run_date": run_date,
+                    "resource_name": f"vm-{i}",
+                    "cpu_weight_avg": cpu,
+                }
+                for i in range(5)
+            ]
+
+        self.assertEqual(
+            upsert_metrics(self.session, rows(10, date(2023, 3, 1)), batch_size=2), 5
+        )
+        upsert_metrics(self.session, rows(20, date(2023, 3, 1)), batch_size=2)
+        upsert_metrics(self.session, rows(30, date(2023, 3, 2)))
+
+        self.assertEqual(
+            sorted(
+                set(
+                    self.session.execute(
+                        select(Metrics.run_date, Metrics.cpu_weight_avg)
+                    ).all()
+                )
+            ),
+            [(date(2023, 3, 1), 20), (date(2023, 3, 2), 30)],
+        )
+        self.assertEqual(len(self.session.execute(select(Metrics)).all()), 10)
+
+    def test_rejects_unknown_synchronous_mode(self):
+        with self.assertRaises(ValueError):
+            create_db_engine("sqlite://", synchronous="NORMAL; DROP TABLE metrics")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import date
+
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import sessionmaker
+
+from db.bulk import upsert_metrics
+from db.connection_manager import create_db_engine, init_db
+from db.models import Metrics
+
+# Metrics table as created before resource_id and run_date were added
+OLD_METRICS_TABLE = """
+CREATE TABLE metrics (
+    id INTEGER NOT NULL,
+    resource_name VARCHAR,
+    resource_type VARCHAR,
+    current_sku VARCHAR,
+    cpu_weight_avg INTEGER,
+    cpu_weight_peak INTEGER,
+    cpu_weight_peak_duration INTEGER,
+    cpu_weight_bottom INTEGER,
+    memory_weight_avg INTEGER,
+    memory_weight_peak INTEGER,
+    memory_weight_peak_duration INTEGER,
+    memory_weight_bottom INTEGER,
+    storage_weight_avg INTEGER,
+    other_weight_avg INTEGER,
+    other_weight_peak INTEGER,
+    current_weightage INTEGER,
+    suggested_sku VARCHAR,
+    PRIMARY KEY (id)
+)
+"""
+
+
+class TestInitDb(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "aco.db")
+
+    def _engine(self):
+        engine = create_db_engine(f"sqlite:///{self.path}")
+        self.addCleanup(engine.dispose)
+        return engine
+
+    def test_creates_the_schema_of_a_new_database(self):
+        engine = self._engine()
+        init_db(engine)
+
+        self.assertIn("metrics", inspect(engine).get_table_names())
+        self.assertIn("vm_skus", inspect(engine).get_table_names())
+
+    def test_upgrades_an_old_metrics_table(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute(OLD_METRICS_TABLE)
+        connection.execute("INSERT INTO metrics (resource_name) VALUES ('old-vm')")
+        connection.commit()
+        connection.close()
+
+        engine = self._engine()
+        init_db(engine)
+        # Running it again leaves an up-to-date database alone
+        init_db(engine)
+
+        columns = {column["name"] for column in inspect(engine).get_columns("metrics")}
+        self.assertTrue({"resource_id", "run_date"} <= columns)
+        session = sessionmaker(bind=engine)()
+        self.addCleanup(session.close)
+        rows = [
+            {"resource_id": "vm-1", "run_date": date(2023, 3, 1), "cpu_weight_avg": 1}
+        ]
+        upsert_metrics(session, rows)
+        upsert_metrics(session, [dict(rows[0], cpu_weight_avg=2)])
+
+        self.assertEqual(
+            session.execute(
+                select(Metrics.resource_name, Metrics.cpu_weight_avg).order_by(
+                    Metrics.id
+                )
+            ).all(),
+            [("old-vm", None), (None, 2)],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
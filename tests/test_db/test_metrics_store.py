@@ -0,0 +1,84 @@
+import unittest
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from db.connection_manager import Base
+from db.metrics_store import MetricStore
+
+VM_ID = (
+    "/subscriptions/s/resourceGroups/rg/providers/Microsoft.Compute/virtualMachines/VM"
+)
+
+
+class TestMetricStore(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        self.session = sessionmaker(bind=engine)()
+        self.addCleanup(self.session.close)
+        self.store = MetricStore(self.session, retention_days=30)
+
+    def test_fetches_from_watermark_and_overwrites_last_interval(self):
+        now = datetime(2023, 3, 10, 12)
+        self.assertEqual(
+            self.store.fetch_timespan(VM_ID, initial_days=7, now=now),
+            "2023-03-03T12:00:00Z/2023-03-10T12:00:00Z",
+        )
+
+        self.store.append(
+            VM_ID,
+            {
+                "Percentage CPU": [
+                    ["2023-03-10T10:00:00Z", 10.0],
+                    ["2023-03-10T11:00:00Z", 20.0],
+                ]
+            },
+        )
+        self.assertEqual(
+            self.store.fetch_timespan(VM_ID, now=now),
+            "2023-03-10T11:00:00Z/2023-03-10T12:00:00Z",
+        )
+
+        self.store.append(
+            VM_ID,
+            {
+                "Percentage CPU": [
+                    ["2023-03-10T11:00:00Z", 25.0],
+                    ["2023-03-10T12:00:00Z", 30.0],
+                ]
+            },
+        )
+        timestamps, values = self.store.read(
+            VM_ID.lower(), "Percentage CPU", datetime(2023, 3, 10), now
+        )
+        np.testing.assert_array_equal(values, [10.0, 25.0])
+        self.assertEqual(timestamps[0], np.datetime64("2023-03-10T10:00:00"))
+        self.assertEqual(
+            self.store.watermark(VM_ID, "Percentage CPU"), datetime(2023, 3, 10, 12)
+        )
+
+    def test_retention_drops_old_samples(self):
+        self.store.append(
+            VM_ID,
+            {
+                "Network In Total": [
+                    ["2023-01-01T00:00:00Z", 1.0],
+                    ["2023-03-01T00:00:00Z", 2.0],
+                ]
+            },
+        )
+
+        deleted = self.store.apply_retention(now=datetime(2023, 3, 10))
+
+        self.assertEqual(deleted, 1)
+        fleet = self.store.read_fleet(
+            "Network In Total", datetime(2022, 1, 1), datetime(2024, 1, 1)
+        )
+        np.testing.assert_array_equal(fleet[VM_ID.lower()][1], [2.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+from unittest import mock
+
+from src.digest import DigestCollector, build_digest_messages, send_digests
+
+
+class TestDigest(unittest.TestCase):
+    def setUp(self):
+        self.digest = DigestCollector()
+        self.digest.add("Jane.Doe@example.com", "untagged", "rg-1", "tagged TTL=7")
+        self.digest.add("jane.doe@example.com", "resize", "vm-1", "D4s_v3 -> D2s_v3")
+        self.digest.add("john@example.com", "expired", "rg-2", subscription_id="sub")
+        self.digest.add(None, "untagged", "rg-orphan")
+
+    def test_groups_findings_into_one_message_per_owner(self):
+        messages = build_digest_messages(
+            self.digest, "aco@example.com", sender_name="ACO"
+        )
+
+        self.assertEqual(
+            [message["To"] for message in messages],
+            ["jane.doe@example.com", "john@example.com"],
+        )
+        body = messages[0].get_content()
+        self.assertIn("Dear Jane Doe,", body)
+        self.assertIn("  - rg-1: tagged TTL=7", body)
+        self.assertIn("  - vm-1: D4s_v3 -> D2s_v3", body)
+        self.assertIn("ACO", body)
+        self.assertIn("  - rg-2 (sub)", messages[1].get_content())
+
+    def test_sends_digests_through_the_dispatcher(self):
+        dispatcher = mock.Mock()
+        dispatcher.send_many.return_value = [{"success": True}, {"success": True}]
+
+        outcomes = send_digests(self.digest, "aco@example.com", dispatcher=dispatcher)
+
+        self.assertEqual(len(outcomes), 2)
+        self.assertEqual(len(dispatcher.send_many.call_args.args[0]), 2)
+
+    def test_rejects_unknown_kinds(self):
+        with self.assertRaises(ValueError):
+            self.digest.add("jane@example.com", "unknown", "rg")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,219 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from db.connection_manager import Base
+from src.digest import DigestCollector
+from src.expiry import ExpiryScheduler
+
+NOW = datetime(2023, 3, 10, 2)
+
+
+def resource_group(name, ttl="7", created_time="2023-03-01T10:00:00.1234567Z"):
+    group = {
+        "id": f"/subscriptions/sub/resourceGroups/{name}",
+        "name": name,
+        "tags": {"TTL": ttl, "OwnerEmail": f"{name}@example.com"},
+    }
+    if created_time:
+        group["created_time"] = created_time
+    return group
+
+
+class TestExpiryScheduler(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        self.session = sessionmaker(bind=engine)()
+        self.addCleanup(self.session.close)
+        self.scheduler = ExpiryScheduler(self.session, grace_days=3)
+        # The live state of each group, as read again before deleting it
+        self.live = {}
+        patcher = mock.patch(
+            "src.expiry.get_resource_group",
+            side_effect=lambda subscription_id, name, token, expand=None: self.live.get(
+                name
+            ),
+        )
+        self.get_resource_group = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def sync(self, groups, now=NOW):
+        self.live = {group["name"]: group for group in groups}
+        with mock.patch("src.expiry.iter_resource_groups", return_value=groups) as m:
+            self.scheduler.sync("sub", "token", now)
+        return m
+
+    def test_sync_schedules_expiry_from_creation_time(self):
+        listing = self.sync(
+            [
+                resource_group("rg-a", ttl="7"),
+                resource_group("rg-b", ttl="30"),
+                resource_group("rg-c", ttl="forever"),
+                resource_group("rg-d", created_time=None),
+            ]
+        )
+
+        listing.assert_called_once_with(
+            "sub",
+            "token",
+            filter_expression="tagName eq 'TTL'",
+            expand="createdTime",
+        )
+        due = self.scheduler.due(NOW + timedelta(days=365))
+        self.assertEqual(
+            [(entry.name, entry.expires_at) for entry in due],
+            [
+                ("rg-a", datetime(2023, 3, 8, 10, 0, 0, 123456)),
+                # No creation time: counted from when it was first seen
+                ("rg-d", NOW + timedelta(days=7)),
+                ("rg-b", datetime(2023, 3, 31, 10, 0, 0, 123456)),
+            ],
+        )
+        self.assertEqual([entry.name for entry in self.scheduler.due(NOW)], ["rg-a"])
+
+    def test_notifies_then_deletes_after_grace_period(self):
+        self.sync([resource_group("rg-a"), resource_group("rg-b", ttl="30")])
+        digest = DigestCollector()
+
+        with mock.patch("src.expiry.delete_resource_group") as delete:
+            summary = self.scheduler.run("token", NOW, digest=digest)
+            self.assertEqual(
+                summary["notified"], ["/subscriptions/sub/resourcegroups/rg-a"]
+            )
+            self.assertEqual(
+                digest.by_owner()["rg-a@example.com"][0]["detail"],
+                "expired on 2023-03-08, will be deleted after 2023-03-13",
+            )
+
+            # Nothing is due again before the grace period ends
+            summary = self.scheduler.run("token", NOW + timedelta(days=2))
+            self.assertEqual(
+                summary,
+                {
+                    "notified": [],
+                    "unnotified": [],
+                    "deleted": [],
+                    "failed": [],
+                    "skipped": [],
+                },
+            )
+            delete.assert_not_called()
+
+            summary = self.scheduler.run("token", NOW + timedelta(days=3))
+            delete.assert_called_once_with("sub", "rg-a", "token", tracker=None)
+            self.assertEqual(
+                summary["deleted"], ["/subscriptions/sub/resourcegroups/rg-a"]
+            )
+
+        # Still listed while ARM deletes it; it must not be scheduled again
+        self.sync([resource_group("rg-a"), resource_group("rg-b", ttl="30")])
+        self.assertEqual(self.scheduler.due(NOW + timedelta(days=10)), [])
+
+    def test_groups_without_an_owner_are_not_notified_or_deleted(self):
+        group = resource_group("rg-a")
+        del group["tags"]["OwnerEmail"]
+        self.sync([group])
+        digest = DigestCollector()
+
+        with mock.patch("src.expiry.delete_resource_group") as delete:
+            summary = self.scheduler.run("token", NOW, digest=digest)
+            self.assertEqual(
+                summary["unnotified"], ["/subscriptions/sub/resourcegroups/rg-a"]
+            )
+            self.assertEqual(summary["notified"], [])
+            self.assertEqual(len(digest), 0)
+            # Retried later, but never deleted while nobody was warned
+            summary = self.scheduler.run(
+                "token", NOW + timedelta(days=3), digest=digest
+            )
+            self.assertEqual(len(summary["unnotified"]), 1)
+        delete.assert_not_called()
+
+        # Once an owner is tagged, the notice goes out and the grace period starts
+        self.sync([resource_group("rg-a")], now=NOW + timedelta(days=4))
+        summary = self.scheduler.run("token", NOW + timedelta(days=4), digest=digest)
+        self.assertEqual(
+            summary["notified"], ["/subscriptions/sub/resourcegroups/rg-a"]
+        )
+        (entry,) = self.scheduler.due(NOW + timedelta(days=7))
+        self.assertEqual(entry.state, "notified")
+
+    def test_without_a_digest_nothing_is_notified(self):
+        self.sync([resource_group("rg-a")])
+
+        summary = self.scheduler.run("token", NOW)
+
+        self.assertEqual(summary["notified"], [])
+        self.assertEqual(len(summary["unnotified"]), 1)
+        (entry,) = self.scheduler.due(NOW + timedelta(days=1))
+        self.assertEqual(entry.state, "scheduled")
+
+    def test_extending_ttl_cancels_pending_deletion(self):
+        self.sync([resource_group("rg-a")])
+        with mock.patch("src.expiry.delete_resource_group") as delete:
+            self.scheduler.run("token", NOW, digest=DigestCollector())
+            self.sync([resource_group("rg-a", ttl="30")], now=NOW + timedelta(days=1))
+            self.scheduler.run("token", NOW + timedelta(days=3))
+        delete.assert_not_called()
+        self.assertEqual(
+            [entry.state for entry in self.scheduler.due(NOW + timedelta(days=30))],
+            ["scheduled"],
+        )
+
+    def test_ttl_extended_after_notification_is_read_before_deleting(self):
+        self.sync([resource_group("rg-a")])
+        self.scheduler.run("token", NOW, digest=DigestCollector())
+        # The owner raises the TTL, but no sync runs before the grace period ends
+        self.live["rg-a"] = resource_group("rg-a", ttl="30")
+
+        with mock.patch("src.expiry.delete_resource_group") as delete:
+            summary = self.scheduler.run("token", NOW + timedelta(days=3))
+
+        delete.assert_not_called()
+        self.get_resource_group.assert_called_once_with(
+            "sub", "rg-a", "token", expand="createdTime"
+        )
+        self.assertEqual(summary["skipped"], ["/subscriptions/sub/resourcegroups/rg-a"])
+        (entry,) = self.scheduler.due(NOW + timedelta(days=30))
+        self.assertEqual(entry.state, "scheduled")
+        self.assertEqual(entry.next_action_at, datetime(2023, 3, 31, 10, 0, 0, 123456))
+
+    def test_ttl_tag_removed_after_notification_drops_the_group(self):
+        self.sync([resource_group("rg-a")])
+        self.scheduler.run("token", NOW, digest=DigestCollector())
+        self.live["rg-a"] = dict(resource_group("rg-a"), tags={})
+
+        with mock.patch("src.expiry.delete_resource_group") as delete:
+            self.scheduler.run("token", NOW + timedelta(days=3))
+
+        delete.assert_not_called()
+        self.assertEqual(self.scheduler.due(NOW + timedelta(days=365)), [])
+
+    def test_failed_deletion_is_retried_later(self):
+        self.sync([resource_group("rg-a")])
+        self.scheduler.run("token", NOW, digest=DigestCollector())
+        with mock.patch(
+            "src.expiry.delete_resource_group", side_effect=Exception("locked")
+        ):
+            summary = self.scheduler.run("token", NOW + timedelta(days=3))
+
+        self.assertEqual(len(summary["failed"]), 1)
+        self.assertEqual(self.scheduler.due(NOW + timedelta(days=3)), [])
+        self.assertEqual(len(self.scheduler.due(NOW + timedelta(days=3, hours=1))), 1)
+
+    def test_sync_drops_groups_no_longer_listed(self):
+        self.sync([resource_group("rg-a"), resource_group("rg-b")])
+        self.sync([resource_group("rg-b")])
+
+        self.assertEqual(
+            [entry.name for entry in self.scheduler.due(NOW + timedelta(days=30))],
+            ["rg-b"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
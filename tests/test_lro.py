@@ -0,0 +1,164 @@
+import json
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+import requests
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from db.connection_manager import Base
+from src.lro import OperationTracker, wait_for_operation
+from src.resources.resource_group import delete_resource_group
+
+RG_ID = "/subscriptions/sub/resourceGroups/rg-1"
+NOW = datetime(2023, 3, 10, 2)
+
+
+def make_response(status_code, body=None, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(body or {}).encode()
+    response.headers.update(headers or {})
+    return response
+
+
+def accepted(name, **headers):
+    return make_response(
+        202,
+        headers={"Azure-AsyncOperation": f"https://arm/operations/{name}", **headers},
+    )
+
+
+class TestOperationTracker(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        self.session_factory = sessionmaker(bind=engine)
+        self.session = self.session_factory()
+        self.addCleanup(self.session.close)
+        self.client = mock.Mock()
+        self.tracker = OperationTracker(
+            self.session, "token", client=self.client, poll_interval=5
+        )
+
+    def test_polls_only_due_operations_with_their_own_backoff(self):
+        self.tracker.register(RG_ID, accepted("op-1", **{"Retry-After": "30"}), NOW)
+        self.tracker.register(f"{RG_ID}-2", accepted("op-2"), NOW)
+        self.client.get.return_value = make_response(200, {"status": "InProgress"})
+
+        self.assertEqual(self.tracker.poll_due(NOW + timedelta(seconds=5)), [])
+        self.assertEqual(self.client.get.call_count, 1)
+        self.client.get.assert_called_with(
+            "https://arm/operations/op-2", access_token="token"
+        )
+        # The second operation backs off to 10s; the first is due after its Retry-After
+        self.assertEqual(
+            [(op.resource_id, op.next_poll_at) for op in self.tracker.pending()],
+            [
+                (f"{RG_ID}-2".lower(), NOW + timedelta(seconds=15)),
+                (RG_ID.lower(), NOW + timedelta(seconds=30)),
+            ],
+        )
+
+        self.client.get.return_value = make_response(200, {"status": "Succeeded"})
+        finished = self.tracker.poll_due(NOW + timedelta(seconds=30))
+
+        self.assertEqual(len(finished), 2)
+        self.assertEqual(self.tracker.pending(), [])
+        result = self.tracker.results()[RG_ID.lower()]
+        self.assertEqual(result["status"], "Succeeded")
+        self.assertEqual(result["duration"], 30)
+
+    def test_restarted_tracker_resumes_pending_operations(self):
+        self.tracker.register(RG_ID, accepted("op-1"), NOW)
+        self.session.close()
+
+        session = self.session_factory()
+        self.addCleanup(session.close)
+        tracker = OperationTracker(session, "token", client=self.client)
+        self.assertEqual([op.resource_id for op in tracker.pending()], [RG_ID.lower()])
+
+        self.client.get.return_value = make_response(
+            200, {"status": "Failed", "error": {"message": "locked"}}
+        )
+        tracker.poll_due(NOW + timedelta(minutes=1))
+
+        self.assertEqual(tracker.results()[RG_ID.lower()]["status"], "Failed")
+        self.assertEqual(tracker.results()[RG_ID.lower()]["error"], "locked")
+
+    def test_follows_location_header(self):
+        self.tracker.register(
+            RG_ID,
+            make_response(202, headers={"Location": "https://arm/location/op-1"}),
+            NOW,
+        )
+        self.client.get.side_effect = [make_response(202), make_response(200)]
+
+        self.tracker.poll_due(NOW + timedelta(seconds=5))
+        self.assertEqual(len(self.tracker.pending()), 1)
+        self.tracker.poll_due(NOW + timedelta(seconds=15))
+
+        self.assertEqual(self.tracker.results()[RG_ID.lower()]["status"], "Succeeded")
+
+    def test_gives_up_after_timeout(self):
+        tracker = OperationTracker(
+            self.session, "token", client=self.client, timeout=60
+        )
+        tracker.register(RG_ID, accepted("op-1"), NOW)
+        self.client.get.return_value = make_response(200, {"status": "InProgress"})
+
+        tracker.poll_due(NOW + timedelta(minutes=2))
+
+        self.assertEqual(tracker.results()[RG_ID.lower()]["status"], "TimedOut")
+
+    def test_run_polls_until_done(self):
+        tracker = OperationTracker(
+            self.session, "token", client=self.client, poll_interval=0
+        )
+        tracker.register(RG_ID, accepted("op-1"))
+        self.client.get.side_effect = [
+            make_response(200, {"status": "InProgress"}),
+            make_response(200, {"status": "Succeeded"}),
+        ]
+
+        results = tracker.run(timeout=5)
+
+        self.assertEqual(list(results), [RG_ID.lower()])
+        self.assertEqual(results[RG_ID.lower()]["status"], "Succeeded")
+
+    def test_delete_resource_group_registers_accepted_deletion(self):
+        client = mock.Mock()
+        client.get.return_value = make_response(200, {"name": "rg-1"})
+        client.delete.return_value = accepted("op-1")
+
+        with mock.patch(
+            "src.resources.resource_group.get_arm_client", return_value=client
+        ):
+            self.assertTrue(
+                delete_resource_group("sub", "rg-1", "token", tracker=self.tracker)
+            )
+
+        self.assertEqual(
+            [op.resource_id for op in self.tracker.pending()], [RG_ID.lower()]
+        )
+
+
+class TestWaitForOperation(unittest.TestCase):
+    def test_waits_for_terminal_status(self):
+        client = mock.Mock()
+        client.get.side_effect = [
+            make_response(200, {"status": "InProgress"}, {"Retry-After": "0"}),
+            make_response(200, {"status": "Canceled"}),
+        ]
+
+        outcome = wait_for_operation(
+            accepted("op-1"), "token", client=client, poll_interval=0
+        )
+
+        self.assertEqual(outcome, {"status": "Canceled", "error": None})
+        self.assertEqual(client.get.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
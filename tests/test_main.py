@@ -0,0 +1,197 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import main
+
+
+RESOURCE_GROUPS = [
+    {"name": "untagged", "location": "westeurope", "id": "", "type": "", "tags": {}},
+    {
+        "name": "owner-only",
+        "location": "westeurope",
+        "id": "",
+        "type": "",
+        "tags": {"OwnerEmail": "owner@example.com"},
+    },
+    {
+        "name": "tagged",
+        "location": "westeurope",
+        "id": "",
+        "type": "",
+        "tags": {"OwnerEmail": "owner@example.com", "TTL": "7"},
+    },
+]
+
+
+class TestMain(unittest.TestCase):
+    def setUp(self):
+        self.update_tag = self._patch("src.tagging.update_tag", return_value=True)
+        self.update_tag_async = self._patch(
+            "src.tagging.update_tag_async", return_value=True
+        )
+        self._patch("main.iter_resource_groups", return_value=iter(RESOURCE_GROUPS))
+        self._patch(
+            "main.build_resource_group_creator_index",
+            return_value={"untagged": "creator@example.com"},
+        )
+
+    def _patch(self, target, **kwargs):
+        patcher = mock.patch(target, **kwargs)
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def test_sends_one_merge_patch_per_group_needing_tags(self):
+        self.assertTrue(main.main("tenant", "client", "secret", "subscription"))
+
+        calls = {
+            call.kwargs["resource_group_name"]: call.kwargs["update_data"]
+            for call in self.update_tag.call_args_list
+        }
+        self.assertEqual(
+            calls,
+            {
+                "untagged": {"OwnerEmail": "creator@example.com", "TTL": "7"},
+                "owner-only": {"TTL": "7"},
+            },
+        )
+
+    def test_async_mode_tags_the_same_groups(self):
+        self.assertTrue(
+            main.main("tenant", "client", "secret", "subscription", use_async=True)
+        )
+
+        self.assertEqual(
+            sorted(
+                call.kwargs["resource_group_name"]
+                for call in self.update_tag_async.call_args_list
+            ),
+            ["owner-only", "untagged"],
+        )
+        self.update_tag.assert_not_called()
+
+    def test_batch_mode_merges_tags_in_one_batch(self):
+        with mock.patch(
+            "src.tagging.update_tags_batch",
+            return_value={"untagged": True, "owner-only": True},
+        ) as update_tags_batch:
+            self.assertTrue(
+                main.main("tenant", "client", "secret", "subscription", use_batch=True)
+            )
+
+        update_tags_batch.assert_called_once()
+        self.assertEqual(
+            update_tags_batch.call_args.kwargs["update_data_by_group"],
+            {
+                "untagged": {"OwnerEmail": "creator@example.com", "TTL": "7"},
+                "owner-only": {"TTL": "7"},
+            },
+        )
+        self.update_tag.assert_not_called()
+
+    def test_reports_tagged_groups_to_their_owners(self):
+        digest = main.DigestCollector()
+        self.assertTrue(
+            main.main("tenant", "client", "secret", "subscription", digest=digest)
+        )
+
+        self.assertEqual(
+            {
+                owner: [finding["resource_name"] for finding in findings]
+                for owner, findings in digest.by_owner().items()
+            },
+            {"creator@example.com": ["untagged"], "owner@example.com": ["owner-only"]},
+        )
+
+
+class TestTagResourceGroupsAsync(unittest.TestCase):
+    def test_limits_concurrency_and_collects_failures(self):
+        in_flight = 0
+        peak = 0
+
+        async def reconcile(**kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            if kwargs["resource_group"]["name"] == "rg-3":
+                raise RuntimeError("boom")
+            return {"name": kwargs["resource_group"]["name"], "success": True}
+
+        resource_groups = [
+            {"name": f"rg-{i}", "tags": {"OwnerEmail": "x"}} for i in range(10)
+        ]
+        with mock.patch(
+            "main.reconcile_resource_group_tags_async", side_effect=reconcile
+        ):
+            results = asyncio.run(
+                main.tag_resource_groups_async(
+                    subscription_id="subscription",
+                    resource_groups=resource_groups,
+                    creator_index={},
+                    access_token="token",
+                    concurrency=3,
+                )
+            )
+
+        self.assertEqual(len(results), 10)
+        self.assertEqual(peak, 3)
+        self.assertEqual([result["success"] for result in results].count(False), 1)
+
+
+class TestRunSubscriptions(unittest.TestCase):
+    def test_reports_each_subscription_in_isolation(self):
+        def fake_main(subscription_id, **kwargs):
+            if subscription_id == "sub-2":
+                raise RuntimeError("forbidden")
+            return True
+
+        subscriptions = [
+            {"id": "sub-1", "name": "one", "state": "Enabled"},
+            {"id": "sub-2", "name": "two", "state": "Enabled"},
+            {"id": "sub-3", "name": "three", "state": "Disabled"},
+        ]
+        with mock.patch("main.main", side_effect=fake_main), mock.patch(
+            "main.get_subscriptions", return_value=subscriptions
+        ), mock.patch("main.ServicePrincipalCredential"):
+            reports = main.run_subscriptions(
+                "tenant", "client", "secret", max_workers=2
+            )
+
+        self.assertEqual([report["id"] for report in reports], ["sub-1", "sub-2"])
+        self.assertEqual([report["success"] for report in reports], [True, False])
+        self.assertEqual(reports[1]["error"], "forbidden")
+        self.assertTrue(all(report["seconds"] >= 0 for report in reports))
+
+
+class TestReconcileResourceGroupTags(unittest.TestCase):
+    def test_counts_requests_saved(self):
+        with mock.patch("src.tagging.update_tag", return_value=True) as update_tag:
+            result = main.reconcile_resource_group_tags(
+                subscription_id="subscription",
+                resource_group=RESOURCE_GROUPS[0],
+                desired_tags={"OwnerEmail": "creator@example.com", "TTL": "7"},
+                access_token="token",
+            )
+
+        update_tag.assert_called_once()
+        self.assertEqual(result["requests"], 1)
+        self.assertEqual(result["requests_saved"], 5)
+
+    def test_skips_patch_when_nothing_changed(self):
+        with mock.patch("src.tagging.update_tag") as update_tag:
+            result = main.reconcile_resource_group_tags(
+                subscription_id="subscription",
+                resource_group=RESOURCE_GROUPS[2],
+                desired_tags={"OwnerEmail": None, "TTL": "7"},
+                access_token="token",
+            )
+
+        update_tag.assert_not_called()
+        self.assertEqual(result["requests"], 0)
+        self.assertEqual(result["requests_saved"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
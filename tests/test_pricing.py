@@ -0,0 +1,101 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from src.pricing import PriceIndex, fetch_retail_prices, score_recommendations
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "retail_prices.json")
+
+
+def _fixture_session():
+    with open(FIXTURE) as file:
+        pages = json.load(file)
+    session = mock.Mock()
+    session.get.side_effect = [
+        mock.Mock(**{"json.return_value": page}) for page in pages
+    ]
+    return session
+
+
+class TestPricing(unittest.TestCase):
+    def setUp(self):
+        self.session = _fixture_session()
+        self.index = PriceIndex()
+        self.index.add_items(fetch_retail_prices("WestEurope", session=self.session))
+
+    def test_follows_next_page_link(self):
+        self.assertEqual(self.session.get.call_count, 2)
+        first, second = self.session.get.call_args_list
+        self.assertIn(
+            "armRegionName eq 'westeurope'", first.kwargs["params"]["$filter"]
+        )
+        self.assertIsNone(second.kwargs["params"])
+
+    def test_keeps_one_linux_pay_as_you_go_price_per_sku(self):
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.get("standard_d2s_v3", "westeurope"), 0.096)
+        self.assertIsNone(self.index.get("Standard_D2s_v3", "eastus"))
+
+    def test_skips_reservation_prices(self):
+        reservation = {
+            "retailPrice": 1054.0,
+            "armRegionName": "westeurope",
+            "productName": "Virtual Machines DSv3 Series",
+            "skuName": "D2s v3",
+            "unitOfMeasure": "1 Hour",
+            "armSkuName": "Standard_D2s_v3",
+            "priceType": "Reservation",
+            "reservationTerm": "1 Year",
+        }
+
+        self.assertEqual(
+            self.index.add_items([reservation, dict(reservation, retailPrice=2020.0)]),
+            0,
+        )
+        self.assertEqual(self.index.get("Standard_D2s_v3", "westeurope"), 0.096)
+        self.assertEqual(self.index.prices_for("westeurope", "Reservation"), {})
+
+    def test_scores_recommendations_by_monthly_savings(self):
+        scored = score_recommendations(
+            [
+                {
+                    "name": "a",
+                    "location": "westeurope",
+                    "current_size": "Standard_D2s_v3",
+                    "new_size": "Standard_B2s",
+                },
+                {
+                    "name": "b",
+                    "location": "westeurope",
+                    "current_size": "Standard_E8s_v3",
+                    "new_size": "Standard_B2s",
+                },
+                {
+                    "name": "c",
+                    "location": "westeurope",
+                    "current_size": "Standard_D4s_v3",
+                    "new_size": "Standard_D2s_v3",
+                },
+            ],
+            self.index,
+        )
+
+        self.assertEqual([item["name"] for item in scored], ["c", "a", "b"])
+        self.assertEqual(scored[0]["monthly_savings"], 70.08)
+        self.assertIsNone(scored[2]["monthly_savings"])
+
+    def test_round_trips_through_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "prices.json")
+            self.index.save(path)
+            loaded = PriceIndex.load(path)
+
+        self.assertEqual(
+            loaded.prices_for("westeurope"), self.index.prices_for("westeurope")
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
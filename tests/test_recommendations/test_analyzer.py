@@ -0,0 +1,76 @@
+import unittest
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from db.connection_manager import Base
+from db.models import Metrics
+from src.recommendations.analyzer import (
+    analyze_fleet,
+    build_fleet_matrix,
+    write_fleet_metrics,
+)
+
+GIB = 1024**3
+
+
+class TestAnalyzer(unittest.TestCase):
+    def test_builds_matrix_on_common_grid(self):
+        series = {
+            "vm-1": (
+                np.array(
+                    ["2023-03-01T00:00", "2023-03-01T02:00"], dtype="datetime64[s]"
+                ),
+                np.array([1.0, 3.0]),
+            )
+        }
+
+        matrix = build_fleet_matrix(
+            series, ["vm-1", "vm-2"], datetime(2023, 3, 1), datetime(2023, 3, 1, 3)
+        )
+
+        np.testing.assert_array_equal(
+            matrix, [[1.0, np.nan, 3.0], [np.nan, np.nan, np.nan]]
+        )
+
+    def test_computes_weights_for_the_fleet(self):
+        cpu = np.array([[10.0, 90.0, 95.0, 20.0], [np.nan] * 4])
+        available_memory = np.array(
+            [[6 * GIB] * 4, [2 * GIB, np.nan, 2 * GIB, 2 * GIB]]
+        )
+
+        results = analyze_fleet(
+            cpu,
+            available_memory_bytes=available_memory,
+            memory_bytes=np.array([8 * GIB, 8 * GIB]),
+            peak_threshold=80,
+        )
+
+        self.assertAlmostEqual(results["cpu_weight_avg"][0], 53.75)
+        self.assertEqual(results["cpu_weight_peak_duration"][0], 120)
+        self.assertTrue(np.isnan(results["cpu_weight_avg"][1]))
+        np.testing.assert_allclose(results["memory_weight_avg"], [25.0, 75.0])
+        self.assertAlmostEqual(results["current_weightage"][1], 75.0)
+
+    def test_writes_rows_in_bulk(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        self.addCleanup(session.close)
+
+        results = analyze_fleet(np.array([[10.0, 20.0], [np.nan, np.nan]]))
+        written = write_fleet_metrics(
+            session, ["vm-1", "vm-2"], ["Standard_D2s_v3", "Standard_D4s_v3"], results
+        )
+
+        rows = session.execute(
+            select(Metrics.resource_name, Metrics.cpu_weight_avg)
+        ).all()
+        self.assertEqual(written, 2)
+        self.assertEqual(sorted(rows), [("vm-1", 15), ("vm-2", None)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import json as jsonlib
+import unittest
+from unittest import mock
+
+import requests
+
+from src.recommendations.fleet_metrics import collect_fleet_metrics
+
+
+def _vm(subscription_id, name, location):
+    return {
+        "id": f"/subscriptions/{subscription_id}/resourceGroups/rg/providers/Microsoft.Compute/virtualMachines/{name}",
+        "location": location,
+    }
+
+
+class TestCollectFleetMetrics(unittest.TestCase):
+    def test_batches_vms_by_subscription_and_region(self):
+        virtual_machines = [_vm("sub-1", f"vm-{i}", "westeurope") for i in range(3)]
+        virtual_machines += [
+            _vm("sub-1", "vm-east", "East US"),
+            _vm("sub-2", "vm-other", "westeurope"),
+        ]
+        requests = []
+
+        def post(path, access_token, params, json):
+            requests.append((path, json["resourceids"]))
+            response = mock.Mock()
+            response.json.return_value = {
+                "values": [
+                    {
+                        "resourceid": resource_id,
+                        "value": [
+                            {
+                                "name": {"value": "Percentage CPU"},
+                                "timeseries": [
+                                    {
+                                        "data": [
+                                            {
+                                                "timestamp": "2023-03-01T00:00:00Z",
+                                                "average": 42.0,
+                                            }
+                                        ]
+                                    }
+                                ],
+                            }
+                        ],
+                    }
+                    for resource_id in json["resourceids"]
+                ]
+            }
+            return response
+
+        with mock.patch("src.recommendations.fleet_metrics.ArmClient") as arm_client:
+            arm_client.return_value.post.side_effect = post
+            metrics = collect_fleet_metrics(
+                virtual_machines, "token", max_in_flight=2, batch_size=2
+            )
+
+        self.assertEqual(
+            sorted(call.kwargs["base_url"] for call in arm_client.call_args_list),
+            [
+                "https://eastus.metrics.monitor.azure.com",
+                "https://westeurope.metrics.monitor.azure.com",
+            ],
+        )
+        self.assertEqual(
+            sorted(len(resource_ids) for _, resource_ids in requests), [1, 1, 1, 2]
+        )
+        self.assertEqual(len(metrics), 5)
+        self.assertEqual(
+            metrics[virtual_machines[0]["id"].lower()]["Percentage CPU"], 42.0
+        )
+
+    def test_non_json_batch_fails_only_its_chunk(self):
+        virtual_machines = [_vm("sub-1", f"vm-{i}", "westeurope") for i in range(4)]
+
+        def post(path, access_token, params, json):
+            response = requests.Response()
+            response.status_code = 200
+            if virtual_machines[0]["id"].lower() in json["resourceids"]:
+                # A gateway error page that slipped past raise_for_status
+                response._content = b"<html>502 Bad Gateway</html>"
+            else:
+                response._content = jsonlib.dumps(
+                    {
+                        "values": [
+                            {"resourceid": resource_id, "value": []}
+                            for resource_id in json["resourceids"]
+                        ]
+                    }
+                ).encode()
+            return response
+
+        with mock.patch("src.recommendations.fleet_metrics.ArmClient") as arm_client:
+            arm_client.return_value.post.side_effect = post
+            metrics = collect_fleet_metrics(virtual_machines, "token", batch_size=2)
+
+        self.assertEqual(
+            sorted(metrics),
+            sorted(vm["id"].lower() for vm in virtual_machines[2:]),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
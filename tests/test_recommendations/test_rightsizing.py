@@ -0,0 +1,107 @@
+import unittest
+
+import numpy as np
+
+from src.recommendations.rightsizing import (
+    RightsizingIndex,
+    required_capacity,
+    suggest_skus,
+)
+
+
+def _sku(name, family, vcpus, memory_gb, premium_io=True):
+    return {
+        "name": name,
+        "family": family,
+        "vcpus": vcpus,
+        "memory_gb": memory_gb,
+        "uncached_disk_iops": 1600 * vcpus,
+        "uncached_disk_bytes_per_second": 24_000_000 * vcpus,
+        "network_bandwidth_mbps": 1000 * vcpus,
+        "premium_io": premium_io,
+        "accelerated_networking": vcpus >= 2,
+    }
+
+
+SKUS = [
+    _sku("Standard_D4s_v3", "DSv3", 4, 16),
+    _sku("Standard_D2s_v3", "DSv3", 2, 8),
+    _sku("Standard_B2s", "B", 2, 4),
+    _sku("Standard_A1_v2", "Av2", 1, 2, premium_io=False),
+    _sku("Standard_E2s_v3", "ESv3", 2, 16),
+]
+
+
+class TestRightsizingIndex(unittest.TestCase):
+    def test_returns_cheapest_fitting_sku(self):
+        index = RightsizingIndex(SKUS)
+
+        self.assertEqual(
+            index.find({"vcpus": 0.5, "memory_gb": 1.5})["name"], "Standard_A1_v2"
+        )
+        self.assertEqual(
+            index.find({"vcpus": 0.5, "memory_gb": 1.5}, premium_io=True)["name"],
+            "Standard_B2s",
+        )
+        self.assertEqual(
+            index.find({"vcpus": 1.5, "memory_gb": 5}, family="DSv3")["name"],
+            "Standard_D2s_v3",
+        )
+        self.assertIsNone(index.find({"vcpus": 8}))
+
+    def test_ranks_by_price_when_known(self):
+        index = RightsizingIndex(
+            SKUS, prices={"standard_e2s_v3": 0.05, "standard_d2s_v3": 0.1}
+        )
+
+        self.assertEqual(
+            index.find({"vcpus": 2}, headroom=0)["name"], "Standard_E2s_v3"
+        )
+
+    def test_batch_matches_single_lookups(self):
+        index = RightsizingIndex(SKUS)
+        required = [{"vcpus": vcpus / 4, "memory_gb": vcpus} for vcpus in range(16)]
+
+        batch = index.find_batch(required, headroom=0.1)
+
+        self.assertEqual(batch, [index.find(vm, headroom=0.1) for vm in required])
+
+    def test_required_capacity_scales_current_sku(self):
+        self.assertEqual(
+            required_capacity(
+                SKUS[0], {"cpu_weight_peak": 25, "memory_weight_peak": float("nan")}
+            ),
+            {"vcpus": 1.0},
+        )
+
+    def test_required_capacity_scales_throughput_and_bandwidth(self):
+        required = required_capacity(
+            SKUS[0], {"storage_weight_avg": 75, "other_weight_peak": 10}
+        )
+
+        self.assertEqual(
+            required, {"disk_bytes_per_sec": 72_000_000, "bandwidth_mbps": 400}
+        )
+        # Two vCPUs would do, but only the 4 vCPU SKUs move that much data
+        self.assertEqual(
+            RightsizingIndex(SKUS).find(
+                dict(required, vcpus=0.5, memory_gb=1), headroom=0
+            )["name"],
+            "Standard_D4s_v3",
+        )
+
+    def test_suggests_skus_for_analyzer_results(self):
+        index = RightsizingIndex(SKUS)
+        results = {
+            "cpu_weight_peak": np.array([20.0, np.nan]),
+            "memory_weight_peak": np.array([20.0, np.nan]),
+        }
+
+        self.assertEqual(
+            suggest_skus(index, [SKUS[0], SKUS[0]], results, same_family=True),
+            ["Standard_D2s_v3", None],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
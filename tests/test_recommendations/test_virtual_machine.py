@@ -0,0 +1,107 @@
+import json
+import unittest
+from unittest import mock
+
+from src.recommendations.rightsizing import RightsizingIndex
+from src.recommendations.virtual_machine import (
+    VM_METRICS,
+    analyze_vm_consumption_data,
+    fetch_vm_consumption_data,
+)
+
+GIB = 1024**3
+
+
+def _sku(name, vcpus, memory_gb):
+    return {
+        "name": name,
+        "family": "DSv3",
+        "vcpus": vcpus,
+        "memory_gb": memory_gb,
+        "uncached_disk_bytes_per_second": 48_000_000 * vcpus,
+        "network_bandwidth_mbps": 1000 * vcpus,
+        "premium_io": True,
+        "accelerated_networking": True,
+    }
+
+
+SKUS = [_sku("Standard_D2s_v3", 2, 8), _sku("Standard_D4s_v3", 4, 16)]
+
+
+def _series(values):
+    return [
+        [f"2023-03-01T{hour:02d}:00:00Z", value] for hour, value in enumerate(values)
+    ]
+
+
+def _metric(name, key, values):
+    return {
+        "name": {"value": name},
+        "timeseries": [
+            {
+                "data": [
+                    {"timeStamp": f"2023-03-01T0{i}:00:00Z", key: value}
+                    for i, value in enumerate(values)
+                ]
+            }
+        ],
+    }
+
+
+class TestFetchVmConsumptionData(unittest.TestCase):
+    def test_requests_all_metrics_in_one_call(self):
+        client = mock.Mock()
+        body = {
+            "value": [
+                _metric("Percentage CPU", "average", [10.0, None, 30.0]),
+                _metric("Network In Total", "total", [100.0, 200.0]),
+            ]
+        }
+        client.get.return_value.iter_content.return_value = [json.dumps(body).encode()]
+        with mock.patch(
+            "src.recommendations.virtual_machine.get_arm_client", return_value=client
+        ):
+            data = fetch_vm_consumption_data(
+                "subscription", "rg", "vm", "token", interval="PT6H"
+            )
+
+        client.get.assert_called_once()
+        params = client.get.call_args.kwargs["params"]
+        self.assertEqual(params["metricnames"].split(","), list(VM_METRICS))
+        self.assertEqual(params["interval"], "PT6H")
+        self.assertEqual(data["Percentage CPU"], 20.0)
+        self.assertEqual(data["Network In Total"], 300.0)
+        self.assertEqual(
+            data["series"]["Percentage CPU"],
+            [["2023-03-01T00:00:00Z", 10.0], ["2023-03-01T02:00:00Z", 30.0]],
+        )
+
+
+class TestAnalyzeVmConsumptionData(unittest.TestCase):
+    def test_suggests_smaller_sku_for_idle_vm(self):
+        consumption_data = {
+            "series": {
+                "Percentage CPU": _series([10.0, 20.0, 15.0]),
+                "Available Memory Bytes": _series([13 * GIB, 12 * GIB, 13 * GIB]),
+                "Data Disk Read Bytes/sec": _series([1_000_000] * 3),
+            }
+        }
+
+        self.assertEqual(
+            analyze_vm_consumption_data(
+                consumption_data, SKUS[1], RightsizingIndex(SKUS)
+            ),
+            "Standard_D2s_v3",
+        )
+
+    def test_no_suggestion_when_current_sku_fits_best(self):
+        consumption_data = {"series": {"Percentage CPU": _series([90.0, 95.0])}}
+        index = RightsizingIndex(SKUS)
+
+        self.assertIsNone(analyze_vm_consumption_data(consumption_data, SKUS[1], index))
+        self.assertIsNone(analyze_vm_consumption_data(consumption_data, None, index))
+        self.assertIsNone(analyze_vm_consumption_data({}, SKUS[1], index))
+
+
+if __name__ == "__main__":
+    unittest.main()
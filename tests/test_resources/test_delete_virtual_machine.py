@@ -0,0 +1,297 @@
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import requests
+
+from src.arm import ArmClient
+from src.auth import ServicePrincipalCredential
+from src.resources.virtual_machine import (
+    delete_azure_vm,
+    delete_azure_vms,
+    run_deletion_graph,
+    teardown_azure_vm,
+)
+from src.throttling import RateLimitGovernor
+
+RG = "/subscriptions/sub/resourceGroups/rg/providers"
+
+
+def vm_body(name):
+    return {
+        "id": f"{RG}/Microsoft.Compute/virtualMachines/{name}",
+        "name": name,
+        "properties": {
+            "storageProfile": {
+                "osDisk": {
+                    "managedDisk": {"id": f"{RG}/Microsoft.Compute/disks/{name}-os"}
+                },
+                "dataDisks": [
+                    {"managedDisk": {"id": f"{RG}/Microsoft.Compute/disks/{name}-data"}}
+                ],
+            },
+            "networkProfile": {
+                "networkInterfaces": [
+                    {"id": f"{RG}/Microsoft.Network/networkInterfaces/{name}-nic-0"},
+                    {"id": f"{RG}/Microsoft.Network/networkInterfaces/{name}-nic-1"},
+                ]
+            },
+        },
+    }
+
+
+def nic_body(nic_id):
+    nic_name = nic_id.rsplit("/", 1)[1]
+    return {
+        "id": nic_id,
+        "properties": {
+            "ipConfigurations": [
+                {
+                    "properties": {
+                        "publicIPAddress": {
+                            "id": f"{RG}/Microsoft.Network/publicIPAddresses/{nic_name}-ip"
+                        }
+                    }
+                }
+            ]
+        },
+    }
+
+
+class FakeArmHandler(BaseHTTPRequestHandler):
+    """
+    Serves VMs and NICs, and answers deletions with 202s that finish after one poll.
+    VM deletions report through Azure-AsyncOperation, the rest through Location.
+    """
+
+    protocol_version = "HTTP/1.1"
+    lock = threading.Lock()
+    deleted = {}
+    polls = {}
+    missing = set()
+    failing = set()
+
+    def _send(self, status, body=None, headers=None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        path, _, query = self.path.partition("?")
+        if path.startswith("/operations/"):
+            resource_id = path[len("/operations") :]
+            with self.lock:
+                self.polls[resource_id] = self.polls.get(resource_id, 0) + 1
+                first_poll = self.polls[resource_id] == 1
+                if not first_poll:
+                    self.deleted[resource_id] = time.monotonic()
+            if "location" in query:
+                return self._send(202 if first_poll else 200, {})
+            status = "InProgress" if first_poll else "Succeeded"
+            if resource_id in self.failing and not first_poll:
+                status = "Failed"
+                self.deleted.pop(resource_id)
+            return self._send(200, {"status": status, "error": {"message": "boom"}})
+        if path in self.missing:
+            return self._send(404, {"error": {"message": "not found"}})
+        if "/virtualMachines/" in path:
+            return self._send(200, vm_body(path.rsplit("/", 1)[1]))
+        if "/networkInterfaces/" in path:
+            return self._send(200, nic_body(path))
+        self._send(404, {})
+
+    def do_DELETE(self):
+        path = self.path.partition("?")[0]
+        if path in self.missing:
+            return self._send(404, {"error": {"message": "not found"}})
+        base = f"http://127.0.0.1:{self.server.server_port}/operations{path}"
+        if "/virtualMachines/" in path:
+            headers = {"Azure-AsyncOperation": base, "Retry-After": "0"}
+        else:
+            headers = {"Location": f"{base}?location=1", "Retry-After": "0"}
+        self._send(202, headers=headers)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestDeleteAzureVm(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeArmHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.client = ArmClient(
+            base_url=f"http://127.0.0.1:{cls.server.server_port}",
+            governor=RateLimitGovernor(),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client.close()
+        cls.server.shutdown()
+
+    def setUp(self):
+        FakeArmHandler.deleted = {}
+        FakeArmHandler.polls = {}
+        FakeArmHandler.missing = set()
+        FakeArmHandler.failing = set()
+        for target in ("src.resources.virtual_machine", "src.lro"):
+            patcher = mock.patch(f"{target}.get_arm_client", return_value=self.client)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_deletes_dependents_after_the_vm(self):
+        result = teardown_azure_vm("sub", "rg", "vm-1", "token", poll_interval=0)
+
+        self.assertTrue(result["success"])
+        self.assertEqual(len(result["resources"]), 7)
+        self.assertEqual(
+            {r["status"] for r in result["resources"].values()}, {"Deleted"}
+        )
+        deleted = FakeArmHandler.deleted
+        vm_id = f"{RG}/Microsoft.Compute/virtualMachines/vm-1"
+        for resource_id, finished in deleted.items():
+            if resource_id != vm_id:
+                self.assertGreater(finished, deleted[vm_id])
+        for i in range(2):
+            self.assertGreater(
+                deleted[f"{RG}/Microsoft.Network/publicIPAddresses/vm-1-nic-{i}-ip"],
+                deleted[f"{RG}/Microsoft.Network/networkInterfaces/vm-1-nic-{i}"],
+            )
+
+    def test_already_deleted_resources_count_as_gone(self):
+        FakeArmHandler.missing = {f"{RG}/Microsoft.Compute/disks/vm-1-data"}
+
+        result = teardown_azure_vm("sub", "rg", "vm-1", "token", poll_interval=0)
+
+        self.assertTrue(result["success"])
+        self.assertEqual(
+            result["resources"][f"{RG}/Microsoft.Compute/disks/vm-1-data"]["status"],
+            "NotFound",
+        )
+
+    def test_failed_vm_deletion_skips_dependents(self):
+        vm_id = f"{RG}/Microsoft.Compute/virtualMachines/vm-1"
+        FakeArmHandler.failing = {vm_id}
+
+        result = teardown_azure_vm("sub", "rg", "vm-1", "token", poll_interval=0)
+
+        self.assertFalse(result["success"])
+        self.assertEqual(result["resources"][vm_id]["status"], "Failed")
+        self.assertEqual(result["resources"][vm_id]["error"], "boom")
+        self.assertEqual(
+            {
+                r["status"]
+                for resource_id, r in result["resources"].items()
+                if resource_id != vm_id
+            },
+            {"Skipped"},
+        )
+        self.assertEqual(list(FakeArmHandler.deleted), [])
+
+    def test_delete_azure_vm_returns_a_bool(self):
+        FakeArmHandler.failing = {f"{RG}/Microsoft.Compute/virtualMachines/vm-1"}
+
+        self.assertIs(
+            delete_azure_vm("sub", "rg", "vm-0", "token", poll_interval=0), True
+        )
+        self.assertIs(
+            delete_azure_vm("sub", "rg", "vm-1", "token", poll_interval=0), False
+        )
+
+    def test_credential_is_resolved_on_every_request(self):
+        broker = mock.Mock(**{"get_token.return_value": "token"})
+        credential = ServicePrincipalCredential(
+            "tenant", "client", "secret", broker=broker
+        )
+
+        result = teardown_azure_vm("sub", "rg", "vm-1", credential, poll_interval=0)
+
+        self.assertTrue(result["success"])
+        # One GET for the VM, one per NIC, then a DELETE and its polls per resource
+        self.assertGreater(broker.get_token.call_count, 7)
+
+    def test_dependency_cycle_fails_instead_of_hanging(self):
+        disk_a = f"{RG}/Microsoft.Compute/disks/a"
+        disk_b = f"{RG}/Microsoft.Compute/disks/b"
+        vm_id = f"{RG}/Microsoft.Compute/virtualMachines/vm-1"
+        FakeArmHandler.failing = {vm_id}
+
+        results = run_deletion_graph(
+            {
+                vm_id: [],
+                # Listed before what it waits on, so it is only unblocked by a later pass
+                f"{RG}/Microsoft.Network/publicIPAddresses/ip": [disk_a + "-nic"],
+                disk_a + "-nic": [vm_id],
+                disk_a: [disk_b],
+                disk_b: [disk_a],
+            },
+            "token",
+            poll_interval=0,
+        )
+
+        self.assertEqual(results[vm_id]["status"], "Failed")
+        self.assertEqual(results[disk_a + "-nic"]["status"], "Skipped")
+        self.assertEqual(
+            results[f"{RG}/Microsoft.Network/publicIPAddresses/ip"]["status"],
+            "Skipped",
+        )
+        self.assertEqual(results[disk_a]["status"], "Failed")
+        self.assertIn("cycle", results[disk_b]["error"])
+        self.assertEqual(list(FakeArmHandler.deleted), [])
+
+    def test_failed_poll_is_reported_per_resource(self):
+        vm_id = f"{RG}/Microsoft.Compute/virtualMachines/vm-1"
+        disk_id = f"{RG}/Microsoft.Compute/disks/vm-1-os"
+        poller = mock.Mock(**{"get.side_effect": requests.ConnectionError("reset")})
+
+        with mock.patch("src.lro.get_arm_client", return_value=poller):
+            results = run_deletion_graph(
+                {vm_id: [], disk_id: [vm_id]}, "token", poll_interval=0
+            )
+
+        self.assertEqual(results[vm_id], {"status": "Failed", "error": "reset"})
+        self.assertEqual(results[disk_id]["status"], "Skipped")
+
+    def test_unsupported_resource_type_fails_without_aborting(self):
+        vm_id = f"{RG}/Microsoft.Compute/virtualMachines/vm-1"
+        account_id = f"{RG}/Microsoft.Storage/storageAccounts/diag"
+        ip_id = f"{RG}/Microsoft.Network/publicIPAddresses/ip"
+
+        results = run_deletion_graph(
+            {vm_id: [], account_id: [vm_id], ip_id: [account_id]},
+            "token",
+            poll_interval=0,
+        )
+
+        self.assertEqual(results[vm_id]["status"], "Deleted")
+        self.assertEqual(results[account_id]["status"], "Failed")
+        self.assertIn("microsoft.storage/storageaccounts", results[account_id]["error"])
+        self.assertEqual(results[ip_id]["status"], "Skipped")
+
+    def test_tears_down_many_vms(self):
+        FakeArmHandler.missing = {f"{RG}/Microsoft.Compute/virtualMachines/vm-2"}
+
+        results = delete_azure_vms(
+            "sub",
+            [("rg", "vm-0"), ("rg", "vm-1"), ("rg", "vm-2")],
+            "token",
+            max_workers=3,
+            poll_interval=0,
+        )
+
+        self.assertEqual([r["name"] for r in results], ["vm-0", "vm-1", "vm-2"])
+        self.assertEqual([r["success"] for r in results], [True, True, False])
+        self.assertEqual(len(FakeArmHandler.deleted), 14)
+
+
+if __name__ == "__main__":
+    unittest.main()
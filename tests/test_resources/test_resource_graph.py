@@ -0,0 +1,120 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from src.arm import ArmClient
+from src.resources.resource_graph import (
+    get_virtual_machines_graph,
+    iter_resource_groups_graph,
+    list_resources_graph,
+)
+from src.resources.resource_group import get_resource_groups
+from src.throttling import RateLimitGovernor
+
+
+class FakeResourceGraphHandler(BaseHTTPRequestHandler):
+    """
+    Serves Resource Graph queries from a fixed list of rows, two rows per page.
+    """
+
+    protocol_version = "HTTP/1.1"
+    rows = []
+    requests = []
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        FakeResourceGraphHandler.requests.append(payload)
+        offset = int(payload["options"].get("$skipToken") or 0)
+        page = {"data": self.rows[offset : offset + 2]}
+        if offset + 2 < len(self.rows):
+            page["$skipToken"] = str(offset + 2)
+
+        body = json.dumps(page).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestResourceGraph(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeResourceGraphHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.client = ArmClient(
+            base_url=f"http://127.0.0.1:{cls.server.server_port}",
+            governor=RateLimitGovernor(),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client.close()
+        cls.server.shutdown()
+
+    def setUp(self):
+        FakeResourceGraphHandler.requests = []
+        patcher = mock.patch(
+            "src.resources.resource_graph.get_arm_client", return_value=self.client
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_follows_skip_token_across_pages(self):
+        FakeResourceGraphHandler.rows = [
+            {"id": f"/subscriptions/s/resourceGroups/rg-{i}", "name": f"rg-{i}"}
+            for i in range(5)
+        ]
+
+        resource_groups = list(
+            iter_resource_groups_graph(
+                ["sub-1", "sub-2"], "token", missing_tags=["OwnerEmail"]
+            )
+        )
+
+        self.assertEqual(
+            [resource_group["name"] for resource_group in resource_groups],
+            ["rg-0", "rg-1", "rg-2", "rg-3", "rg-4"],
+        )
+        self.assertEqual(len(FakeResourceGraphHandler.requests), 3)
+        self.assertEqual(
+            FakeResourceGraphHandler.requests[0]["subscriptions"], ["sub-1", "sub-2"]
+        )
+        self.assertIn(
+            "isnull(tags['OwnerEmail'])", FakeResourceGraphHandler.requests[0]["query"]
+        )
+
+    def test_is_a_drop_in_source_for_get_resource_groups(self):
+        FakeResourceGraphHandler.rows = [
+            {"id": "/subscriptions/s/resourceGroups/rg", "name": "rg", "tags": None}
+        ]
+
+        resource_groups = get_resource_groups("s", "token", backend="graph")
+
+        self.assertEqual(resource_groups[0]["name"], "rg")
+        self.assertEqual(resource_groups[0]["tags"], {})
+
+    def test_keys_virtual_machines_by_resource_id(self):
+        FakeResourceGraphHandler.rows = [
+            {"id": "/subscriptions/s/resourceGroups/RG/providers/x/vm1", "name": "vm1"}
+        ]
+
+        vms = get_virtual_machines_graph(["s"], "token", vm_name="it's")
+
+        self.assertEqual(
+            list(vms), ["/subscriptions/s/resourcegroups/rg/providers/x/vm1"]
+        )
+        self.assertIn("name =~ 'it\\'s'", FakeResourceGraphHandler.requests[0]["query"])
+
+    def test_rejects_unsupported_resource_types(self):
+        with self.assertRaises(ValueError):
+            list_resources_graph(["s"], "microsoft.web/sites", "token")
+
+
+if __name__ == "__main__":
+    unittest.main()
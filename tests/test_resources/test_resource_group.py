@@ -0,0 +1,148 @@
+import unittest
+from unittest import mock
+
+import requests
+
+from src.resources.resource_group import iter_resource_groups
+
+BASE = "/subscriptions/sub/resourcegroups"
+
+
+def _group(name, **tags):
+    return {
+        "id": f"/subscriptions/sub/resourceGroups/{name}",
+        "name": name,
+        "location": "westeurope",
+        "type": "Microsoft.Resources/resourceGroups",
+        "tags": tags,
+        "properties": {"provisioningState": "Succeeded"},
+    }
+
+
+def _page(groups, next_link=None):
+    body = {"value": groups}
+    if next_link:
+        body["nextLink"] = next_link
+    return mock.Mock(status_code=200, **{"json.return_value": body})
+
+
+class TestIterResourceGroups(unittest.TestCase):
+    def setUp(self):
+        self.client = mock.Mock()
+        patcher = mock.patch(
+            "src.resources.resource_group.get_arm_client", return_value=self.client
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_follows_next_link_across_pages(self):
+        self.client.get.side_effect = [
+            _page([_group("rg-1"), _group("rg-2")], next_link="https://arm/page-2"),
+            _page([_group("rg-3")], next_link="https://arm/page-3"),
+            _page([_group("rg-4")]),
+        ]
+
+        groups = list(iter_resource_groups("sub", "token"))
+
+        self.assertEqual(
+            [group["name"] for group in groups], ["rg-1", "rg-2", "rg-3", "rg-4"]
+        )
+        self.assertEqual(
+            groups[0],
+            {
+                "name": "rg-1",
+                "location": "westeurope",
+                "id": "/subscriptions/sub/resourceGroups/rg-1",
+                "type": "Microsoft.Resources/resourceGroups",
+                "tags": {},
+            },
+        )
+        urls = [call.args[0] for call in self.client.get.call_args_list]
+        self.assertEqual(urls, [BASE, "https://arm/page-2", "https://arm/page-3"])
+        # The nextLink already carries the query string
+        params = [call.kwargs["params"] for call in self.client.get.call_args_list]
+        self.assertEqual(params, [{"api-version": "2020-06-01"}, None, None])
+
+    def test_pages_are_requested_lazily(self):
+        self.client.get.side_effect = [
+            _page([_group("rg-1")], next_link="https://arm/page-2"),
+            _page([_group("rg-2")]),
+        ]
+
+        groups = iter_resource_groups("sub", "token")
+        self.client.get.assert_not_called()
+        next(groups)
+        self.assertEqual(self.client.get.call_count, 1)
+
+    def test_stops_at_top(self):
+        self.client.get.side_effect = [
+            _page([_group("rg-1"), _group("rg-2")], next_link="https://arm/page-2"),
+            _page([_group("rg-3"), _group("rg-4")], next_link="https://arm/page-3"),
+        ]
+
+        groups = list(iter_resource_groups("sub", "token", top=3))
+
+        self.assertEqual([group["name"] for group in groups], ["rg-1", "rg-2", "rg-3"])
+        self.assertEqual(self.client.get.call_count, 2)
+        self.assertEqual(self.client.get.call_args_list[0].kwargs["params"]["$top"], 3)
+        with self.assertRaises(ValueError):
+            iter_resource_groups("sub", "token", top=0)
+
+    def test_pushes_down_filter_and_expand(self):
+        group = dict(
+            _group("rg-1", TTL="7"),
+            createdTime="2023-03-01T10:00:00Z",
+            changedTime="2023-03-02T10:00:00Z",
+        )
+        self.client.get.side_effect = [_page([group])]
+
+        (result,) = iter_resource_groups(
+            "sub", "token", filter_expression="tagName eq 'TTL'", expand="createdTime"
+        )
+
+        self.assertEqual(
+            self.client.get.call_args.kwargs["params"],
+            {
+                "api-version": "2020-06-01",
+                "$filter": "tagName eq 'TTL'",
+                "$expand": "createdTime",
+            },
+        )
+        self.assertEqual(result["created_time"], "2023-03-01T10:00:00Z")
+        self.assertEqual(result["changed_time"], "2023-03-02T10:00:00Z")
+
+    def test_filters_missing_tags_on_each_page(self):
+        self.client.get.side_effect = [
+            _page(
+                [
+                    _group("tagged", OwnerEmail="a@example.com", TTL="7"),
+                    _group("no-ttl", OwnerEmail="a@example.com"),
+                ],
+                next_link="https://arm/page-2",
+            ),
+            _page([_group("untagged"), _group("ttl-only", TTL="7")]),
+        ]
+
+        groups = iter_resource_groups(
+            "sub", "token", missing_tags=["OwnerEmail", "TTL"]
+        )
+
+        self.assertEqual(
+            [group["name"] for group in groups], ["no-ttl", "untagged", "ttl-only"]
+        )
+        self.assertNotIn("$filter", self.client.get.call_args_list[0].kwargs["params"])
+
+    def test_raises_on_failed_page(self):
+        self.client.get.side_effect = [
+            _page([_group("rg-1")], next_link="https://arm/page-2"),
+            mock.Mock(**{"raise_for_status.side_effect": requests.HTTPError("503")}),
+        ]
+
+        groups = iter_resource_groups("sub", "token")
+        self.assertEqual(next(groups)["name"], "rg-1")
+        with self.assertRaises(Exception):
+            next(groups)
+
+
+if __name__ == "__main__":
+    unittest.main()
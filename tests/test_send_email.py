@@ -0,0 +1,118 @@
+import socket
+import smtplib
+import time
+import unittest
+from unittest import mock
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:  # pragma: no cover
+    Controller = None
+
+from src.send_email import MailDispatcher, build_message
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+        self.connections = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("bounce"):
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.connections.add(session.peer)
+        self.messages.append(envelope.rcpt_tos)
+        return "250 Message accepted"
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@unittest.skipIf(Controller is None, "aiosmtpd is not installed")
+class TestMailDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.handler = RecordingHandler()
+        self.controller = Controller(
+            self.handler, hostname="127.0.0.1", port=_free_port()
+        )
+        self.controller.start()
+        self.addCleanup(self.controller.stop)
+
+    def _dispatcher(self, **kwargs):
+        kwargs.setdefault("username", "")
+        kwargs.setdefault("starttls", False)
+        dispatcher = MailDispatcher(
+            host="127.0.0.1", port=self.controller.port, **kwargs
+        )
+        self.addCleanup(dispatcher.close)
+        return dispatcher
+
+    def _message(self, recipient):
+        return build_message("Subject", "Body", "aco@example.com", [recipient])
+
+    def test_reuses_pooled_connections_and_reports_outcomes(self):
+        dispatcher = self._dispatcher(pool_size=2, messages_per_second=100)
+        recipients = [f"owner{i}@example.com" for i in range(10)] + [
+            "bounce@example.com"
+        ]
+
+        outcomes = dispatcher.send_many(
+            [self._message(recipient) for recipient in recipients]
+        )
+
+        self.assertEqual(
+            [outcome["success"] for outcome in outcomes], [True] * 10 + [False]
+        )
+        self.assertIn("550", outcomes[-1]["error"])
+        self.assertEqual(len(self.handler.messages), 10)
+        self.assertLessEqual(dispatcher.connections_opened, 2)
+
+    def test_limits_sending_rate(self):
+        dispatcher = self._dispatcher(pool_size=2, messages_per_second=10)
+
+        start = time.perf_counter()
+        dispatcher.send_many(
+            [self._message(f"owner{i}@example.com") for i in range(20)]
+        )
+
+        # The first 10 are a burst, the other 10 take a second
+        self.assertGreaterEqual(time.perf_counter() - start, 0.9)
+
+    def test_reconnects_after_the_connection_drops(self):
+        dispatcher = self._dispatcher(pool_size=1)
+        self.assertTrue(dispatcher.send(self._message("a@example.com"))["success"])
+
+        # Simulate the relay closing an idle connection
+        server = dispatcher._pool.get()
+        server.sock.shutdown(socket.SHUT_RDWR)
+        dispatcher._pool.put(server)
+
+        outcome = dispatcher.send(self._message("b@example.com"))
+        self.assertTrue(outcome["success"])
+        self.assertEqual(outcome["attempts"], 2)
+        self.assertEqual(dispatcher.connections_opened, 2)
+
+    def test_never_logs_in_without_starttls(self):
+        # The test server does not advertise STARTTLS, as when a MITM strips it
+        dispatcher = self._dispatcher(
+            username="user", password="secret", starttls=True, max_retries=0
+        )
+
+        with mock.patch.object(smtplib.SMTP, "login") as login:
+            outcome = dispatcher.send(self._message("a@example.com"))
+
+        login.assert_not_called()
+        self.assertFalse(outcome["success"])
+        self.assertIn("STARTTLS", outcome["error"])
+        self.assertEqual(self.handler.messages, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+import os
+import tempfile
+import threading
+import unittest
+from datetime import timedelta
+from unittest import mock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from db.connection_manager import Base
+from src.sku import SkuCatalog, get_vm_skus, parse_vm_sku
+
+VM_SKUS = {
+    "value": [
+        {
+            "resourceType": "virtualMachines",
+            "name": "Standard_D2s_v3",
+            "tier": "Standard",
+            "size": "D2s_v3",
+            "family": "standardDSv3Family",
+            "locations": ["westeurope"],
+            "capabilities": [
+                {"name": "vCPUs", "value": "2"},
+                {"name": "MemoryGB", "value": "8"},
+                {"name": "UncachedDiskIOPS", "value": "3200"},
+            ],
+            "restrictions": [],
+        },
+        {
+            "resourceType": "disks",
+            "name": "Premium_LRS",
+            "locations": ["westeurope"],
+        },
+    ]
+}
+
+
+class TestSkuCatalog(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        self.session_factory = sessionmaker(bind=engine)
+
+    def test_downloads_once_and_serves_from_cache(self):
+        with mock.patch("src.sku.get_vm_skus", return_value=VM_SKUS) as get_vm_skus:
+            catalog = SkuCatalog(self.session_factory)
+            catalog.load("subscription", "WestEurope", "token")
+            catalog.load("subscription", "westeurope", "token")
+            # A new process starts from the database while the cache is fresh
+            SkuCatalog(self.session_factory).load("subscription", "westeurope", "token")
+
+        get_vm_skus.assert_called_once()
+        sku = catalog.get("westeurope", "standard_d2s_v3")
+        self.assertEqual(sku["vcpus"], 2)
+        self.assertEqual(sku["memory_gb"], 8.0)
+        self.assertIsNone(sku["max_data_disk_count"])
+        self.assertEqual(len(catalog.list("westeurope")), 1)
+
+    def test_refreshes_stale_locations(self):
+        with mock.patch("src.sku.get_vm_skus", return_value=VM_SKUS) as get_vm_skus:
+            SkuCatalog(self.session_factory).load("subscription", "westeurope", "token")
+            SkuCatalog(self.session_factory, ttl=timedelta(0)).load(
+                "subscription", "westeurope", "token"
+            )
+
+        self.assertEqual(get_vm_skus.call_count, 2)
+
+    def test_downloads_do_not_block_other_locations(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def fetch(subscription_id, location, access_token):
+            if location == "westeurope":
+                started.set()
+                release.wait(5)
+            return VM_SKUS
+
+        # In-memory databases are per connection; the loader thread needs a file
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        engine = create_engine(f"sqlite:///{os.path.join(directory.name, 'aco.db')}")
+        self.addCleanup(engine.dispose)
+        Base.metadata.create_all(bind=engine)
+        catalog = SkuCatalog(sessionmaker(bind=engine))
+        with mock.patch("src.sku.get_vm_skus", side_effect=fetch):
+            slow = threading.Thread(
+                target=catalog.load, args=("subscription", "westeurope", "token")
+            )
+            slow.start()
+            self.assertTrue(started.wait(5))
+            # Another location loads and is served while westeurope downloads
+            catalog.load("subscription", "northeurope", "token")
+            self.assertIsNotNone(catalog.get("northeurope", "Standard_D2s_v3"))
+            self.assertIsNone(catalog.get("westeurope", "Standard_D2s_v3"))
+            release.set()
+            slow.join(5)
+
+        self.assertIsNotNone(catalog.get("westeurope", "Standard_D2s_v3"))
+
+
+class TestGetVmSkus(unittest.TestCase):
+    def test_follows_next_link(self):
+        pages = [
+            {"value": [{"name": "Standard_A1"}], "nextLink": "https://arm/page-2"},
+            {"value": [{"name": "Standard_A2"}]},
+        ]
+        client = mock.Mock()
+        client.get.side_effect = [
+            mock.Mock(status_code=200, **{"json.return_value": page}) for page in pages
+        ]
+        with mock.patch("src.sku.get_arm_client", return_value=client):
+            vm_skus = get_vm_skus("subscription", "westeurope", "token")
+
+        self.assertEqual(
+            [vm_sku["name"] for vm_sku in vm_skus["value"]],
+            ["Standard_A1", "Standard_A2"],
+        )
+        self.assertEqual(client.get.call_args_list[1].args[0], "https://arm/page-2")
+
+
+class TestParseVmSku(unittest.TestCase):
+    def _restricted(self, restriction_type):
+        vm_sku = dict(
+            VM_SKUS["value"][0],
+            restrictions=[
+                {
+                    "type": restriction_type,
+                    "values": ["westeurope"],
+                    "reasonCode": "NotAvailableForSubscription",
+                }
+            ],
+        )
+        return parse_vm_sku(vm_sku, "westeurope")["restricted"]
+
+    def test_only_location_restrictions_restrict_the_sku(self):
+        self.assertTrue(self._restricted("Location"))
+        self.assertFalse(self._restricted("Zone"))
+
+
+if __name__ == "__main__":
+    unittest.main()
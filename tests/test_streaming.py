@@ -0,0 +1,124 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.arm import ArmClient
+from src.streaming import JsonItemStream, iter_paged_items
+from src.throttling import RateLimitGovernor
+
+
+def chunked(document, size):
+    data = json.dumps(document).encode()
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+class TestJsonItemStream(unittest.TestCase):
+    def test_yields_items_from_tiny_chunks(self):
+        document = {
+            "nextLink": "https://arm/page-2",
+            "value": [
+                {"id": 1, "name": "zoë ✓", "nested": {"list": [1.5, None, True]}},
+                {"id": 123456789, "tags": {}},
+                12345,
+            ],
+            "count": 3,
+        }
+        for size in (1, 2, 7, 1024):
+            stream = JsonItemStream(chunked(document, size))
+            self.assertEqual(list(stream), document["value"])
+            self.assertEqual(
+                stream.meta, {"nextLink": "https://arm/page-2", "count": 3}
+            )
+
+    def test_stops_early_without_reading_the_rest(self):
+        chunks = chunked({"value": [{"id": i} for i in range(1000)]}, 64)
+        consumed = []
+
+        def source():
+            for chunk in chunks:
+                consumed.append(chunk)
+                yield chunk
+
+        for item in JsonItemStream(source()):
+            if item["id"] == 2:
+                break
+
+        self.assertLess(len(consumed), 3)
+
+    def test_empty_and_missing_items(self):
+        self.assertEqual(list(JsonItemStream([b'{"value": []}'])), [])
+        stream = JsonItemStream([b'{"other": 1}'])
+        self.assertEqual(list(stream), [])
+        self.assertEqual(stream.meta, {"other": 1})
+
+    def test_truncated_document_raises(self):
+        with self.assertRaises(ValueError):
+            list(JsonItemStream([b'{"value": [{"id": 1}, {"id"']))
+
+
+class FakePagedHandler(BaseHTTPRequestHandler):
+    """
+    Serves three pages of three items, linked with nextLink.
+    """
+
+    protocol_version = "HTTP/1.1"
+    requested = []
+
+    def do_GET(self):
+        FakePagedHandler.requested.append(self.path)
+        page = int(self.path.rsplit("page=", 1)[1])
+        body = {"value": [{"id": page * 3 + i} for i in range(3)]}
+        if page < 2:
+            body[
+                "nextLink"
+            ] = f"http://127.0.0.1:{self.server.server_port}/items?page={page + 1}"
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestIterPagedItems(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakePagedHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.client = ArmClient(
+            base_url=f"http://127.0.0.1:{cls.server.server_port}",
+            governor=RateLimitGovernor(),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client.close()
+        cls.server.shutdown()
+
+    def setUp(self):
+        FakePagedHandler.requested = []
+
+    def test_follows_next_link(self):
+        items = iter_paged_items(
+            "/items", "token", params={"page": 0}, client=self.client
+        )
+
+        self.assertEqual([item["id"] for item in items], list(range(9)))
+        self.assertEqual(len(FakePagedHandler.requested), 3)
+
+    def test_next_page_is_only_requested_when_needed(self):
+        for item in iter_paged_items(
+            "/items", "token", params={"page": 0}, client=self.client
+        ):
+            if item["id"] == 1:
+                break
+
+        self.assertEqual(FakePagedHandler.requested, ["/items?page=0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+import json
+import unittest
+from unittest import mock
+
+import requests
+
+from src.tagging import (
+    build_resource_group_creator_index,
+    fetch_resource_group_creator_email,
+    reconcile_resource_group_tags_batch,
+    summarize_tag_reconciliation,
+)
+
+
+def write_event(resource_group, caller, status_code="OK"):
+    return {
+        "operationName": {
+            "value": "Microsoft.Resources/subscriptions/resourcegroups/write"
+        },
+        "caller": caller,
+        "resourceGroupName": resource_group,
+        "properties": {"statusCode": status_code},
+    }
+
+
+def page(events, next_link=None):
+    response = requests.Response()
+    response.status_code = 200
+    body = {"value": events}
+    if next_link:
+        body["nextLink"] = next_link
+    response._content = json.dumps(body).encode()
+    response._content_consumed = True
+    return response
+
+
+class TestResourceGroupCreatorIndex(unittest.TestCase):
+    def setUp(self):
+        self.client = mock.Mock()
+        patcher = mock.patch("src.tagging.get_arm_client", return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_builds_index_from_one_paged_scan(self):
+        self.client.get.side_effect = [
+            page(
+                [
+                    write_event("RG-A", "alice@example.com", "Created"),
+                    write_event("rg-b", "bob@example.com"),
+                    {
+                        "operationName": {
+                            "value": "Microsoft.Resources/deployments/write"
+                        },
+                        "caller": "carol@example.com",
+                        "resourceGroupName": "rg-c",
+                    },
+                ],
+                next_link="https://arm/page-2",
+            ),
+            page([write_event("rg-d", "not-an-email")]),
+        ]
+
+        index = build_resource_group_creator_index("sub", "token", days=30)
+
+        self.assertEqual(
+            index, {"rg-a": "alice@example.com", "rg-b": "bob@example.com"}
+        )
+        first_call, second_call = self.client.get.call_args_list
+        self.assertEqual(second_call.args[0], "https://arm/page-2")
+        self.assertIn(
+            "resourceProvider eq 'Microsoft.Resources'",
+            first_call.kwargs["params"]["$filter"],
+        )
+        self.assertTrue(first_call.kwargs["stream"])
+
+    def test_created_event_wins_over_later_writes(self):
+        # The log is newest first: later tag updates come before the creation
+        self.client.get.side_effect = [
+            page(
+                [
+                    write_event("rg-a", "automation@example.com"),
+                    write_event("rg-a", "alice@example.com", "Created"),
+                    write_event("rg-b", "bob@example.com", "Created"),
+                    write_event("rg-b", "tagger@example.com"),
+                    write_event("rg-c", "newer@example.com"),
+                    write_event("rg-c", "older@example.com"),
+                ]
+            )
+        ]
+
+        index = build_resource_group_creator_index("sub", "token")
+
+        self.assertEqual(
+            index,
+            {
+                "rg-a": "alice@example.com",
+                "rg-b": "bob@example.com",
+                # Without a creation event the oldest write is used
+                "rg-c": "older@example.com",
+            },
+        )
+
+    def test_returns_none_when_the_scan_fails(self):
+        self.client.get.side_effect = requests.ConnectionError("reset")
+
+        self.assertIsNone(build_resource_group_creator_index("sub", "token"))
+
+    def test_lookup_is_case_insensitive_and_offline(self):
+        index = {"rg-a": "alice@example.com"}
+
+        self.assertEqual(
+            fetch_resource_group_creator_email("sub", "RG-A", "token", index),
+            "alice@example.com",
+        )
+        self.assertIsNone(
+            fetch_resource_group_creator_email("sub", "rg-z", "token", index)
+        )
+        self.client.get.assert_not_called()
+
+
+class TestReconcileResourceGroupTagsBatch(unittest.TestCase):
+    def test_sends_full_batches_while_reading_groups(self):
+        read = []
+
+        def desired_tags_by_group():
+            for i in range(5):
+                read.append(i)
+                yield {"name": f"rg-{i}", "tags": {}}, {"TTL": "7"}
+
+        def update_tags_batch(**kwargs):
+            # Groups are read up to the one that filled the batch, not beyond
+            sent.append((list(kwargs["update_data_by_group"]), len(read)))
+            kwargs["batch"].round_trips += 1
+            return {name: name != "rg-4" for name in kwargs["update_data_by_group"]}
+
+        sent = []
+        with mock.patch("src.tagging.update_tags_batch", side_effect=update_tags_batch):
+            results, batch_stats = reconcile_resource_group_tags_batch(
+                "subscription", desired_tags_by_group(), "token", batch_size=2
+            )
+
+        self.assertEqual(
+            sent, [(["rg-0", "rg-1"], 2), (["rg-2", "rg-3"], 4), (["rg-4"], 5)]
+        )
+        self.assertEqual(
+            [result["success"] for result in results], [True] * 4 + [False]
+        )
+        self.assertEqual([result["requests"] for result in results], [0] * 5)
+
+        summary = summarize_tag_reconciliation(results, batch_stats)
+        self.assertEqual(summary["requests"], 3)
+        self.assertEqual(
+            summary["requests_saved"],
+            summarize_tag_reconciliation(results)["requests_saved"] - 3,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
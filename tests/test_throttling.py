@@ -0,0 +1,131 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from unittest import mock
+
+from src.throttling import RateLimitGovernor, TokenBucket, parse_retry_after
+
+URL = "https://management.azure.com/subscriptions/SUB/resourcegroups"
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_waits_once_the_burst_is_spent(self):
+        bucket = TokenBucket(capacity=2, refill_rate=10)
+        with mock.patch("src.throttling.time.monotonic", return_value=bucket.updated):
+            delays = [bucket.reserve() for _ in range(4)]
+
+        self.assertEqual(delays[:2], [0.0, 0.0])
+        self.assertAlmostEqual(delays[2], 0.1)
+        self.assertAlmostEqual(delays[3], 0.2)
+
+    def test_limit_caps_tokens_to_remaining_quota(self):
+        bucket = TokenBucket(capacity=100, refill_rate=1)
+        with mock.patch("src.throttling.time.monotonic", return_value=bucket.updated):
+            bucket.limit(1)
+            self.assertEqual(bucket.reserve(), 0.0)
+            self.assertAlmostEqual(bucket.reserve(), 1.0)
+
+
+class TestRateLimitGovernor(unittest.TestCase):
+    def setUp(self):
+        self.governor = RateLimitGovernor(max_retries=3, backoff_base=1, backoff_max=8)
+
+    def test_honours_retry_after_on_429_and_503(self):
+        for status_code in (429, 503):
+            self.assertEqual(
+                self.governor.retry_delay(
+                    "GET", URL, status_code, {"Retry-After": "17"}, attempt=0
+                ),
+                17.0,
+            )
+        self.assertEqual(self.governor.stats()["sub/read"]["throttled"], 1)
+
+    def test_backs_off_with_jitter_on_server_errors(self):
+        with mock.patch(
+            "src.throttling.random.uniform", side_effect=lambda low, high: high / 2
+        ) as uniform:
+            delays = [
+                self.governor.retry_delay("GET", URL, 500, {}, attempt)
+                for attempt in range(3)
+            ]
+
+        self.assertEqual(
+            [call.args for call in uniform.call_args_list], [(0, 1), (0, 2), (0, 4)]
+        )
+        self.assertEqual(delays, [0.5, 1.0, 2.0])
+        # The cap applies however many attempts were made
+        governor = RateLimitGovernor(max_retries=10, backoff_base=1, backoff_max=8)
+        for _ in range(20):
+            self.assertLessEqual(governor.retry_delay("GET", URL, 502, {}, 6), 8)
+
+    def test_does_not_retry_post_unless_throttled(self):
+        for status_code in (None, 500, 503):
+            self.assertIsNone(
+                self.governor.retry_delay("POST", URL, status_code, {}, attempt=0)
+            )
+        self.assertEqual(
+            self.governor.retry_delay(
+                "POST", URL, 429, {"Retry-After": "2"}, attempt=0
+            ),
+            2.0,
+        )
+
+    def test_does_not_retry_client_errors(self):
+        for status_code in (200, 400, 404, 409):
+            self.assertIsNone(
+                self.governor.retry_delay("GET", URL, status_code, {}, attempt=0)
+            )
+
+    def test_gives_up_after_max_retries(self):
+        self.assertIsNotNone(self.governor.retry_delay("GET", URL, 429, {}, 2))
+        self.assertIsNone(self.governor.retry_delay("GET", URL, 429, {}, 3))
+        self.assertEqual(self.governor.stats()["sub/read"]["retries"], 1)
+
+    def test_lowers_local_tokens_from_remaining_headers(self):
+        self.governor.acquire("GET", URL)
+        self.governor.acquire("DELETE", URL)
+        self.governor.retry_delay(
+            "GET", URL, 200, {"x-ms-ratelimit-remaining-subscription-reads": "3"}, 0
+        )
+        self.governor.retry_delay(
+            "DELETE",
+            URL,
+            200,
+            {"x-ms-ratelimit-remaining-subscription-deletes": "0"},
+            0,
+        )
+
+        self.assertLessEqual(self.governor._bucket(("sub", "read")).tokens, 3)
+        self.assertLessEqual(self.governor._bucket(("sub", "write")).tokens, 0)
+        self.assertGreater(self.governor.acquire("DELETE", URL), 0)
+        stats = self.governor.stats()
+        self.assertEqual(stats["sub/read"]["min_remaining"], 3)
+        self.assertEqual(stats["sub/write"]["min_remaining"], 0)
+
+    def test_scopes_requests_by_subscription_and_kind(self):
+        self.assertEqual(self.governor.scope("get", URL), ("sub", "read"))
+        self.assertEqual(self.governor.scope("PATCH", URL), ("sub", "write"))
+        self.assertEqual(
+            self.governor.scope("GET", "https://management.azure.com/subscriptions"),
+            ("tenant", "read"),
+        )
+
+
+class TestParseRetryAfter(unittest.TestCase):
+    def test_parses_seconds(self):
+        self.assertEqual(parse_retry_after("30"), 30.0)
+        self.assertEqual(parse_retry_after("-5"), 0.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+
+    def test_parses_http_date(self):
+        retry_at = datetime.now(timezone.utc) + timedelta(seconds=120)
+
+        delay = parse_retry_after(format_datetime(retry_at, usegmt=True))
+
+        self.assertAlmostEqual(delay, 120, delta=2)
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()